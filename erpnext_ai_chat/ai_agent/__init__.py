@@ -1,5 +1,17 @@
-from .agent import ERPNextAgent
-from .tools import get_erpnext_tools
-from .memory import ConversationMemoryManager
+import importlib
+
+# Loaded on first access: the agent and tools import langchain and the whole
+# tool graph, which workers that never serve a chat turn should not pay for
+_LAZY = {
+    "ERPNextAgent": ".agent",
+    "get_erpnext_tools": ".tools",
+    "ConversationMemoryManager": ".memory",
+}
 
 __all__ = ["ERPNextAgent", "get_erpnext_tools", "ConversationMemoryManager"]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
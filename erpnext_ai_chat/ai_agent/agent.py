@@ -1,26 +1,61 @@
+import re
+import time
 import frappe
+from frappe.utils import cint, flt, format_datetime
 from langchain_openai import ChatOpenAI
 # from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from .tools import get_erpnext_tools
 from .memory import ConversationMemoryManager
+from .context import tool_context
+from .tool_selector import select_tools, DEFAULT_TOP_K, EXPAND_TOOLS
+from .results import ToolResult, summarise_locally
+from .compaction import compact_result, compact_text, DEFAULT_TOKEN_BUDGET
+from . import hedging, isolation, metrics, resilience, retrieval, tracing, usage
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
 
 
 class ERPNextAgent:
-    def __init__(self, user=None, session_id=None):
+    def __init__(self, user=None, session_id=None, llm=None):
         self.user = user or frappe.session.user
         self.session_id = session_id
         self.memory_manager = ConversationMemoryManager(self.user, self.session_id)
-        self.llm = self._initialize_llm()
+        # Benchmarks and replays pass a stand-in with the same invoke()/model_name interface
+        self.llm = llm or self._initialize_llm()
         self.tools = get_erpnext_tools(self.user)
+        self.context = None
+        self.usage = None
         
-    def _initialize_llm(self):
-        """Initialize the LLM with API key from settings or environment"""
-        api_key = self._get_api_key()
+    def _initialize_llm(self, model=None):
+        """Initialize the LLM from AI Chat Settings: the OpenAI API, or the configured backends, hedged"""
+        model = model or get_setting("model_name", "gpt-4o-mini")
+        backends = hedging.get_backends()
+        if not backends:
+            return resilience.ResilientLLM(self._chat_model(model, api_key=self._get_api_key()), self.user)
+        
+        llms = []
+        for backend in backends:
+            api_key = backend.get_password("api_key", raise_exception=False)
+            if not api_key:
+                # OpenAI-compatible servers often need no key, but the client requires one
+                api_key = "unused" if backend.base_url else self._get_api_key()
+            llms.append((backend.backend_name, self._chat_model(backend.model_name or model, backend.base_url, api_key)))
+        if len(llms) == 1:
+            return resilience.ResilientLLM(llms[0][1], self.user)
+        return resilience.ResilientLLM(hedging.HedgedLLM(llms), self.user)
+
+    def _chat_model(self, model, base_url=None, api_key=None):
         return ChatOpenAI(
-            model="gpt-4o-mini",
-            temperature=0.7,
-            api_key=api_key
+            model=model,
+            temperature=flt(get_setting("temperature", 0.7)),
+            max_tokens=cint(get_setting("max_tokens", 2000)) or None,
+            api_key=api_key,
+            base_url=base_url or None,
+            # Retries, rate limits and the circuit breaker are handled by ResilientLLM
+            timeout=flt(get_setting("llm_timeout", resilience.DEFAULT_TIMEOUT)) or None,
+            max_retries=0,
+            # Token usage of streamed (hedged) replies
+            stream_usage=True
         )
 
     def _get_api_key(self):
@@ -38,61 +73,45 @@ class ERPNextAgent:
             frappe.throw("OpenAI API key not configured. Please set it in AI Chat Settings or OPENAI_API_KEY environment variable.")
         return api_key
 
-    def _get_tools_description(self):
+    def _get_tools_description(self, tools=None):
         """Get description of available tools"""
         tools_desc = []
-        for tool in self.tools:
+        for tool in tools or self.tools:
             tools_desc.append(f"- {tool.name}: {tool.description}")
         return "\n".join(tools_desc)
 
-    def _execute_tool(self, tool_name, tool_input):
-        """Execute a specific tool"""
-        for tool in self.tools:
-            if tool.name == tool_name:
-                try:
-                    return tool.run(tool_input)
-                except Exception as e:
-                    return f"Error executing tool: {str(e)}"
-        return f"Tool {tool_name} not found"
-    
-    def _execute_tool_with_dict(self, tool_name, tool_input_dict):
-        """Execute a tool with dictionary input"""
-        for tool in self.tools:
-            if tool.name == tool_name:
-                try:
-                    # Get the function and call it with unpacked dict
-                    return tool.func(**tool_input_dict)
-                except Exception as e:
-                    import traceback
-                    traceback.print_exc()
-                    # Fallback: try as string
-                    try:
-                        return tool.run(str(tool_input_dict))
-                    except:
-                        return f"Error executing tool: {str(e)}"
-        return f"Tool {tool_name} not found"
+    def _get_expand_tools_hint(self, tools):
+        """Tell the model how to ask for tools that were left out of the prompt"""
+        if len(tools) >= len(self.tools):
+            return ""
+        return f"If none of these tools fit the request, reply with exactly: TOOL: {EXPAND_TOOLS} INPUT: {{}}"
 
-    def chat(self, message):
-        """Process a chat message and return response"""
-        try:
-            # Get chat history for context
-            chat_history = self.memory_manager.get_messages(limit=10)
-            
-            # Get current date and time information
-            from datetime import datetime
-            import calendar
-            now = datetime.now()
-            current_date = now.strftime("%B %d, %Y")
-            current_time = now.strftime("%I:%M %p")
-            current_day = now.strftime("%A")
-            current_month = now.strftime("%B")
-            current_year = str(now.year)
-            week_number = now.isocalendar()[1]
-            day_of_year = now.timetuple().tm_yday
-            quarter = (now.month - 1) // 3 + 1
-            
-            # Build system message with tools
-            system_msg = f"""You are an intelligent AI assistant for ERPNext, helping user "{self.user}" with their business operations.
+    def _get_knowledge_section(self, hits):
+        """Format retrieved schema snippets for the system prompt"""
+        if not hits:
+            return ""
+        snippets = "\n".join(hit["snippet"] for hit in hits)
+        return f"""
+RELEVANT SCHEMA (use these DocType, field and report names directly; no need to call get_doctype_structure or get_all_modules for them):
+{snippets}
+"""
+
+    def _build_system_message(self, tools, hits=None):
+        """Build the system prompt describing the given tools and retrieved schema"""
+        # Get current date and time information
+        from datetime import datetime
+        import calendar
+        now = datetime.now()
+        current_date = now.strftime("%B %d, %Y")
+        current_time = now.strftime("%I:%M %p")
+        current_day = now.strftime("%A")
+        current_month = now.strftime("%B")
+        current_year = str(now.year)
+        week_number = now.isocalendar()[1]
+        day_of_year = now.timetuple().tm_yday
+        quarter = (now.month - 1) // 3 + 1
+        
+        return f"""You are an intelligent AI assistant for ERPNext, helping user "{self.user}" with their business operations.
 
 CURRENT DATE & TIME INFORMATION:
 - Full Date: {current_date}
@@ -115,7 +134,9 @@ Examples:
 - You can also answer greetings like "Hello", "Hi", "Good morning" naturally
 
 You have access to the following tools to query ERPNext data:
-{self._get_tools_description()}
+{self._get_tools_description(tools)}
+{self._get_expand_tools_hint(tools)}
+{self._get_knowledge_section(hits)}
 
 CRITICAL RULES:
 1. ALWAYS use tools to fetch REAL data from the database - NEVER make up or generate fake data
@@ -123,13 +144,13 @@ CRITICAL RULES:
 3. DO NOT say "I cannot generate", "I will", "Let me", or "However"
 4. DIRECTLY execute tools and present the actual results returned by the tools
 5. You CAN and SHOULD generate charts when asked
-6. When tools return HTML tables, pass them through AS-IS without modification
+6. Tables returned by tools are shown to the user automatically - summarise them, never re-type them
 7. NEVER generate example or placeholder data like "ITM-001, ITM-002" or "Item A, Item B"
 
 WHEN USER ASKS FOR DATA:
 - ALWAYS call the appropriate tool to fetch REAL data
-- Present the EXACT results from the tool
-- If tool returns HTML table, pass it through without changes
+- Report the EXACT figures returned by the tool
+- The tool's table is displayed to the user below your reply
 - If no data is found, say so - don't make up data
 
 WHEN USER ASKS FOR CHARTS:
@@ -145,19 +166,29 @@ For get_sales_orders with summary:
 For get_sales_orders with filters:
 - TOOL: get_sales_orders INPUT: {{"status": "Draft", "limit": 10}}
 
+For a customer's orders, unpaid invoices, payments or top items (one call answers all of them):
+- TOOL: get_customer_overview INPUT: {{"customer_id": "CUSTOMER-NAME-HERE"}}
+
 For search_items:
 - TOOL: search_items INPUT: {{"query": "laptop", "limit": 10}}
 
 For get_stock_balance:
 - TOOL: get_stock_balance INPUT: {{"item_code": "ITEM-CODE-HERE"}}
+- TOOL: get_stock_balance INPUT: {{"item_group": "ITEM-GROUP-HERE", "low_stock_only": true}}
 
 For query_doctype:
 - TOOL: query_doctype INPUT: {{"doctype_name": "Employee", "filters": "status=Active"}}
 
+For standard ERPNext reports (receivables, ledgers, stock balance, profit and loss):
+- TOOL: run_report INPUT: {{"report_name": "Accounts Receivable", "filters": {{"ageing_based_on": "Due Date"}}}}
+
+For trends, growth rates, moving averages and projections:
+- TOOL: analyze_trend INPUT: {{"doctype": "Sales Invoice", "metric": "amount", "period": "month", "window": 3}}
+
 IMPORTANT DATA RULES:
 ✅ ALWAYS use tools to get real data from database
 ✅ Present exactly what the tool returns
-✅ If tool returns HTML table, use it as-is
+✅ Summarise tables in a sentence or two; the table itself is shown to the user
 ✅ If no data found, inform user truthfully
 
 ❌ NEVER generate fake/example data
@@ -167,8 +198,114 @@ IMPORTANT DATA RULES:
 
 Always respect permissions and provide accurate information from the actual ERPNext database."""
 
+    def _execute_tool(self, tool_name, tool_input):
+        """Execute a specific tool"""
+        for tool in self.tools:
+            if tool.name == tool_name:
+                try:
+                    return tool.run(tool_input)
+                except Exception as e:
+                    return f"Error executing tool: {str(e)}"
+        return f"Tool {tool_name} not found"
+    
+    def _execute_tool_with_dict(self, tool_name, tool_input_dict):
+        """Execute a tool with dictionary input"""
+        for tool in self.tools:
+            if tool.name == tool_name:
+                try:
+                    # Get the function and call it with unpacked dict
+                    return tool.func(**tool_input_dict)
+                except Exception as e:
+                    tracing.annotate(error=f"{e.__class__.__name__}: {e}")
+                    metrics.inc("ai_chat_fallbacks_total", kind="tool_string_input")
+                    # Fallback: try as string
+                    try:
+                        return tool.run(str(tool_input_dict))
+                    except:
+                        return f"Error executing tool: {str(e)}"
+        return f"Tool {tool_name} not found"
+
+    def _invoke_llm(self, messages, step):
+        """
+        Ask the driver of the turn (run_turn or the async chat worker) for an
+        LLM reply, and record the call and its token usage in the turn's trace.
+        Used with `yield from`; the driver sends back (response, latency).
+        """
+        model = self.llm.model_name
+        start = time.perf_counter()
+        try:
+            response, latency = yield self.llm, messages, step
+        except Exception as e:
+            tracing.add_span("llm", start, time.perf_counter(), model=model, step=step, error=f"{e.__class__.__name__}: {e}")
+            raise
+        end = time.perf_counter()
+        metrics.observe("ai_chat_llm_seconds", latency, model=model, step=step)
+        
+        token_usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens, completion_tokens = token_usage.get("input_tokens"), token_usage.get("output_tokens")
+        tracing.add_span(
+            "llm", end - latency, end, model=model, step=step, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+        metrics.inc("ai_chat_llm_tokens_total", prompt_tokens or 0, model=model, kind="prompt")
+        metrics.inc("ai_chat_llm_tokens_total", completion_tokens or 0, model=model, kind="completion")
+        if self.usage is not None:
+            self.usage.add(model, step, prompt_tokens, completion_tokens, latency)
+        return response
+
+    def chat(self, message):
+        """Process a chat message and return response"""
+        return run_turn(self.turn(message))
+
+    def turn(self, message):
+        """
+        One chat turn as a generator: it yields (llm, messages, step) for each
+        LLM call, expects (response, latency) back and returns the result of
+        chat(). The caller decides how the calls are made: run_turn blocks on
+        llm.invoke, the async chat worker awaits llm.ainvoke.
+        """
+        # Tools share one context per turn for meta, permission and default lookups
+        with tool_context(self.user) as context:
+            self.context = context
+            self.usage = usage.TurnUsage(self.user, self.memory_manager.session_id)
+            
+            # Over the daily token budget: cheaper model, and no summarising call after a table
+            if usage.is_over_budget(self.user):
+                self.usage.degraded = True
+                metrics.inc("ai_chat_fallbacks_total", kind="over_budget")
+                fallback_model = usage.get_fallback_model()
+                if fallback_model and fallback_model != self.llm.model_name:
+                    self.llm = self._initialize_llm(fallback_model)
+            
+            try:
+                return (yield from self._chat(message))
+            finally:
+                self.usage.save()
+
+    def _chat(self, message):
+        """Run a single chat turn"""
+        try:
+            # Get chat history for context
+            with tracing.span("memory.load"):
+                chat_history = self.memory_manager.get_messages(limit=10)
+            result = None
+            intermediate_steps = []
+            
+            # Retrieve schema snippets and example routings for this message
+            with tracing.span("retrieval"):
+                hits = retrieval.retrieve(message, self.context) if retrieval.is_enabled() else []
+            boosts = {}
+            for hit in hits:
+                if hit["tool"]:
+                    boosts[hit["tool"]] = max(boosts.get(hit["tool"], 0), hit["score"] * 2)
+            
+            # Only describe the tools relevant to this message
+            top_k = cint(get_setting("tool_selection_top_k", DEFAULT_TOP_K))
+            with tracing.span("tool_selection") as span:
+                offered_tools = select_tools(message, self.tools, top_k, boosts=boosts)
+                span["offered"] = len(offered_tools)
+            
             # Build messages list
-            messages = [SystemMessage(content=system_msg)]
+            messages = [SystemMessage(content=self._build_system_message(offered_tools, hits))]
             
             # Add recent conversation history
             for msg in chat_history[-5:]:
@@ -177,15 +314,32 @@ Always respect permissions and provide accurate information from the actual ERPN
             # Add current message
             messages.append(HumanMessage(content=message))
             
-            # First LLM call - determine if tools are needed
-            response = self.llm.invoke(messages)
-            response_text = response.content
+            try:
+                # First LLM call - determine if tools are needed
+                response = yield from self._invoke_llm(messages, "plan")
+                response_text = response.content
+                
+                # The model asked for the full tool list: describe every tool and retry once
+                if re.search(rf"TOOL:\s*{EXPAND_TOOLS}\b", response_text) and len(offered_tools) < len(self.tools):
+                    metrics.inc("ai_chat_fallbacks_total", kind="expand_tools")
+                    messages[0] = SystemMessage(content=self._build_system_message(self.tools, hits))
+                    response = yield from self._invoke_llm(messages, "plan_all_tools")
+                    response_text = response.content
+
+                # Asking again with every tool described means none of them fits
+                if re.search(rf"TOOL:\s*{EXPAND_TOOLS}\b", response_text):
+                    metrics.inc("ai_chat_fallbacks_total", kind="no_tool_fits")
+                    response_text = (
+                        "I don't have a tool that can answer this. Try naming the document type, "
+                        "report or record you are asking about."
+                    )
+            except resilience.LLMUnavailable as e:
+                return self._degraded_reply(message, e)
             
             # Check if LLM wants to use a tool
             if "TOOL:" in response_text and "INPUT:" in response_text:
                 # Parse tool request
                 import json
-                import re
                 
                 tool_name = None
                 tool_input = None
@@ -218,50 +372,130 @@ Always respect permissions and provide accurate information from the actual ERPN
                 if tool_name and tool_input:
                     # Execute the tool
                     # If tool_input is dict, convert to string arguments for the tool
-                    if isinstance(tool_input, dict):
-                        # Build argument string from dict
-                        # For get_sales_orders, extract relevant params
-                        tool_result = self._execute_tool_with_dict(tool_name, tool_input)
-                    else:
-                        tool_result = self._execute_tool(tool_name, tool_input)
-                    
-                    # Second LLM call with tool results
-                    messages.append(AIMessage(content=response_text))
-                    messages.append(HumanMessage(content=f"Tool result:\n{tool_result}\n\nPresent this data in a clean format. DO NOT say 'chart will be displayed' or 'graphical chart'. Just show the data."))
-                    
-                    final_response = self.llm.invoke(messages)
-                    answer = final_response.content
+                    # Tools read from the replica when there is one, each query under the tool's time limit
+                    start = time.perf_counter()
+                    with tracing.span("tool", tool=tool_name) as span, isolation.tool_queries(tool_name, self.context) as guard:
+                        if isinstance(tool_input, dict):
+                            # Build argument string from dict
+                            # For get_sales_orders, extract relevant params
+                            tool_result = self._execute_tool_with_dict(tool_name, tool_input)
+                        else:
+                            tool_result = self._execute_tool(tool_name, tool_input)
+                        span["timed_out"] = guard.timed_out or None
+                    if guard.timed_out:
+                        tool_result = guard.message
+                        metrics.inc("ai_chat_fallbacks_total", kind="tool_timeout")
+                    failed = isinstance(tool_result, str) and tool_result.startswith(("Error", f"Tool {tool_name} not found"))
+                    tool_status = "timeout" if guard.timed_out else "error" if failed else "ok"
+                    metrics.observe("ai_chat_tool_seconds", time.perf_counter() - start, tool=tool_name, status=tool_status)
+                    intermediate_steps.append({"tool": tool_name, "input": tool_input})
+                    self.usage.tool = tool_name
                     
-                    # Remove any chart-related statements from answer
-                    answer = answer.replace("The graphical chart will now be displayed.", "")
-                    answer = answer.replace("The chart will be displayed below.", "")
-                    answer = answer.replace("Chart visualization:", "")
-                    answer = answer.strip()
+                    if self.usage.degraded and isinstance(tool_result, ToolResult):
+                        # Over budget: the table is shown as is, with an answer built from it locally
+                        result = tool_result.as_dict()
+                        answer = summarise_locally(result)
+                    else:
+                        # Second LLM call with tool results, kept within the token budget
+                        budget = cint(get_setting("tool_result_token_budget", DEFAULT_TOKEN_BUDGET))
+                        messages.append(AIMessage(content=response_text))
+                        if isinstance(tool_result, ToolResult):
+                            # The table is rendered for the user separately; the model only sees the compact form
+                            result = tool_result.as_dict()
+                            prompt_result = compact_result(result, budget, self.llm.model_name)
+                            messages.append(HumanMessage(content=f"Tool result:\n{prompt_result}\n\nThe user already sees this result as a formatted table below your reply. Summarise the key figures in one to three sentences. DO NOT repeat the table. DO NOT say 'chart will be displayed' or 'graphical chart'."))
+                        else:
+                            prompt_result = compact_text(str(tool_result), budget, self.llm.model_name) if budget else str(tool_result)
+                            messages.append(HumanMessage(content=f"Tool result:\n{prompt_result}\n\nPresent this data in a clean format. DO NOT say 'chart will be displayed' or 'graphical chart'. Just show the data."))
+                        
+                        try:
+                            final_response = yield from self._invoke_llm(messages, "answer")
+                        except resilience.LLMUnavailable as e:
+                            # The data is there; answer from it without the model
+                            metrics.inc("ai_chat_fallbacks_total", kind=e.reason)
+                            self.usage.degraded = True
+                            answer = summarise_locally(result) if result else prompt_result
+                        else:
+                            answer = final_response.content
+                            
+                            # Remove any chart-related statements from answer
+                            answer = answer.replace("The graphical chart will now be displayed.", "")
+                            answer = answer.replace("The chart will be displayed below.", "")
+                            answer = answer.replace("Chart visualization:", "")
+                            answer = answer.strip()
                 else:
                     answer = response_text
             else:
                 answer = response_text
             
-            # Save to memory
-            self.memory_manager.add_message("human", message)
-            self.memory_manager.add_message("ai", answer)
+            message_id = self._save_turn(message, answer, result)
             
             return {
                 "success": True,
                 "message": answer,
-                "intermediate_steps": []
+                "message_id": message_id,
+                "result": result,
+                "intermediate_steps": intermediate_steps
             }
             
         except Exception as e:
-            frappe.log_error(f"AI Agent Error: {str(e)}", "ERPNext AI Chat")
-            import traceback
-            traceback.print_exc()
+            frappe.log_error(frappe.get_traceback(), "ERPNext AI Chat")
+            tracing.record_error(e)
+            metrics.inc("ai_chat_errors_total", stage="agent")
             return {
                 "success": False,
                 "message": f"I encountered an error: {str(e)}",
                 "error": str(e)
             }
 
+    def _save_turn(self, message, answer, result=None):
+        """Save the question and answer to memory; returns the AI message's name"""
+        with tracing.span("memory.save"):
+            self.memory_manager.add_message("human", message)
+            message_id = self.memory_manager.add_message("ai", answer, result=result)
+        self.usage.message = message_id
+        return message_id
+
+    def _degraded_reply(self, message, error):
+        """Answer without the LLM: the user's recent answer to the same question, or an apology"""
+        metrics.inc("ai_chat_fallbacks_total", kind=error.reason)
+        tracing.record_error(error)
+        self.usage.degraded = True
+        
+        result = None
+        recent = resilience.get_recent_answer(self.user, message)
+        if recent:
+            answer, result, answered_at = recent
+            answer += f"\n\n(The AI service is unavailable, so this is the answer given on {format_datetime(answered_at)}.)"
+        else:
+            answer = error.user_message
+        
+        return {
+            "success": True,
+            "message": answer,
+            "message_id": self._save_turn(message, answer, result),
+            "result": result,
+            "intermediate_steps": [],
+            "degraded": error.reason
+        }
+
     def clear_history(self):
         """Clear conversation history"""
         self.memory_manager.clear()
+
+
+def run_turn(turn):
+    """Drive a turn generator (ERPNextAgent.turn), making each LLM call inline"""
+    try:
+        request = next(turn)
+        while True:
+            llm, messages, step = request
+            start = time.perf_counter()
+            try:
+                response = llm.invoke(messages)
+            except Exception as e:
+                request = turn.throw(e)
+            else:
+                request = turn.send((response, time.perf_counter() - start))
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,252 @@
+"""
+Precomputed schema catalog for the schema discovery tools.
+
+Modules, DocTypes, fields, the link graph and reports only change on
+`bench migrate` (or when a DocType/Report is edited), so they are collected
+once into a compact, versioned catalog that is kept in Redis and on disk and
+filtered per user at read time.
+"""
+
+import frappe
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+
+
+CATALOG_FORMAT = 1
+CATALOG_CACHE_KEY = f"ai_chat_schema_catalog:v{CATALOG_FORMAT}"
+CATALOG_VERSION_KEY = f"ai_chat_schema_catalog_version:v{CATALOG_FORMAT}"
+CATALOG_REBUILD_JOB = "ai_chat_rebuild_schema_catalog"
+
+# Layout fields carry no data and are left out of the catalog
+NO_VALUE_FIELDTYPES = ("Section Break", "Column Break", "Tab Break", "HTML", "Button", "Fold", "Heading")
+
+# Field rows are stored positionally to keep the catalog compact
+FIELD_KEYS = ("fieldname", "label", "fieldtype", "options", "reqd", "unique")
+
+# Per-worker copies by site, refreshed whenever the version in Redis changes
+_local_catalogs = {}
+
+
+def get_catalog_path() -> str:
+    return frappe.get_site_path("private", "ai_chat", f"schema_catalog.v{CATALOG_FORMAT}.json")
+
+
+def build_catalog() -> Dict[str, Any]:
+    """Collect modules, doctypes, fields, links and reports into a compact dict"""
+    modules = {}
+    for module in frappe.get_all("Module Def", fields=["name", "module_name", "app_name"], order_by="app_name, module_name"):
+        modules[module.name] = {"app": module.app_name, "doctypes": []}
+
+    doctypes = {}
+    for dt in frappe.get_all(
+        "DocType",
+        fields=["name", "module", "istable", "issingle", "is_submittable", "is_tree", "track_changes", "allow_rename", "description"],
+        order_by="name"
+    ):
+        try:
+            meta = frappe.get_meta(dt.name)
+        except Exception:
+            continue
+
+        fields = []
+        links = []
+        children = []
+        for df in meta.fields:
+            if df.fieldtype in NO_VALUE_FIELDTYPES:
+                continue
+            fields.append([df.fieldname, df.label or "", df.fieldtype, df.options or "", df.reqd or 0, df.unique or 0])
+            if df.fieldtype == "Link" and df.options and df.options not in links:
+                links.append(df.options)
+            elif df.fieldtype in ("Table", "Table MultiSelect") and df.options:
+                children.append(df.options)
+
+        doctypes[dt.name] = {
+            "module": dt.module,
+            "istable": dt.istable or 0,
+            "issingle": dt.issingle or 0,
+            "submittable": dt.is_submittable or 0,
+            "tree": dt.is_tree or 0,
+            "track_changes": dt.track_changes or 0,
+            "allow_rename": dt.allow_rename or 0,
+            "title_field": meta.title_field or "",
+            "search_fields": meta.search_fields or "",
+            "description": (dt.description or "").strip()[:200],
+            "fields": fields,
+            "links": links,
+            "children": children,
+        }
+        if not dt.istable and dt.module in modules:
+            modules[dt.module]["doctypes"].append(dt.name)
+
+    report_roles = {}
+    for row in frappe.get_all("Has Role", filters={"parenttype": "Report"}, fields=["parent", "role"]):
+        report_roles.setdefault(row.parent, []).append(row.role)
+
+    reports = {}
+    for report in frappe.get_all(
+        "Report",
+        filters={"disabled": 0},
+        fields=["name", "ref_doctype", "report_type", "module", "prepared_report"],
+        order_by="module, name"
+    ):
+        reports[report.name] = {
+            "ref_doctype": report.ref_doctype or "",
+            "type": report.report_type,
+            "module": report.module or "",
+            "prepared": report.prepared_report or 0,
+            "roles": report_roles.get(report.name, []),
+        }
+
+    catalog = {
+        "format": CATALOG_FORMAT,
+        "generated_at": str(frappe.utils.now_datetime()),
+        "modules": modules,
+        "doctypes": doctypes,
+        "reports": reports,
+    }
+    catalog["version"] = hashlib.sha1(
+        json.dumps([modules, doctypes, reports], sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+    return catalog
+
+
+def rebuild_catalog():
+    """Build the catalog, publish it to Redis and disk and refresh the retrieval index (runs after migrate)"""
+    catalog = build_catalog()
+    _store_catalog(catalog)
+
+    from .retrieval import refresh_index_if_enabled
+    refresh_index_if_enabled(catalog)
+
+    return catalog["version"]
+
+
+def enqueue_rebuild_catalog(doc=None, method=None):
+    """doc_events handler: refresh the catalog in the background after schema edits"""
+    if frappe.flags.in_migrate or frappe.flags.in_install or frappe.flags.in_patch:
+        # after_migrate rebuilds once at the end
+        return
+
+    frappe.enqueue(
+        "erpnext_ai_chat.ai_agent.catalog.rebuild_catalog",
+        queue="long",
+        job_id=CATALOG_REBUILD_JOB,
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+
+
+def _store_catalog(catalog):
+    path = get_catalog_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f, separators=(",", ":"), default=str)
+    os.replace(tmp_path, path)
+
+    frappe.cache().set_value(CATALOG_CACHE_KEY, catalog)
+    frappe.cache().set_value(CATALOG_VERSION_KEY, catalog["version"])
+
+    _local_catalogs[frappe.local.site] = catalog
+
+
+def get_catalog() -> Dict[str, Any]:
+    """Get the catalog from worker memory, Redis or disk, building it only as a last resort"""
+    version = frappe.cache().get_value(CATALOG_VERSION_KEY)
+    local_catalog = _local_catalogs.get(frappe.local.site)
+    if version and local_catalog and local_catalog["version"] == version:
+        metrics.cache_lookup("catalog", True)
+        return local_catalog
+    metrics.cache_lookup("catalog", False)
+
+    catalog = frappe.cache().get_value(CATALOG_CACHE_KEY) if version else None
+
+    if not catalog:
+        path = get_catalog_path()
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    catalog = json.load(f)
+                frappe.cache().set_value(CATALOG_CACHE_KEY, catalog)
+                frappe.cache().set_value(CATALOG_VERSION_KEY, catalog["version"])
+            except Exception:
+                catalog = None
+
+    if not catalog:
+        catalog = build_catalog()
+        _store_catalog(catalog)
+        return catalog
+
+    _local_catalogs[frappe.local.site] = catalog
+    return catalog
+
+
+def get_modules(context) -> Dict[str, List[str]]:
+    """Get readable modules grouped by app"""
+    catalog = get_catalog()
+    readable = context.readable_doctypes
+    report_modules = {r["module"] for r in get_reports(context)}
+
+    apps = {}
+    for name, module in catalog["modules"].items():
+        if name in report_modules or any(dt in readable for dt in module["doctypes"]):
+            apps.setdefault(module["app"] or "", []).append(name)
+    return apps
+
+
+def get_module_doctypes(context, module_name: str) -> Optional[List[Dict[str, Any]]]:
+    """Get readable doctypes in a module, or None if the module does not exist"""
+    catalog = get_catalog()
+    module = catalog["modules"].get(module_name)
+    if module is None:
+        # Accept case-insensitive module names from the model
+        for name, candidate in catalog["modules"].items():
+            if name.lower() == module_name.lower():
+                module = candidate
+                break
+    if module is None:
+        return None
+
+    readable = context.readable_doctypes
+    return [
+        {"name": dt, **catalog["doctypes"][dt]}
+        for dt in module["doctypes"]
+        if dt in readable and dt in catalog["doctypes"]
+    ]
+
+
+def get_reports(context, module_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Get reports the user's roles allow, optionally for one module"""
+    catalog = get_catalog()
+    roles = context.roles
+    readable = context.readable_doctypes
+
+    reports = []
+    for name, report in catalog["reports"].items():
+        if module_name and report["module"].lower() != module_name.lower():
+            continue
+        if not can_see_report(report, roles, readable):
+            continue
+        reports.append({"name": name, **report})
+    return reports
+
+
+def can_see_report(report: Dict[str, Any], roles, readable) -> bool:
+    """Whether a catalog report is allowed by the user's roles and readable DocTypes"""
+    if report["roles"] and not roles.intersection(report["roles"]):
+        return False
+    return not report["ref_doctype"] or report["ref_doctype"] in readable
+
+
+def get_doctype_schema(context, doctype_name: str) -> Optional[Dict[str, Any]]:
+    """Get the catalog entry for a doctype if the user may see it"""
+    doctype = get_catalog()["doctypes"].get(doctype_name)
+    if doctype is None:
+        return None
+    if not doctype["istable"] and doctype_name not in context.readable_doctypes:
+        return None
+    return {"name": doctype_name, **doctype, "fields": [dict(zip(FIELD_KEYS, f)) for f in doctype["fields"]]}
@@ -1,10 +1,28 @@
 """
 Chart generation utilities for AI Chat.
 Supports multiple chart types: line, bar, pie, donut, percentage, axis-mixed
+
+Large series are reduced before they reach the browser: line and axis-mixed
+charts are downsampled with Largest-Triangle-Three-Buckets, categorical charts
+keep their top categories and bucket the rest into "Other".
 """
 
+import re
 import frappe
-from typing import Dict, List, Any, Optional
+import numpy as np
+from html.parser import HTMLParser
+from typing import Dict, List, Any, Optional, Tuple
+
+from . import tracing
+
+
+DEFAULT_POINT_BUDGET = 500
+
+# Slices beyond this are unreadable whatever the point budget
+MAX_PIE_SLICES = 12
+
+SERIES_CHART_TYPES = ("line", "axis-mixed")
+CATEGORY_CHART_TYPES = ("bar", "pie", "donut")
 
 
 def generate_chart_data(
@@ -14,6 +32,7 @@ def generate_chart_data(
     datasets: List[Dict[str, Any]],
     colors: Optional[List[str]] = None,
     height: int = 300,
+    max_points: Optional[int] = None,
     **kwargs
 ) -> Dict[str, Any]:
     """
@@ -26,11 +45,14 @@ def generate_chart_data(
         datasets: List of dataset dictionaries with 'name' and 'values' keys
         colors: Optional custom colors
         height: Chart height in pixels
+        max_points: Point budget (defaults to the "Chart Point Budget" setting)
         **kwargs: Additional chart-specific options
     
     Returns:
         Dictionary with chart configuration
     """
+    labels, datasets = reduce_series(chart_type, labels, datasets, max_points)
+    
     chart_data = {
         "type": chart_type,
         "title": title,
@@ -53,6 +75,200 @@ def generate_chart_data(
     return chart_data
 
 
+def with_chart_type(chart_data: Dict[str, Any], chart_type: Optional[str]) -> Dict[str, Any]:
+    """
+    Re-type a chart the user asked to see differently (e.g. a bar chart as a pie).
+    
+    Args:
+        chart_data: Chart data dictionary
+        chart_type: Requested chart type, or None to keep the original
+    
+    Returns:
+        New chart data dictionary
+    """
+    if not chart_type or chart_type == chart_data.get("type"):
+        return chart_data
+    
+    chart_data = dict(chart_data, type=chart_type)
+    chart_data.pop("lineOptions", None)
+    chart_data.pop("barOptions", None)
+    
+    # Pie and donut charts show a single series
+    if chart_type in ["pie", "donut"] and chart_data["datasets"]:
+        chart_data["datasets"] = [chart_data["datasets"][0]]
+    
+    chart_data["labels"], chart_data["datasets"] = reduce_series(chart_type, chart_data["labels"], chart_data["datasets"])
+    return chart_data
+
+
+def get_point_budget() -> int:
+    from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+    return frappe.utils.cint(get_setting("chart_point_budget", DEFAULT_POINT_BUDGET)) or DEFAULT_POINT_BUDGET
+
+
+def reduce_series(
+    chart_type: str,
+    labels: List[str],
+    datasets: List[Dict[str, Any]],
+    max_points: Optional[int] = None
+) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Bound the number of points sent to the browser.
+    
+    Args:
+        chart_type: Type of chart
+        labels: X-axis labels
+        datasets: List of dataset dictionaries with 'values'
+        max_points: Point budget (defaults to the "Chart Point Budget" setting)
+    
+    Returns:
+        (labels, datasets), unchanged when already within budget
+    """
+    if chart_type not in SERIES_CHART_TYPES + CATEGORY_CHART_TYPES or not datasets:
+        return labels, datasets
+    
+    limit = max_points or get_point_budget()
+    if chart_type in ("pie", "donut"):
+        limit = min(limit, MAX_PIE_SLICES)
+    if len(labels) <= limit:
+        return labels, datasets
+    
+    values = np.array([_padded(dataset.get("values") or [], len(labels)) for dataset in datasets])
+    
+    if chart_type in SERIES_CHART_TYPES:
+        # Keep the points that shape each series; share the budget between series
+        per_series = max(3, limit // len(datasets))
+        keep = np.unique(np.concatenate([lttb_indices(series, per_series) for series in values]))
+        if len(keep) > limit:
+            keep = lttb_indices(values.sum(axis=0), limit)
+        return (
+            [labels[i] for i in keep],
+            [dict(dataset, values=values[d, keep].tolist()) for d, dataset in enumerate(datasets)]
+        )
+    
+    # Categorical: largest categories by the first series, in their original order, then "Other"
+    keep = np.sort(np.argsort(-np.abs(values[0]), kind="stable")[:limit - 1])
+    rest = np.ones(len(labels), dtype=bool)
+    rest[keep] = False
+    return (
+        [labels[i] for i in keep] + ["Other"],
+        [
+            dict(dataset, values=values[d, keep].tolist() + [float(values[d, rest].sum())])
+            for d, dataset in enumerate(datasets)
+        ]
+    )
+
+
+def lttb_indices(values, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    
+    Args:
+        values: Evenly spaced series values
+        threshold: Number of points to keep (first and last are always kept)
+    
+    Returns:
+        Sorted indices of the points to keep
+    """
+    y = np.asarray(values, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    x = np.arange(n, dtype=float)
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    
+    # Average point of every bucket, computed for all buckets at once
+    sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    averages = np.append(sums / counts, y[-1])
+    average_x = np.append((edges[:-1] + edges[1:] - 1) / 2, n - 1)
+    
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Triangle area for every candidate in the bucket against the selected
+        # point and the next bucket's average
+        areas = np.abs(
+            (x[a] - average_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (averages[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    
+    return indices
+
+
+def _padded(values: List[Any], length: int) -> List[float]:
+    values = [float(v or 0) for v in values[:length]]
+    return values + [0.0] * (length - len(values))
+
+
+class TableParser(HTMLParser):
+    """Collects header cells and body rows of the first HTML table, skipping total rows"""
+    
+    def __init__(self):
+        super().__init__()
+        self.in_table = False
+        self.in_thead = False
+        self.in_tbody = False
+        self.in_tr = False
+        self.in_th = False
+        self.in_td = False
+        self.headers = []
+        self.current_row = []
+        self.data_rows = []
+        self.current_text = ""
+        
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.in_table = True
+        elif tag == "thead":
+            self.in_thead = True
+        elif tag == "tbody":
+            self.in_tbody = True
+        elif tag == "tr":
+            self.in_tr = True
+            self.current_row = []
+        elif tag == "th":
+            self.in_th = True
+            self.current_text = ""
+        elif tag == "td":
+            self.in_td = True
+            self.current_text = ""
+            
+    def handle_endtag(self, tag):
+        if tag == "table":
+            self.in_table = False
+        elif tag == "thead":
+            self.in_thead = False
+        elif tag == "tbody":
+            self.in_tbody = False
+        elif tag == "tr":
+            self.in_tr = False
+            if self.in_thead and self.current_row:
+                self.headers = self.current_row
+            elif self.in_tbody and self.current_row:
+                # Skip total/summary rows
+                if self.current_row and not str(self.current_row[0]).lower().startswith('total'):
+                    self.data_rows.append(self.current_row)
+        elif tag == "th":
+            self.in_th = False
+            if self.current_text:
+                self.current_row.append(self.current_text.strip())
+        elif tag == "td":
+            self.in_td = False
+            if self.current_text:
+                self.current_row.append(self.current_text.strip())
+                
+    def handle_data(self, data):
+        if self.in_th or self.in_td:
+            self.current_text += data
+
+
 def parse_html_table_to_chart(
     html_text: str,
     chart_type: str = "bar",
@@ -70,69 +286,6 @@ def parse_html_table_to_chart(
         Chart data dictionary or None if parsing fails
     """
     try:
-        import re
-        from html.parser import HTMLParser
-        
-        # Simple HTML table parser
-        class TableParser(HTMLParser):
-            def __init__(self):
-                super().__init__()
-                self.in_table = False
-                self.in_thead = False
-                self.in_tbody = False
-                self.in_tr = False
-                self.in_th = False
-                self.in_td = False
-                self.headers = []
-                self.current_row = []
-                self.data_rows = []
-                self.current_text = ""
-                
-            def handle_starttag(self, tag, attrs):
-                if tag == "table":
-                    self.in_table = True
-                elif tag == "thead":
-                    self.in_thead = True
-                elif tag == "tbody":
-                    self.in_tbody = True
-                elif tag == "tr":
-                    self.in_tr = True
-                    self.current_row = []
-                elif tag == "th":
-                    self.in_th = True
-                    self.current_text = ""
-                elif tag == "td":
-                    self.in_td = True
-                    self.current_text = ""
-                    
-            def handle_endtag(self, tag):
-                if tag == "table":
-                    self.in_table = False
-                elif tag == "thead":
-                    self.in_thead = False
-                elif tag == "tbody":
-                    self.in_tbody = False
-                elif tag == "tr":
-                    self.in_tr = False
-                    if self.in_thead and self.current_row:
-                        self.headers = self.current_row
-                    elif self.in_tbody and self.current_row:
-                        # Skip total/summary rows
-                        if self.current_row and not str(self.current_row[0]).lower().startswith('total'):
-                            self.data_rows.append(self.current_row)
-                elif tag == "th":
-                    self.in_th = False
-                    if self.current_text:
-                        self.current_row.append(self.current_text.strip())
-                elif tag == "td":
-                    self.in_td = False
-                    if self.current_text:
-                        self.current_row.append(self.current_text.strip())
-                        
-            def handle_data(self, data):
-                if self.in_th or self.in_td:
-                    self.current_text += data
-        
         parser = TableParser()
         parser.feed(html_text)
         
@@ -190,7 +343,7 @@ def parse_html_table_to_chart(
         )
         
     except Exception as e:
-        frappe.log_error(f"Error parsing HTML table to chart: {str(e)}\n\nHTML:\n{html_text[:500]}", "AI Chat HTML Chart")
+        tracing.annotate(error=f"HTML table chart: {e}")
         return None
 
 
@@ -314,7 +467,7 @@ def parse_table_to_chart(
         )
         
     except Exception as e:
-        frappe.log_error(f"Error parsing table to chart: {str(e)}\n\nTable text:\n{table_text}", "AI Chat Chart")
+        tracing.annotate(error=f"Text table chart: {e}")
         return None
 
 
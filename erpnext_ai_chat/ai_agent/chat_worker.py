@@ -0,0 +1,207 @@
+"""
+Asynchronous chat worker.
+
+Most of a chat turn is spent waiting for the LLM. With Answer in Chat Worker
+enabled, send_message queues the turn in Redis and returns at once; the
+reply is published to the user over realtime. `bench --site <site>
+ai-chat-worker` runs a long-lived asyncio process that takes turns off the
+queue and runs many of them concurrently:
+
+- each turn is ERPNextAgent.turn (a generator) wrapped by api.chat.answer_turn;
+- its database work (history, tools, saving) runs on a small thread pool,
+  under a contextvars.Context of its own, so frappe.local (a ContextVar-based
+  werkzeug Local) holds that turn's site, user, connection and trace on
+  whichever pool thread runs the step;
+- its LLM calls are awaited with llm.ainvoke on the event loop, so a turn
+  waiting for the model holds no thread.
+
+When no worker has sent a heartbeat recently, queued turns go to the
+regular background workers instead, and are answered one per process.
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+import traceback
+import frappe
+from concurrent.futures import ThreadPoolExecutor
+from frappe.utils import cint
+from typing import Any, Dict, Optional
+
+from . import metrics
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+QUEUE_KEY = "ai_chat_turn_queue"
+HEARTBEAT_KEY = "ai_chat_worker_heartbeat"
+REALTIME_EVENT = "ai_chat_reply"
+
+HEARTBEAT_INTERVAL = 10
+POLL_TIMEOUT = 5
+
+DEFAULT_MAX_TURNS = 100
+DEFAULT_DB_THREADS = 8
+
+
+def is_enabled() -> bool:
+    return bool(cint(get_setting("use_chat_worker", 0)))
+
+
+def is_worker_alive() -> bool:
+    return bool(frappe.cache().get_value(HEARTBEAT_KEY))
+
+
+def enqueue_turn(message: str, session_id: Optional[str], user: str) -> Dict[str, Any]:
+    """
+    Queue a turn for the chat worker, or for a background job when no worker is running.
+
+    Returns:
+        The reply to send_message: the turn id the realtime reply will carry
+    """
+    job = {
+        "turn_id": frappe.generate_hash(length=12),
+        "message": message,
+        "session_id": session_id,
+        "user": user,
+        "queued_at": time.time(),
+    }
+    if is_worker_alive():
+        frappe.cache().rpush(QUEUE_KEY, json.dumps(job))
+    else:
+        frappe.enqueue("erpnext_ai_chat.ai_agent.chat_worker.run_turn_job", queue="short", job=job)
+    return {"success": True, "queued": True, "turn_id": job["turn_id"], "session_id": session_id}
+
+
+def run_turn_job(job: Dict[str, Any]):
+    """Background job: answer a queued turn in this process, as send_message would"""
+    from erpnext_ai_chat.api.chat import answer_turn
+    from .agent import run_turn
+
+    start = time.perf_counter()
+    try:
+        reply = run_turn(answer_turn(job["message"], job["session_id"], job["user"]))
+    except Exception as e:
+        reply = error_reply(e, frappe.get_traceback())
+    frappe.db.commit()
+    publish(job, reply, start)
+
+
+def error_reply(e: Exception, traceback_text: str) -> Dict[str, Any]:
+    frappe.log_error(traceback_text, "AI Chat Worker")
+    metrics.inc("ai_chat_errors_total", stage="worker")
+    return {"success": False, "message": f"Error: {str(e)}", "response": f"Error: {str(e)}"}
+
+
+def publish(job: Dict[str, Any], reply: Dict[str, Any], start: float):
+    """Send the reply to the user's browser and record the turn's metrics"""
+    status = "ok" if reply.get("success") else "error"
+    frappe.publish_realtime(REALTIME_EVENT, {"turn_id": job["turn_id"], **reply}, user=job["user"])
+    metrics.observe("ai_chat_turn_seconds", time.time() - job["queued_at"], status=status)
+    metrics.observe("ai_chat_worker_turn_seconds", time.perf_counter() - start, status=status)
+    metrics.inc("ai_chat_turns_total", status=status)
+    metrics.flush()
+
+
+def _advance(turn, value=None, error: Optional[BaseException] = None):
+    """
+    Run a turn up to its next LLM call, in the turn's context on a pool thread.
+
+    Returns:
+        (False, (llm, messages, step)) for an LLM call, or (True, reply) when
+        the turn is done. StopIteration cannot cross into an asyncio future.
+    """
+    try:
+        request = turn.throw(error) if error is not None else turn.send(value)
+    except StopIteration as stop:
+        frappe.db.commit()
+        return True, stop.value
+    # Nothing is held open while the LLM is awaited
+    frappe.db.commit()
+    return False, request
+
+
+class ChatWorker:
+    """Takes turns off the site's queue and runs up to max_turns of them at once"""
+
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS, db_threads: int = DEFAULT_DB_THREADS):
+        self.site = frappe.local.site
+        self.sites_path = frappe.local.sites_path
+        self.max_turns = max_turns
+        self.pool = ThreadPoolExecutor(db_threads, thread_name_prefix="ai-chat-db")
+        # The blocking queue pop gets its own thread so it never waits behind turns
+        self.poller = ThreadPoolExecutor(1, thread_name_prefix="ai-chat-queue")
+        self.cache = frappe.cache()
+        self.queue_key = self.cache.make_key(QUEUE_KEY)
+        # The event loop only keeps weak references to tasks
+        self.running = set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_turns)
+        last_heartbeat = 0
+
+        while True:
+            if time.monotonic() - last_heartbeat > HEARTBEAT_INTERVAL:
+                self.cache.set_value(HEARTBEAT_KEY, 1, expires_in_sec=HEARTBEAT_INTERVAL * 3)
+                last_heartbeat = time.monotonic()
+
+            await slots.acquire()
+            item = await loop.run_in_executor(self.poller, self.cache.blpop, [self.queue_key], POLL_TIMEOUT)
+            if not item:
+                slots.release()
+                continue
+
+            task = asyncio.create_task(self.handle(json.loads(item[1])))
+            self.running.add(task)
+            task.add_done_callback(lambda task: (self.running.discard(task), slots.release()))
+
+    async def handle(self, job: Dict[str, Any]):
+        """Run one turn: database steps on the pool, LLM calls awaited here"""
+        from erpnext_ai_chat.api.chat import answer_turn
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.Context()
+
+        def in_turn(fn, *args):
+            return loop.run_in_executor(self.pool, context.run, fn, *args)
+
+        start = time.perf_counter()
+        reply = {"success": False, "message": "Error: the turn was interrupted", "response": "Error: the turn was interrupted"}
+        try:
+            await in_turn(self._connect, job["user"])
+            turn = answer_turn(job["message"], job["session_id"], job["user"])
+            done, value = await in_turn(_advance, turn)
+            while not done:
+                llm, messages, step = value
+                # ainvoke reads AI Chat Settings (limits, breakers) with get_cached_doc here, outside
+                # the turn's context, where no request ever clears the per-process document cache
+                frappe.local.document_cache = {}
+                started = time.perf_counter()
+                try:
+                    response = await llm.ainvoke(messages)
+                except Exception as e:
+                    done, value = await in_turn(_advance, turn, None, e)
+                else:
+                    done, value = await in_turn(_advance, turn, (response, time.perf_counter() - started))
+            reply = value
+        except Exception as e:
+            reply = await in_turn(error_reply, e, traceback.format_exc())
+        finally:
+            await in_turn(self._finish, job, reply, start)
+
+    def _connect(self, user: str):
+        frappe.init(site=self.site, sites_path=self.sites_path)
+        frappe.connect()
+        frappe.set_user(user)
+
+    def _finish(self, job: Dict[str, Any], reply: Dict[str, Any], start: float):
+        try:
+            publish(job, reply, start)
+        finally:
+            frappe.destroy()
+
+
+def serve(max_turns: int = DEFAULT_MAX_TURNS, db_threads: int = DEFAULT_DB_THREADS):
+    """Run the chat worker for the current site until interrupted"""
+    asyncio.run(ChatWorker(max_turns, db_threads).run())
@@ -0,0 +1,167 @@
+"""
+Token-aware compaction of tool output.
+
+Tool results are measured with tiktoken before they are sent back to the
+model. Anything over the configured budget is replaced by the first and last
+rows that fit, statistics computed over every row and a note that the full
+result is shown to the user, so the second LLM call stays bounded no matter
+how much a tool returns.
+"""
+
+import frappe
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from .results import NUMERIC_FIELDTYPES, serialize_for_prompt, _plain
+
+
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Used when the model is unknown to the installed tiktoken version
+FALLBACK_ENCODING = "cl100k_base"
+
+# Share of the row budget given to the first rows; the rest goes to the last rows
+HEAD_SHARE = 0.7
+
+# Least budget worth giving a section; sections beyond that are left out
+MIN_SECTION_TOKENS = 100
+
+# Most frequent values listed per text column
+TOP_VALUES = 3
+
+_encodings = {}
+
+
+def get_encoding(model: Optional[str] = None):
+    """Get the (cached) tiktoken encoding for a model, or None if tiktoken is unavailable"""
+    if model not in _encodings:
+        try:
+            import tiktoken
+
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(FALLBACK_ENCODING)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding(FALLBACK_ENCODING)
+        except Exception:
+            # Encodings are downloaded on first use; offline servers fall back to an estimate
+            frappe.log_error(frappe.get_traceback(), "AI Chat Token Counting")
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def compact_text(text: str, budget: int, model: Optional[str] = None) -> str:
+    """Keep the beginning and end of a text that is over budget"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        if len(text) <= budget * 4:
+            return text
+        head, tail = int(budget * 4 * HEAD_SHARE), int(budget * 4 * (1 - HEAD_SHARE))
+        # A [-0:] slice would be the whole text
+        return f"{text[:head]}\n[... {len(text) - head - tail} characters omitted ...]\n{text[-tail:] if tail else ''}"
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text
+    head, tail = int(budget * HEAD_SHARE), int(budget * (1 - HEAD_SHARE))
+    omitted = len(tokens) - head - tail
+    return f"{encoding.decode(tokens[:head])}\n[... {omitted} tokens omitted ...]\n{encoding.decode(tokens[-tail:] if tail else [])}"
+
+
+def compact_result(result: Dict[str, Any], budget: int, model: Optional[str] = None) -> str:
+    """
+    Serialise a tool result for the model within a token budget.
+
+    Args:
+        result: ToolResult as a dict
+        budget: Maximum tokens for the serialised result (0 disables compaction)
+        model: Model name used to pick the tokenizer
+
+    Returns:
+        The full serialisation if it fits, otherwise head/tail rows plus
+        column statistics over all rows
+    """
+    text = serialize_for_prompt(result)
+    if not budget or count_tokens(text, model) <= budget:
+        return text
+
+    # Each section gets an equal share of the budget, as long as it is MIN_SECTION_TOKENS;
+    # a share of 0 would mean no limit, so later sections are dropped instead
+    if result.get("sections"):
+        sections = result["sections"]
+        kept = min(len(sections), max(budget // MIN_SECTION_TOKENS - 1, 0))
+        share = budget // (kept + 1)
+        parts = [compact_result(dict(result, sections=[]), share, model)]
+        parts.extend(compact_result(section, share, model) for section in sections[:kept])
+        if kept < len(sections):
+            parts.append(f"[... {len(sections) - kept} more sections omitted ...]")
+        return "\n\n".join(parts)
+
+    rows = result.get("rows") or []
+    if not rows:
+        return compact_text(text, budget, model)
+
+    stats = column_stats(result["columns"], rows)
+    notes = ["Statistics over all rows: " + "; ".join(stats)] if stats else []
+
+    # Spend what is left after the header, statistics and note on rows
+    skeleton = serialize_for_prompt(result, rows=[None], notes=notes + [_sample_note(len(rows), len(rows), 0)])
+    remaining = budget - count_tokens(skeleton, model)
+
+    row_costs = [count_tokens(",".join(_plain(value) for value in row), model) + 1 for row in rows]
+    head = _rows_within(row_costs, int(remaining * HEAD_SHARE))
+    tail = _rows_within(row_costs[head:][::-1], remaining - sum(row_costs[:head]))
+
+    sample = rows[:head] + [None] + (rows[-tail:] if tail else [])
+    notes.append(_sample_note(len(rows), head, tail))
+    return compact_text(serialize_for_prompt(result, rows=sample, notes=notes), budget, model)
+
+
+def _rows_within(costs: List[int], budget: int) -> int:
+    """How many rows from the start of `costs` fit in `budget`"""
+    count = 0
+    for cost in costs:
+        if cost > budget:
+            break
+        budget -= cost
+        count += 1
+    return count
+
+
+def _sample_note(total: int, head: int, tail: int) -> str:
+    shown = f"the first {head}" + (f" and last {tail}" if tail else "")
+    return (
+        f"Only {shown} of {total} rows are included here. "
+        "The full result is shown to the user as a table below your reply."
+    )
+
+
+def column_stats(columns: List[Dict[str, Any]], rows: List[List[Any]]) -> List[str]:
+    """Summarise each column over every row: min/max/sum/avg for numbers, top values for text"""
+    stats = []
+    for i, column in enumerate(columns):
+        values = [row[i] for row in rows if row[i] not in (None, "")]
+        if not values:
+            continue
+
+        if column.get("fieldtype") in NUMERIC_FIELDTYPES and all(isinstance(v, (int, float)) for v in values):
+            total = sum(values)
+            stats.append(
+                f"{column['fieldname']} min={_plain(min(values))} max={_plain(max(values))} "
+                f"sum={_plain(total)} avg={_plain(total / len(values))}"
+            )
+            continue
+
+        counts = Counter(_plain(v) for v in values)
+        if len(counts) == len(values):
+            stats.append(f"{column['fieldname']} {len(counts)} distinct")
+        else:
+            top = ", ".join(f"{value} ({count})" for value, count in counts.most_common(TOP_VALUES))
+            stats.append(f"{column['fieldname']} {len(counts)} distinct, top: {top}")
+    return stats
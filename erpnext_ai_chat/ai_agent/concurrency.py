@@ -0,0 +1,79 @@
+"""
+Run independent read-only queries concurrently.
+
+Frappe keeps the DB connection on frappe.local, which is per thread, so each
+worker thread initialises the site, opens its own connection and runs as the
+requesting user before calling the task. When called from a tool, the
+threads use the read replica and statement timeout of that tool too, and
+their spans join the turn's trace.
+"""
+
+import frappe
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict
+
+from .isolation import get_active_guard
+from .tracing import get_current_trace
+
+
+MAX_WORKERS = 4
+
+
+def run_concurrently(tasks: Dict[str, Callable[[], Any]], max_workers: int = MAX_WORKERS) -> Dict[str, Any]:
+    """
+    Run read-only callables in parallel threads.
+
+    Args:
+        tasks: Callables keyed by name; each must only read from the database
+        max_workers: Maximum number of threads
+
+    Returns:
+        Results keyed by the same names. An exception raised by a task is
+        logged and returned as its result rather than raised.
+    """
+    results = _run(tasks, max_workers)
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            # Logged from the calling thread, whose connection is still open
+            frappe.log_error(
+                "".join(traceback.format_exception(type(result), result, result.__traceback__)),
+                f"AI Chat Concurrent Query: {name}"
+            )
+    return results
+
+
+def _run(tasks, max_workers):
+    # Threads cannot see this connection's uncommitted writes, and tests run in
+    # a transaction, so fall back to running in order
+    if len(tasks) < 2 or frappe.flags.in_test or frappe.db.transaction_writes:
+        return {name: _call(task) for name, task in tasks.items()}
+
+    site, sites_path, user = frappe.local.site, frappe.local.sites_path, frappe.session.user
+    guard = get_active_guard()
+    trace = get_current_trace()
+    parent_span = trace.current_span if trace else None
+
+    def run(task):
+        frappe.init(site=site, sites_path=sites_path)
+        try:
+            frappe.connect()
+            frappe.set_user(user)
+            if trace:
+                trace.attach(parent_span)
+            with guard.in_thread() if guard else nullcontext():
+                return _call(task)
+        finally:
+            frappe.destroy()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        futures = {name: pool.submit(run, task) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _call(task):
+    try:
+        return task()
+    except Exception as e:
+        return e
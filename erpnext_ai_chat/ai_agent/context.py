@@ -0,0 +1,178 @@
+"""
+Request-scoped context shared by the AI chat tools.
+
+A ToolContext lives on frappe.local for the duration of one chat turn and
+memoises DocType meta, permission decisions and defaults, so tools running
+in the same turn do not repeat the same DB/Redis lookups.
+"""
+
+import frappe
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Optional
+
+from . import metrics
+
+
+META_CACHE_SIZE = 256
+
+
+class MetaLRU:
+    """Per-worker LRU of DocType meta, invalidated by the DocType's modified timestamp"""
+
+    def __init__(self, maxsize: int = META_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, modified):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != modified:
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, modified, meta):
+        with self._lock:
+            self._data[key] = (modified, meta)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Shared by every request served by this worker process
+meta_cache = MetaLRU()
+
+
+def get_meta_version(doctype: str) -> Optional[str]:
+    """
+    Get a version stamp for a DocType's meta.
+
+    Customizations do not touch the DocType's own `modified`, so the latest
+    Custom Field / Property Setter timestamp is folded in as well.
+    """
+    result = frappe.db.sql(
+        """
+        SELECT
+            (SELECT modified FROM `tabDocType` WHERE name = %(doctype)s) AS doctype_modified,
+            (SELECT MAX(modified) FROM `tabCustom Field` WHERE dt = %(doctype)s) AS custom_field_modified,
+            (SELECT MAX(modified) FROM `tabProperty Setter` WHERE doc_type = %(doctype)s) AS property_setter_modified
+        """,
+        {"doctype": doctype},
+        as_dict=True
+    )
+    if not result or not result[0].doctype_modified:
+        return None
+
+    row = result[0]
+    return "|".join(str(row[key] or "") for key in ("doctype_modified", "custom_field_modified", "property_setter_modified"))
+
+
+class ToolContext:
+    """Memoises meta, permissions, default currency and company for one chat turn"""
+
+    def __init__(self, user=None):
+        self.user = user or frappe.session.user
+        self._meta = {}
+        self._permissions = {}
+        self._currency = None
+        self._company = None
+        self._roles = None
+        self._readable = None
+        # Read replica connection used by tools, opened on first use (see isolation.py)
+        self.replica_db = None
+
+    def get_meta(self, doctype: str):
+        """Get DocType meta, served from the worker LRU while the DocType is unchanged"""
+        if doctype in self._meta:
+            return self._meta[doctype]
+
+        version = get_meta_version(doctype)
+        key = (frappe.local.site, doctype)
+        meta = meta_cache.get(key, version) if version else None
+        metrics.cache_lookup("meta", meta is not None)
+        if meta is None:
+            meta = frappe.get_meta(doctype)
+            if version:
+                meta_cache.set(key, version, meta)
+
+        self._meta[doctype] = meta
+        return meta
+
+    def has_permission(self, doctype: str, ptype: str = "read") -> bool:
+        """Check a DocType-level permission once per turn"""
+        key = (doctype, ptype)
+        if key not in self._permissions:
+            try:
+                self._permissions[key] = bool(frappe.has_permission(doctype, ptype, user=self.user))
+            except Exception:
+                self._permissions[key] = False
+        return self._permissions[key]
+
+    @property
+    def roles(self) -> set:
+        if self._roles is None:
+            self._roles = set(frappe.get_roles(self.user))
+        return self._roles
+
+    @property
+    def readable_doctypes(self) -> set:
+        """All DocTypes the user can read, resolved once from their roles"""
+        if self._readable is None:
+            if self.user == frappe.session.user:
+                user_permissions = frappe.get_user()
+            else:
+                from frappe.utils.user import UserPermissions
+                user_permissions = UserPermissions(self.user)
+            self._readable = set(user_permissions.get_can_read())
+        return self._readable
+
+    @property
+    def default_currency(self) -> str:
+        if self._currency is None:
+            self._currency = (
+                frappe.db.get_single_value("System Settings", "currency")
+                or frappe.defaults.get_global_default("currency")
+                or "INR"
+            )
+        return self._currency
+
+    @property
+    def default_company(self) -> Optional[str]:
+        if self._company is None:
+            self._company = (
+                frappe.defaults.get_user_default("Company", user=self.user)
+                or frappe.defaults.get_global_default("company")
+                or ""
+            )
+        return self._company or None
+
+
+def get_tool_context() -> ToolContext:
+    """Get the context of the current chat turn, creating one if tools run standalone"""
+    context = getattr(frappe.local, "ai_chat_tool_context", None)
+    if context is None:
+        context = ToolContext()
+        frappe.local.ai_chat_tool_context = context
+    return context
+
+
+@contextmanager
+def tool_context(user=None):
+    """Scope a fresh ToolContext to one chat turn"""
+    previous = getattr(frappe.local, "ai_chat_tool_context", None)
+    context = ToolContext(user)
+    frappe.local.ai_chat_tool_context = context
+    try:
+        yield context
+    finally:
+        from .isolation import close_replica
+
+        close_replica(context)
+        frappe.local.ai_chat_tool_context = previous
@@ -0,0 +1,165 @@
+"""
+Background export of tabular tool results to CSV / XLSX.
+
+Tools that can re-run their query without a row limit record a `source` on
+their ToolResult. Exporting re-runs it in a background job, streaming rows
+from an unbuffered cursor straight into the file, so memory stays constant
+however many rows match. The file is saved as a private File attached to the
+chat session and the link is pushed to the user's chat when it is ready.
+"""
+
+import csv
+import json
+import os
+import frappe
+from frappe import _
+from typing import Any, Dict, Iterator, List
+
+from .memory import ConversationMemoryManager
+from .results import ToolResult, render_html
+
+
+FILE_FORMATS = ("csv", "xlsx")
+EXPORT_QUEUE = "long"
+EXPORT_TIMEOUT = 60 * 60
+REALTIME_EVENT = "ai_chat_export_ready"
+
+
+def get_source(message_name: str) -> Dict[str, Any]:
+    """The re-runnable query behind a stored AI message, if it has one"""
+    result_data = frappe.db.get_value("AI Chat Message", message_name, "result_data")
+    result = json.loads(result_data) if result_data else {}
+    return result.get("source") or {}
+
+
+def enqueue_export(message_name: str, file_format: str = "csv") -> str:
+    """
+    Queue an export of the result stored on an AI Chat Message.
+
+    Returns:
+        The background job id
+    """
+    if file_format not in FILE_FORMATS:
+        frappe.throw(_("Export format must be one of: {0}").format(", ".join(FILE_FORMATS)))
+    if not get_source(message_name):
+        frappe.throw(_("This result cannot be exported"))
+
+    job_id = f"ai_chat_export::{message_name}::{file_format}"
+    frappe.enqueue(
+        "erpnext_ai_chat.ai_agent.export.run_export",
+        queue=EXPORT_QUEUE,
+        timeout=EXPORT_TIMEOUT,
+        job_id=job_id,
+        deduplicate=True,
+        message_name=message_name,
+        file_format=file_format,
+        user=frappe.session.user,
+    )
+    return job_id
+
+
+def run_export(message_name: str, file_format: str, user: str):
+    """Background job: write the full result to a private file and notify the chat"""
+    frappe.set_user(user)
+    source = get_source(message_name)
+    session = frappe.db.get_value("AI Chat Message", message_name, "session")
+
+    try:
+        header = [column.get("label") or column["fieldname"] for column in source["columns"]]
+        file_name = f"{frappe.scrub(source['title'])}_{frappe.generate_hash(length=8)}.{file_format}"
+        path = frappe.get_site_path("private", "files", file_name)
+
+        writer = write_xlsx if file_format == "xlsx" else write_csv
+        count = writer(path, header, iter_rows(source))
+
+        file_doc = frappe.get_doc({
+            "doctype": "File",
+            "file_name": file_name,
+            "file_url": f"/private/files/{file_name}",
+            "is_private": 1,
+            "file_size": os.path.getsize(path),
+            "attached_to_doctype": "AI Chat Session",
+            "attached_to_name": session,
+        })
+        file_doc.insert(ignore_permissions=True)
+
+        result = ToolResult(
+            title=_("Export ready"),
+            message=_("{0} rows exported from {1}").format(count, source["title"]),
+            links=[{"label": file_name, "url": file_doc.file_url}],
+        ).as_dict()
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AI Chat Export")
+        result = ToolResult(title=_("Export failed"), message=_("The export could not be completed.")).as_dict()
+
+    # The link becomes part of the conversation, so it is still there after a reload
+    memory = ConversationMemoryManager(user, session)
+    memory_name = memory.add_message("ai", f"{result['title']}: {result['message']}", result=result)
+
+    frappe.publish_realtime(
+        REALTIME_EVENT,
+        {
+            "session_id": session,
+            "message_id": memory_name,
+            "message": f"{result['title']}: {result['message']}",
+            "result_html": render_html(result),
+        },
+        user=user,
+        after_commit=True,
+    )
+
+
+def iter_rows(source: Dict[str, Any]) -> Iterator[List[Any]]:
+    """Stream the rows described by a result source"""
+    fieldnames = [column["fieldname"] for column in source["columns"]]
+
+    if source.get("report"):
+        # Report runners build their result in memory; only the file write is streamed
+        from frappe.desk.query_report import run
+
+        output = run(source["report"], filters=source.get("filters") or {}, user=frappe.session.user)
+        for row in output.get("result") or []:
+            if isinstance(row, dict):
+                yield [row.get(fieldname) for fieldname in fieldnames]
+            else:
+                yield list(row)
+        return
+
+    # get_list builds the query with the user's permission conditions; run=0 returns the SQL
+    query = frappe.get_list(
+        source["doctype"],
+        filters=source.get("filters"),
+        fields=source["fields"],
+        order_by=source.get("order_by") or "modified desc",
+        limit_page_length=0,
+        run=0,
+    )
+    with frappe.db.unbuffered_cursor():
+        for row in frappe.db.sql(query, as_iterator=True):
+            yield list(row)
+
+
+def write_csv(path: str, header: List[str], rows: Iterator[List[Any]]) -> int:
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    return count
+
+
+def write_xlsx(path: str, header: List[str], rows: Iterator[List[Any]]) -> int:
+    from openpyxl import Workbook
+
+    # write_only streams rows to disk instead of keeping the sheet in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Export")
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        sheet.append([value if isinstance(value, (int, float, str)) or value is None else str(value) for value in row])
+        count += 1
+    workbook.save(path)
+    return count
@@ -0,0 +1,285 @@
+"""
+Hedged LLM requests across several OpenAI-compatible backends.
+
+With two or more rows under LLM Backends in AI Chat Settings, the chat model
+of ERPNextAgent is a HedgedLLM:
+
+- the request is streamed from the first backend whose circuit is closed;
+- if no token has arrived within the hedge delay, the same request is sent
+  to the next backend, and so on; a backend that fails hands over at once;
+- the first backend to finish wins and the others are cancelled, which
+  closes their connections; a sync stream only sees this at its next chunk,
+  so a stalled loser keeps its thread until the LLM timeout, and no new
+  hedge is started while MAX_STREAM_THREADS such threads are in flight;
+- the hedge delay is a percentile (Hedge Percentile) of the backend's recent
+  times to first token, kept in Redis so all workers share them; until a
+  backend has MIN_SAMPLES of them, Initial Hedge Delay is used.
+
+Each backend has its own circuit breaker, and its times to first token and
+outcomes (won, lost, error) are exported as metrics. ResilientLLM wraps the
+whole hedged call for timeouts, retries and rate limits as for one model.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+import frappe
+from frappe.utils import flt
+from typing import List, Optional, Tuple
+
+from . import metrics
+from .resilience import CircuitBreaker, CircuitOpen, is_retryable
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+DEFAULT_PERCENTILE = 95
+DEFAULT_INITIAL_DELAY = 2.0
+
+# Times to first token kept per backend, and needed before the percentile is used
+MAX_SAMPLES = 200
+MIN_SAMPLES = 20
+
+LATENCY_KEY = "ai_chat_llm_first_token:{}"
+
+# Sync stream threads per process, losers that have not noticed yet included
+MAX_STREAM_THREADS = 16
+_stream_slots = threading.BoundedSemaphore(MAX_STREAM_THREADS)
+
+
+def get_backends() -> List:
+    """Enabled rows of LLM Backends in AI Chat Settings, primary first"""
+    try:
+        settings = frappe.get_cached_doc("AI Chat Settings")
+    except Exception:
+        return []
+    return [row for row in settings.get("llm_backends") or [] if row.enabled]
+
+
+def record_first_token(name: str, seconds: float):
+    cache = frappe.cache()
+    cache.lpush(LATENCY_KEY.format(name), seconds)
+    cache.ltrim(LATENCY_KEY.format(name), 0, MAX_SAMPLES - 1)
+    metrics.observe("ai_chat_llm_first_token_seconds", seconds, backend=name)
+
+
+def first_token_samples(name: str) -> List[float]:
+    return [float(value) for value in frappe.cache().lrange(LATENCY_KEY.format(name), 0, -1)]
+
+
+class Backend:
+    """One OpenAI-compatible endpoint: a streaming chat model and its circuit breaker"""
+
+    def __init__(self, name: str, llm):
+        self.name = name
+        self.llm = llm
+        self.breaker = CircuitBreaker(f"backend:{name}")
+
+
+class Race:
+    """
+    State of one hedged request: which backends have started, when the next
+    one is due, and what each event from a running backend means.
+    """
+
+    def __init__(self, backends: List[Backend], percentile: float, initial_delay: float):
+        self.waiting = list(backends)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.started = {}
+        self.first_token = set()
+        self.errors = []
+        # Monotonic time at which the next backend starts; None waits for an event
+        self.due_at = time.monotonic()
+
+    def is_due(self) -> bool:
+        return bool(self.waiting) and self.due_at is not None and time.monotonic() >= self.due_at
+
+    def timeout(self) -> Optional[float]:
+        if not self.waiting or self.due_at is None:
+            return None
+        return max(0, self.due_at - time.monotonic())
+
+    def start_next(self) -> Backend:
+        if self.started:
+            metrics.inc("ai_chat_fallbacks_total", kind="llm_hedge")
+        backend = self.waiting.pop(0)
+        self.started[backend.name] = time.perf_counter()
+        delay = self.hedge_delay(backend.name)
+        self.due_at = None if delay is None else time.monotonic() + delay
+        return backend
+
+    def stop_hedging(self):
+        """Wait for the running backends; failover after an error still starts the next one"""
+        self.due_at = None
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Seconds to wait for a first token from `name` before starting the next backend"""
+        if self.percentile <= 0:
+            return None
+        samples = sorted(first_token_samples(name))
+        if len(samples) < MIN_SAMPLES:
+            return self.initial_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile / 100))]
+
+    def handle(self, event: str, backend: Backend, value):
+        """
+        Apply one event from a running backend.
+
+        Args:
+            event: "first_token", "done" (value is the reply) or "error" (value is the exception)
+
+        Returns:
+            The reply when `backend` has won, else None; raises the first
+            error once every backend has failed
+        """
+        if event == "first_token":
+            self.first_token.add(backend.name)
+            record_first_token(backend.name, time.perf_counter() - self.started[backend.name])
+            # Someone is answering; no more hedges unless it fails
+            self.due_at = None
+            return None
+
+        del self.started[backend.name]
+        if event == "done":
+            backend.breaker.success()
+            metrics.inc("ai_chat_llm_backend_requests_total", backend=backend.name, result="won")
+            return value
+
+        self.errors.append(value)
+        metrics.inc("ai_chat_llm_backend_requests_total", backend=backend.name, result="error")
+        if is_retryable(value):
+            backend.breaker.failure()
+        if not self.started and not self.waiting:
+            raise self.errors[0]
+        self.due_at = time.monotonic()
+        return None
+
+    def finish(self, backends: List[Backend]):
+        """Record the backends still running when the race ended as lost"""
+        for backend in backends:
+            start = self.started.pop(backend.name, None)
+            if start is None:
+                continue
+            metrics.inc("ai_chat_llm_backend_requests_total", backend=backend.name, result="lost")
+            # Lower bound of its time to first token, so a slow backend still raises its delay
+            if backend.name not in self.first_token:
+                record_first_token(backend.name, time.perf_counter() - start)
+
+
+class HedgedLLM:
+    """A chat model that hedges each request across OpenAI-compatible backends"""
+
+    def __init__(self, backends: List[Tuple[str, object]], percentile: Optional[float] = None, initial_delay: Optional[float] = None):
+        self.backends = [Backend(name, llm) for name, llm in backends]
+        self.percentile = flt(get_setting("hedge_percentile", DEFAULT_PERCENTILE)) if percentile is None else percentile
+        self.initial_delay = (
+            flt(get_setting("hedge_initial_delay", DEFAULT_INITIAL_DELAY)) if initial_delay is None else initial_delay
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.backends[0].llm.model_name
+
+    def _race(self) -> Race:
+        available = []
+        for backend in self.backends:
+            try:
+                backend.breaker.check()
+            except CircuitOpen:
+                continue
+            available.append(backend)
+        if not available:
+            raise CircuitOpen("The circuit of every LLM backend is open")
+        return Race(available, self.percentile, self.initial_delay)
+
+    def invoke(self, messages):
+        race = self._race()
+        events = queue.Queue()
+        cancelled = threading.Event()
+        try:
+            while True:
+                while race.is_due():
+                    slot = _stream_slots.acquire(blocking=False)
+                    if not slot and race.started:
+                        metrics.inc("ai_chat_llm_hedges_skipped_total")
+                        race.stop_hedging()
+                        break
+                    backend = race.start_next()
+                    threading.Thread(
+                        target=self._stream,
+                        args=(backend, messages, events, cancelled, slot),
+                        name=f"ai-chat-llm-{backend.name}",
+                        daemon=True,
+                    ).start()
+                try:
+                    event = events.get(timeout=race.timeout())
+                except queue.Empty:
+                    continue
+                response = race.handle(*event)
+                if response is not None:
+                    return response
+        finally:
+            cancelled.set()
+            race.finish(self.backends)
+
+    async def ainvoke(self, messages):
+        race = self._race()
+        events = asyncio.Queue()
+        tasks = []
+        try:
+            while True:
+                while race.is_due():
+                    tasks.append(asyncio.create_task(self._astream(race.start_next(), messages, events)))
+                try:
+                    event = await asyncio.wait_for(events.get(), race.timeout())
+                except asyncio.TimeoutError:
+                    continue
+                response = race.handle(*event)
+                if response is not None:
+                    return response
+        finally:
+            for task in tasks:
+                task.cancel()
+            race.finish(self.backends)
+
+    @staticmethod
+    def _stream(backend: Backend, messages, events: queue.Queue, cancelled: threading.Event, slot: bool):
+        """Stream one backend's reply on its own thread, reporting to `events`; `slot` is released when done"""
+        stream = backend.llm.stream(messages)
+        response = None
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    return
+                if response is None:
+                    events.put(("first_token", backend, None))
+                    response = chunk
+                else:
+                    response += chunk
+            if response is None:
+                raise ValueError(f"{backend.name} returned an empty stream")
+            events.put(("done", backend, response))
+        except Exception as e:
+            events.put(("error", backend, e))
+        finally:
+            # Closes the HTTP response of a backend that lost
+            stream.close()
+            if slot:
+                _stream_slots.release()
+
+    @staticmethod
+    async def _astream(backend: Backend, messages, events: asyncio.Queue):
+        response = None
+        try:
+            async for chunk in backend.llm.astream(messages):
+                if response is None:
+                    events.put_nowait(("first_token", backend, None))
+                    response = chunk
+                else:
+                    response += chunk
+            if response is None:
+                raise ValueError(f"{backend.name} returned an empty stream")
+            events.put_nowait(("done", backend, response))
+        except Exception as e:
+            events.put_nowait(("error", backend, e))
@@ -0,0 +1,242 @@
+"""
+Keep agent tool queries away from the transactional workload.
+
+Every tool is read-only, so while a tool runs its queries go to the site's
+read replica when one is configured (`read_from_replica` and `replica_host`
+in site_config.json) and each statement is limited to the tool's
+`max_statement_time`. A query stopped by the limit turns the tool's answer
+into a short "narrow it down" message instead of an error. With query plan
+capture switched on, the same wrapper times every statement for
+query_plans.py, and it adds a span per statement to the turn's trace.
+"""
+
+import time
+import frappe
+from contextlib import contextmanager
+from typing import Optional
+
+from . import query_plans, tracing
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+DEFAULT_STATEMENT_TIMEOUT = 5
+
+# Tools that legitimately scan more data get a longer limit (seconds)
+TOOL_STATEMENT_TIMEOUTS = {
+    "run_report": 60,
+    "analyze_trend": 20,
+    "get_customer_overview": 10,
+}
+
+# MariaDB ER_STATEMENT_TIMEOUT
+MARIADB_STATEMENT_TIMEOUT = 1969
+
+TIMEOUT_MESSAGE = (
+    "The query behind {tool} took longer than {seconds:g} seconds and was stopped. "
+    "Ask the user to narrow the question down, for example with a date range, a customer, "
+    "an item or a more specific search term."
+)
+
+
+def get_statement_timeout(tool_name: str) -> float:
+    """Seconds a single query of this tool may run; 0 means no limit"""
+    timeout = float(get_setting("tool_statement_timeout", DEFAULT_STATEMENT_TIMEOUT) or 0)
+    if not timeout:
+        return 0
+    return max(timeout, TOOL_STATEMENT_TIMEOUTS.get(tool_name, 0))
+
+
+def is_statement_timeout(e: BaseException) -> bool:
+    """Whether an exception (or the one it was raised from) is a statement timeout"""
+    while e is not None:
+        if e.__class__.__name__ == "QueryCanceled":
+            # psycopg2, raised for statement_timeout on Postgres
+            return True
+        if e.args and e.args[0] == MARIADB_STATEMENT_TIMEOUT:
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+def set_statement_timeout(db, seconds: float):
+    """Set (or with 0, clear) the per-statement time limit of a connection's session"""
+    if frappe.conf.db_type == "postgres":
+        db.sql("SET statement_timeout = %s", int(seconds * 1000))
+    else:
+        db.sql("SET SESSION max_statement_time = %s", seconds)
+
+
+def get_session_statement_timeout(db) -> float:
+    """The current per-statement time limit of a connection's session in seconds, 0 when unlimited"""
+    if frappe.conf.db_type == "postgres":
+        # pg_settings reports statement_timeout in milliseconds
+        return float(db.sql("SELECT setting FROM pg_settings WHERE name = 'statement_timeout'")[0][0]) / 1000
+    return float(db.sql("SELECT @@SESSION.max_statement_time")[0][0] or 0)
+
+
+def get_replica(context):
+    """
+    The read replica connection for this chat turn, opened on first use.
+
+    Returns:
+        A Database connection, or None when no replica is configured or it
+        cannot be reached (tools then run on the primary)
+    """
+    if not frappe.conf.read_from_replica or not frappe.conf.replica_host:
+        return None
+
+    if context.replica_db is None:
+        primary = frappe.local.db
+        try:
+            frappe.connect_replica()
+            context.replica_db = frappe.local.db if frappe.local.db is not primary else False
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "AI Chat Read Replica")
+            context.replica_db = False
+        finally:
+            # Only tools use the replica; the rest of the request stays on the primary
+            frappe.local.db = primary
+    return context.replica_db or None
+
+
+def close_replica(context):
+    """Close the turn's replica connection"""
+    if context.replica_db:
+        context.replica_db.close()
+        for attr in ("replica_db", "primary_db"):
+            if hasattr(frappe.local, attr):
+                delattr(frappe.local, attr)
+    context.replica_db = None
+
+
+class QueryGuard:
+    """Applies one tool's statement timeout to the connections it uses and records timeouts"""
+
+    def __init__(self, tool_name: str, timeout: float, use_replica: bool, capture: bool = False):
+        self.tool_name = tool_name
+        self.timeout = timeout
+        self.use_replica = use_replica
+        self.capture = capture
+        self.timed_out = False
+        self.primary_db = None
+
+    @property
+    def message(self) -> str:
+        return TIMEOUT_MESSAGE.format(tool=self.tool_name, seconds=self.timeout)
+
+    @contextmanager
+    def watch(self, db):
+        """Limit statements on `db` and note any that time out, whether or not the tool catches it"""
+        original = db.__dict__.get("sql")
+        sql = db.sql
+
+        def watched_sql(*args, **kwargs):
+            start, error = time.perf_counter(), None
+            try:
+                return sql(*args, **kwargs)
+            except Exception as e:
+                error = f"{e.__class__.__name__}: {e}"
+                if is_statement_timeout(e):
+                    self.timed_out = True
+                raise
+            finally:
+                end = time.perf_counter()
+                tracing.add_sql_span(args[0] if args else kwargs.get("query"), start, end, error)
+                if self.capture:
+                    self.record(sql, args, kwargs, (end - start) * 1000)
+
+        if self.timeout:
+            # Put back whatever limit the session had, e.g. one set by the site's db config
+            previous_timeout = get_session_statement_timeout(db)
+            set_statement_timeout(db, self.timeout)
+        db.sql = watched_sql
+        try:
+            yield
+        finally:
+            if original is None:
+                db.__dict__.pop("sql", None)
+            else:
+                db.sql = original
+            if self.timeout:
+                try:
+                    set_statement_timeout(db, previous_timeout)
+                except Exception:
+                    # A broken connection is discarded anyway
+                    pass
+
+    def record(self, sql, args, kwargs, duration_ms: float):
+        query = args[0] if args else kwargs.get("query")
+        values = args[1] if len(args) > 1 else kwargs.get("values", ())
+        try:
+            query_plans.record(self.tool_name, query, values, duration_ms, sql)
+        except Exception:
+            # Diagnostics must not break the tool; stop capturing for the rest of this call
+            self.capture = False
+            frappe.log_error(frappe.get_traceback(), "AI Chat Query Plans")
+
+    @contextmanager
+    def in_thread(self):
+        """Apply the guard to a worker thread's own connection (see concurrency.run_concurrently)"""
+        switched = False
+        if self.use_replica:
+            try:
+                switched = frappe.connect_replica() is not False and hasattr(frappe.local, "primary_db")
+            except Exception:
+                frappe.log_error(frappe.get_traceback(), "AI Chat Read Replica")
+        try:
+            with self.watch(frappe.local.db):
+                yield
+        finally:
+            if switched:
+                frappe.local.db.close()
+                frappe.local.db = frappe.local.primary_db
+
+
+def get_active_guard() -> Optional[QueryGuard]:
+    """The guard of the tool currently running in this request, if any"""
+    return getattr(frappe.local, "ai_chat_query_guard", None)
+
+
+@contextmanager
+def tool_queries(tool_name: str, context):
+    """
+    Run a tool's queries on the read replica with its statement timeout.
+
+    Args:
+        tool_name: Name of the tool being run
+        context: ToolContext of the current turn, which holds the replica connection
+
+    Yields:
+        QueryGuard; check `timed_out` after the tool returns
+    """
+    replica = get_replica(context)
+    guard = QueryGuard(
+        tool_name, get_statement_timeout(tool_name), use_replica=bool(replica), capture=query_plans.is_enabled()
+    )
+
+    guard.primary_db = primary = frappe.local.db
+    if replica:
+        frappe.local.db = replica
+    frappe.local.ai_chat_query_guard = guard
+    try:
+        with guard.watch(frappe.local.db):
+            yield guard
+    finally:
+        frappe.local.ai_chat_query_guard = None
+        frappe.local.db = primary
+
+
+@contextmanager
+def on_primary():
+    """Switch back to the primary inside a tool for the rare write, e.g. queueing a prepared report"""
+    guard = get_active_guard()
+    if not guard or guard.primary_db is None or frappe.local.db is guard.primary_db:
+        yield
+        return
+
+    replica = frappe.local.db
+    frappe.local.db = guard.primary_db
+    try:
+        yield
+    finally:
+        frappe.local.db = replica
@@ -1,5 +1,4 @@
 import frappe
-from langchain_core.messages import HumanMessage, AIMessage
 from datetime import datetime
 import json
 
@@ -37,20 +36,26 @@ class ConversationMemoryManager:
         
         return session.name
     
-    def add_message(self, message_type, content):
-        """Add a message to the conversation history"""
+    def add_message(self, message_type, content, result=None):
+        """Add a message to the conversation history, with the structured tool result if any"""
         message = frappe.get_doc({
             "doctype": "AI Chat Message",
             "session": self.session_id,
             "message_type": message_type.capitalize(),
             "content": content,
+            "result_data": frappe.as_json(result, indent=None) if result else None,
             "user": self.user
         })
         message.insert(ignore_permissions=True)
         frappe.db.commit()
+        
+        return message.name
     
     def get_messages(self, limit=20):
         """Retrieve conversation history"""
+        # Only turns need langchain; listing sessions and exports do not
+        from langchain_core.messages import HumanMessage, AIMessage
+        
         messages = frappe.get_all(
             "AI Chat Message",
             filters={"session": self.session_id},
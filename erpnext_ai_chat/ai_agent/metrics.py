@@ -0,0 +1,151 @@
+"""
+Metrics for the chat subsystem in Prometheus format.
+
+Counters and histograms are recorded in a per-process buffer and added to a
+Redis hash with HINCRBYFLOAT when a turn ends (or every FLUSH_INTERVAL
+seconds), so every web and background worker of the site contributes to the
+same totals. api/metrics.py renders the hash in the Prometheus text
+exposition format.
+"""
+
+import threading
+import time
+import frappe
+from collections import defaultdict
+from typing import Dict, Tuple
+
+
+REDIS_KEY = "ai_chat_metrics"
+
+# Seconds between automatic flushes of the process buffer
+FLUSH_INTERVAL = 10
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# name: (type, help, buckets)
+METRICS = {
+    "ai_chat_turn_seconds": ("histogram", "Time to answer a chat message, from send_message to the reply", LATENCY_BUCKETS),
+    "ai_chat_turns_total": ("counter", "Chat messages answered", None),
+    "ai_chat_worker_turn_seconds": ("histogram", "Time a queued turn took once a worker picked it up", LATENCY_BUCKETS),
+    "ai_chat_tool_seconds": ("histogram", "Time spent running a tool", LATENCY_BUCKETS),
+    "ai_chat_llm_seconds": ("histogram", "Time spent in one LLM call", LATENCY_BUCKETS),
+    "ai_chat_llm_first_token_seconds": ("histogram", "Time to the first streamed token, per LLM backend", LATENCY_BUCKETS),
+    "ai_chat_llm_backend_requests_total": ("counter", "Hedged LLM requests per backend and outcome (won, lost, error)", None),
+    "ai_chat_llm_hedges_skipped_total": ("counter", "Hedges not started because too many stream threads were in flight", None),
+    "ai_chat_llm_tokens_total": ("counter", "Tokens sent to and received from the LLM", None),
+    "ai_chat_errors_total": ("counter", "Errors by pipeline stage", None),
+    "ai_chat_fallbacks_total": ("counter", "Turns that took a fallback path", None),
+    "ai_chat_cache_requests_total": ("counter", "Cache lookups by cache and result (hit or miss)", None),
+}
+
+# A worker can serve several sites, so the buffer is kept per site
+_buffers: Dict[str, Dict[Tuple[str, str, str], float]] = defaultdict(lambda: defaultdict(float))
+_last_flush: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increase a counter"""
+    _add(name, format_labels(labels), "", amount)
+
+
+def observe(name: str, value: float, **labels):
+    """Record one observation of a histogram"""
+    label_text = format_labels(labels)
+    bucket = next((le for le in METRICS[name][2] if value <= le), "+Inf")
+    _add(name, label_text, f"bucket:{bucket}", 1)
+    _add(name, label_text, "sum", value)
+    _add(name, label_text, "count", 1)
+
+
+def cache_lookup(cache: str, hit: bool):
+    inc("ai_chat_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def _add(name: str, label_text: str, suffix: str, amount: float):
+    site = frappe.local.site
+    with _lock:
+        _buffers[site][(name, label_text, suffix)] += amount
+        last_flush = _last_flush.setdefault(site, time.monotonic())
+    if time.monotonic() - last_flush > FLUSH_INTERVAL:
+        flush()
+
+
+def flush():
+    """Add this process's buffer for the current site to the site's totals in Redis"""
+    site = frappe.local.site
+    with _lock:
+        pending = _buffers.pop(site, None)
+        _last_flush[site] = time.monotonic()
+    if not pending:
+        return
+
+    try:
+        cache = frappe.cache()
+        pipeline = cache.pipeline()
+        key = cache.make_key(REDIS_KEY)
+        for (name, label_text, suffix), amount in pending.items():
+            pipeline.hincrbyfloat(key, f"{name}\t{label_text}\t{suffix}", amount)
+        pipeline.execute()
+    except Exception:
+        # Metrics are best effort; losing one flush must not fail the request
+        frappe.log_error(frappe.get_traceback(), "AI Chat Metrics")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(
+        f'{key}="{_escape(value)}"' for key, value in sorted(labels.items()) if value is not None
+    )
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render() -> str:
+    """All metrics of the site in the Prometheus text exposition format"""
+    cache = frappe.cache()
+    # RedisWrapper.hgetall unpickles values; the pipeline returns the raw floats
+    pipeline = cache.pipeline()
+    pipeline.hgetall(cache.make_key(REDIS_KEY))
+    raw = pipeline.execute()[0] or {}
+
+    series = defaultdict(dict)
+    for field, value in raw.items():
+        name, label_text, suffix = frappe.safe_decode(field).split("\t")
+        series[name][(label_text, suffix)] = float(value)
+
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        values = series.get(name) or {}
+
+        if metric_type == "counter":
+            for (label_text, _), value in sorted(values.items()):
+                lines.append(f"{name}{_braces(label_text)} {_number(value)}")
+            continue
+
+        for label_text in sorted({label_text for label_text, _ in values}):
+            cumulative = 0
+            for le in buckets + ("+Inf",):
+                cumulative += values.get((label_text, f"bucket:{le}"), 0)
+                le_label = f'le="{le}"'
+                lines.append(f"{name}_bucket{_braces(label_text, le_label)} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_braces(label_text)} {_number(values.get((label_text, 'sum'), 0))}")
+            lines.append(f"{name}_count{_braces(label_text)} {_number(values.get((label_text, 'count'), 0))}")
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    frappe.cache().delete_value(REDIS_KEY)
+
+
+def _braces(*parts: str) -> str:
+    text = ",".join(part for part in parts if part)
+    return f"{{{text}}}" if text else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
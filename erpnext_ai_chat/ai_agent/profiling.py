@@ -0,0 +1,237 @@
+"""
+Opt-in profiling of chat turns.
+
+A turn is profiled when its user is listed under Profile Users in AI Chat
+Settings, or when a System Manager sends it with `profile=1`. Two modes:
+
+- Sampling (default): a background thread records the request thread's
+  stack every few milliseconds; low overhead, saved as folded stacks
+  ("a;b;c 12" per line) that flamegraph.pl and speedscope read directly.
+- Deterministic: cProfile for the whole turn; exact call counts at a much
+  higher overhead, saved as a pstats file for snakeviz or pstats.
+
+The profile is saved as a private File attached to the turn's AI Chat
+Message. Both modes stop after Max Profile Seconds, and a daily job removes
+profiles past retention.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import frappe
+from collections import Counter
+from contextlib import contextmanager
+from frappe.utils import add_days, cint, flt, now_datetime
+
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+FILE_PREFIX = "ai-chat-profile-"
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_MAX_SECONDS = 30
+DEFAULT_RETENTION_DAYS = 7
+
+# Frames kept per sample, innermost first; deeper stacks are cut at the root
+MAX_DEPTH = 100
+
+
+def should_profile(user: str, requested=False) -> bool:
+    if not cint(get_setting("enable_profiling", 0)):
+        return False
+    if cint(requested) and "System Manager" in frappe.get_roles():
+        return True
+    profile_users = (get_setting("profile_users") or "").split()
+    return user in profile_users
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread"""
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self.truncated = False
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, name="ai-chat-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                self.truncated = True
+                return
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                return
+            self.stacks[fold(frame)] += 1
+            self.samples += 1
+
+    def output(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class DeterministicProfiler(cProfile.Profile):
+    """cProfile that stops recording after max_seconds, like SamplingProfiler"""
+
+    def __init__(self, max_seconds: float):
+        # The clock is called on the profiled thread at every event, where the hook can be removed
+        super().__init__(self._clock)
+        self.max_seconds = max_seconds
+        self.truncated = False
+        self._deadline = None
+
+    def enable(self, *args, **kwargs):
+        self._deadline = time.perf_counter() + self.max_seconds
+        super().enable(*args, **kwargs)
+
+    def _clock(self) -> float:
+        now = time.perf_counter()
+        if self._deadline is not None and now > self._deadline and not self.truncated:
+            self.truncated = True
+            if sys.version_info >= (3, 12):
+                sys.monitoring.set_events(sys.monitoring.PROFILER_ID, 0)
+            else:
+                sys.setprofile(None)
+        return now
+
+
+def fold(frame) -> str:
+    """A stack as "outer;...;inner" with one "function (file:line)" entry per frame"""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def short_path(path: str) -> str:
+    for marker in ("/site-packages/", "/apps/"):
+        if marker in path:
+            return path.rsplit(marker, 1)[1]
+    return os.path.basename(path)
+
+
+class TurnProfile:
+    """Profiler of one chat turn, saved as a file attached to the turn's message"""
+
+    def __init__(self, user: str):
+        self.user = user
+        self.message = None
+        self.session = None
+        self.file_url = None
+        self.mode = get_setting("profiling_mode", "Sampling")
+        self.started = None
+        self.duration = 0
+        max_seconds = flt(get_setting("max_profile_seconds", DEFAULT_MAX_SECONDS)) or DEFAULT_MAX_SECONDS
+        if self.mode == "Deterministic":
+            self.profiler = DeterministicProfiler(max_seconds)
+        else:
+            self.profiler = SamplingProfiler(
+                max(flt(get_setting("profile_interval_ms", DEFAULT_INTERVAL_MS)), 1) / 1000,
+                max_seconds,
+            )
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.mode == "Deterministic":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self):
+        if self.mode == "Deterministic":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self):
+        if self.mode == "Deterministic":
+            self.profiler.create_stats()
+            content, extension = marshal.dumps(self.profiler.stats), "prof"
+        else:
+            content, extension = self.profiler.output(), "folded"
+
+        # Attached to the AI message of the turn, or to the session when the turn failed before saving one
+        doctype, name = ("AI Chat Message", self.message) if self.message else ("AI Chat Session", self.session)
+        file = frappe.get_doc({
+            "doctype": "File",
+            "file_name": f"{FILE_PREFIX}{now_datetime().strftime('%Y%m%d-%H%M%S')}-{frappe.generate_hash(length=6)}.{extension}",
+            "attached_to_doctype": doctype if name else None,
+            "attached_to_name": name,
+            "content": content,
+            "is_private": 1,
+        })
+        file.insert(ignore_permissions=True)
+        self.file_url = file.file_url
+
+    def summary(self, limit: int = 20) -> str:
+        """Hottest functions as text, for a quick look without downloading the file"""
+        if self.mode == "Deterministic":
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+            return out.getvalue()
+
+        own = Counter()
+        for stack, count in self.profiler.stacks.items():
+            own[stack.rsplit(";", 1)[-1]] += count
+        total = self.profiler.samples or 1
+        return "\n".join(f"{count * 100 / total:5.1f}%  {name}" for name, count in own.most_common(limit))
+
+
+@contextmanager
+def profile_turn(user: str, requested=False):
+    """
+    Profile one chat turn when profiling applies to it (see should_profile).
+
+    Yields:
+        The TurnProfile, or None when the turn is not profiled; set its
+        message (or session) so the saved file is attached to the turn
+    """
+    if not should_profile(user, requested):
+        yield None
+        return
+
+    profile = TurnProfile(user)
+    profile.start()
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        try:
+            profile.save()
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "AI Chat Profile")
+
+
+def delete_old_profiles():
+    """Daily: remove profiles past retention"""
+    days = cint(get_setting("profile_retention_days", DEFAULT_RETENTION_DAYS))
+    if days <= 0:
+        return
+    files = frappe.get_all(
+        "File",
+        filters={"file_name": ["like", f"{FILE_PREFIX}%"], "creation": ["<", add_days(now_datetime(), -days)]},
+        pluck="name",
+    )
+    for name in files:
+        frappe.delete_doc("File", name, ignore_permissions=True)
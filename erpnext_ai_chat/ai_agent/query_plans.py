@@ -0,0 +1,225 @@
+"""
+Query plan advisor for agent tool queries.
+
+When "Capture Query Plans" is switched on in AI Chat Settings, every SELECT a
+tool issues is timed and grouped by its normalised shape (literals and
+placeholders replaced by ?). The first statement of each shape, and a sample
+of later ones, is run through EXPLAIN and the plan is checked for full scans,
+filesorts and temporary tables, with a suggested composite index built from
+the query's equality, range and ORDER BY columns. The aggregate lives in
+Redis and is shown on the AI Query Plans desk page and by
+`bench --site <site> ai-chat-query-plans`.
+"""
+
+import hashlib
+import random
+import re
+import frappe
+from frappe.utils import cint, flt
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+CACHE_KEY = "ai_chat_query_plans"
+DEFAULT_SAMPLE_RATE = 0.1
+
+# Distinct query shapes kept; new shapes are ignored once this is reached
+MAX_SHAPES = 500
+
+# Columns in a suggested index
+MAX_INDEX_COLUMNS = 4
+
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+`(tab[^`]+)`(?:\s+(?:AS\s+)?(?!(?:WHERE|INNER|LEFT|RIGHT|JOIN|ON|GROUP|ORDER|LIMIT)\b)(\w+))?", re.I)
+_COLUMN = r"(?:(?:`(?P<table>[^`]+)`|(?P<alias>\w+))\.)?`?(?P<column>\w+)`?"
+_EQUALITY_PATTERN = re.compile(_COLUMN + r"\s*(?:=|\bIN\b|\bIS\b)", re.I)
+_RANGE_PATTERN = re.compile(_COLUMN + r"\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\b)", re.I)
+_ORDER_PATTERN = re.compile(_COLUMN + r"(?:\s+(?:ASC|DESC))?\s*(?:,|$)", re.I)
+
+
+def is_enabled() -> bool:
+    return bool(cint(get_setting("capture_query_plans", 0)))
+
+
+def normalise_query(query: str) -> str:
+    """The shape of a query: literals, placeholders and IN lists replaced by ?"""
+    shape = re.sub(r"'(?:[^'\\]|\\.|'')*'", "?", query)
+    shape = re.sub(r"%\(\w+\)s|%s", "?", shape)
+    shape = re.sub(r"(?<![\w`])-?\d+(?:\.\d+)?\b", "?", shape)
+    shape = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", shape)
+    return re.sub(r"\s+", " ", shape).strip()
+
+
+def get_shape_key(shape: str) -> str:
+    return hashlib.sha1(shape.encode()).hexdigest()[:16]
+
+
+def record(tool_name: str, query, values, duration_ms: float, sql: Callable):
+    """
+    Add one executed statement to the aggregate.
+
+    Args:
+        tool_name: Tool that issued the statement
+        query: SQL as passed to frappe.db.sql
+        values: Its parameters
+        duration_ms: Execution time
+        sql: Unwatched frappe.db.sql of the same connection, used for EXPLAIN
+    """
+    query = str(query)
+    if not query.lstrip().upper().startswith("SELECT"):
+        return
+
+    shape = normalise_query(query)
+    key = get_shape_key(shape)
+    cache = frappe.cache()
+    entry = cache.hget(CACHE_KEY, key)
+    if entry is None:
+        if len(cache.hkeys(CACHE_KEY)) >= MAX_SHAPES:
+            return
+        entry = {
+            "shape": shape, "tools": [], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "plan": None, "findings": [], "suggestions": [], "explained": 0,
+        }
+
+    entry["count"] += 1
+    entry["total_ms"] += duration_ms
+    entry["max_ms"] = max(entry["max_ms"], duration_ms)
+    if tool_name not in entry["tools"]:
+        entry["tools"].append(tool_name)
+
+    sample_rate = flt(get_setting("query_plan_sample_rate", DEFAULT_SAMPLE_RATE))
+    if entry["plan"] is None or random.random() < sample_rate:
+        plan = explain(query, values, sql)
+        if plan is not None:
+            entry["plan"] = plan
+            entry["findings"], entry["suggestions"] = analyse(query, plan)
+            entry["explained"] += 1
+
+    cache.hset(CACHE_KEY, key, entry)
+
+
+def explain(query: str, values, sql: Callable) -> Optional[List[Dict[str, Any]]]:
+    try:
+        plan = sql(f"EXPLAIN {query}", values, as_dict=True)
+    except Exception:
+        # EXPLAIN is best effort; a statement it cannot explain is still counted
+        return None
+    return [{key: _to_plain(value) for key, value in row.items()} for row in plan]
+
+
+def analyse(query: str, plan: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """
+    Find full scans, filesorts and temporary tables in an EXPLAIN output.
+
+    Returns:
+        (findings, suggested ALTER TABLE statements)
+    """
+    if plan and "QUERY PLAN" in plan[0]:
+        return _analyse_postgres(plan), []
+
+    aliases = get_table_aliases(query)
+    findings, suggestions = [], []
+    for row in plan:
+        table = aliases.get(row.get("table"), row.get("table"))
+        access = (row.get("type") or "").upper()
+        extra = row.get("Extra") or ""
+
+        if access == "ALL":
+            findings.append(f"Full table scan of {table} (~{row.get('rows')} rows)")
+        elif access == "INDEX":
+            findings.append(f"Full index scan of {table} using {row.get('key')} (~{row.get('rows')} rows)")
+        if "filesort" in extra:
+            findings.append(f"Filesort on {table}")
+        if "temporary" in extra:
+            findings.append(f"Temporary table for {table}")
+
+        if table and table.startswith("tab") and (access in ("ALL", "INDEX") or "filesort" in extra):
+            columns = suggest_index_columns(query, table, aliases)
+            if columns and columns != [row.get("key")]:
+                statement = f"ALTER TABLE `{table}` ADD INDEX ({', '.join(f'`{column}`' for column in columns)})"
+                if statement not in suggestions:
+                    suggestions.append(statement)
+    return findings, suggestions
+
+
+def _analyse_postgres(plan: List[Dict[str, Any]]) -> List[str]:
+    findings = []
+    for row in plan:
+        line = row["QUERY PLAN"].strip(" ->")
+        if line.startswith("Seq Scan on") or line.startswith("Sort ") or "Materialize" in line:
+            findings.append(line)
+    return findings
+
+
+def get_table_aliases(query: str) -> Dict[str, str]:
+    """Map each table name and alias in the query to its table"""
+    aliases = {}
+    for table, alias in _TABLE_PATTERN.findall(query):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def suggest_index_columns(query: str, table: str, aliases: Dict[str, str]) -> List[str]:
+    """
+    A composite index for one table: equality columns first, then one range
+    column, or the ORDER BY columns when there is no range condition.
+    """
+    single_table = len(set(aliases.values())) == 1
+
+    def columns_of(pattern, text):
+        columns = []
+        for match in pattern.finditer(text):
+            qualifier = match.group("table") or match.group("alias")
+            if qualifier is None and not single_table:
+                continue
+            if qualifier is not None and aliases.get(qualifier) != table:
+                continue
+            column = match.group("column")
+            if column not in columns:
+                columns.append(column)
+        return columns
+
+    where = _clause(query, "WHERE", ("GROUP BY", "HAVING", "ORDER BY", "LIMIT"))
+    order_by = _clause(query, "ORDER BY", ("LIMIT",))
+
+    columns = columns_of(_EQUALITY_PATTERN, where)
+    ranges = [column for column in columns_of(_RANGE_PATTERN, where) if column not in columns]
+    if ranges:
+        columns.append(ranges[0])
+    else:
+        columns.extend(column for column in columns_of(_ORDER_PATTERN, order_by) if column not in columns)
+    return columns[:MAX_INDEX_COLUMNS]
+
+
+def _clause(query: str, keyword: str, ends: Tuple[str, ...]) -> str:
+    # The last occurrence, so a subquery in the select list does not hide the outer clause
+    matches = list(re.finditer(rf"\b{keyword}\b", query, re.I))
+    if not matches:
+        return ""
+    text = query[matches[-1].end():]
+    for end in ends:
+        text = re.split(rf"\b{end}\b", text, flags=re.I)[0]
+    return text.strip()
+
+
+def get_report(limit: int = 50) -> List[Dict[str, Any]]:
+    """Captured query shapes, slowest in total first"""
+    entries = list((frappe.cache().hgetall(CACHE_KEY) or {}).values())
+    for entry in entries:
+        entry["avg_ms"] = entry["total_ms"] / entry["count"] if entry["count"] else 0
+    entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+    return entries[:limit]
+
+
+def clear():
+    frappe.cache().delete_value(CACHE_KEY)
+
+
+def _to_plain(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if hasattr(value, "as_integer_ratio"):
+        return float(value)
+    return str(value)
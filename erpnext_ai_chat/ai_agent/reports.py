@@ -0,0 +1,222 @@
+"""
+Running ERPNext reports for the agent.
+
+Query and Script reports are executed through frappe.desk.query_report, so
+the report's own SQL and permission checks apply. Reports marked as Prepared
+Report run in the background: the first request queues them and a later one
+picks up the finished result. Summaries are cached per report, filters and
+the user's roles and user permissions.
+"""
+
+import frappe
+import hashlib
+import json
+from urllib.parse import quote, urlencode
+from typing import Any, Dict, List, Optional, Union
+
+from . import metrics
+from .isolation import on_primary
+from .results import ToolResult
+
+
+CACHE_KEY = "ai_chat_report"
+CACHE_TTL = 10 * 60
+
+# Rows kept from a report; the link opens the full output
+MAX_ROWS = 100
+
+
+def parse_filters(filters: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+    """Accept filters as a dict, a JSON object or "field=value,field2=value2"."""
+    if not filters:
+        return {}
+    if isinstance(filters, dict):
+        return filters
+    filters = filters.strip()
+    if filters.startswith("{"):
+        return json.loads(filters)
+    parsed = {}
+    for part in filters.split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            parsed[key.strip()] = value.strip()
+    return parsed
+
+
+def get_cache_key(report_name: str, filters: Dict[str, Any], context) -> str:
+    """Results depend on the filters and on what the user may see"""
+    from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+
+    user_permissions = get_user_permissions(context.user)
+    fingerprint = json.dumps(
+        [report_name, filters, sorted(context.roles), user_permissions],
+        sort_keys=True,
+        default=str,
+    )
+    return f"{CACHE_KEY}:{hashlib.sha1(fingerprint.encode()).hexdigest()}"
+
+
+def get_report_url(report_name: str, filters: Dict[str, Any], prepared_report: Optional[str] = None) -> str:
+    params = {key: value for key, value in filters.items() if not isinstance(value, (list, dict))}
+    if prepared_report:
+        params["prepared_report_name"] = prepared_report
+    query = f"?{urlencode(params)}" if params else ""
+    return f"/app/query-report/{quote(report_name)}{query}"
+
+
+def run_report(report_name: str, filters: Union[str, Dict[str, Any], None], context) -> Union[ToolResult, str]:
+    """
+    Run a report and summarise its output.
+
+    Args:
+        report_name: Name of the Report
+        filters: Report filters; the user's default company is added when missing
+        context: ToolContext of the current turn
+
+    Returns:
+        ToolResult with the first rows, report summary and a link to the full
+        report, or a message while a prepared report is still running
+    """
+    from frappe.desk.query_report import run
+
+    # query_report.run only shows a message and returns None when the user may not run the report
+    report = frappe.get_cached_doc("Report", report_name)
+    if not report.is_permitted() or (
+        report.ref_doctype and not frappe.has_permission(report.ref_doctype, "report", user=context.user)
+    ):
+        raise frappe.PermissionError
+
+    filters = parse_filters(filters)
+    if context.default_company and "company" not in filters:
+        filters["company"] = context.default_company
+
+    cache_key = get_cache_key(report_name, filters, context)
+    cached = frappe.cache().get_value(cache_key)
+    metrics.cache_lookup("report", bool(cached))
+    if cached:
+        return ToolResult.from_dict(cached)
+
+    output = run(report_name, filters=filters, user=context.user)
+    if not output:
+        raise frappe.PermissionError
+
+    if output.get("prepared_report"):
+        doc = output.get("doc")
+        if not doc:
+            # Tools run on the read replica; the Prepared Report has to be written to the primary
+            with on_primary():
+                doc = queue_prepared_report(report_name, filters)
+            return (
+                f"{report_name} is a heavy report, so it has been started in the background "
+                f"({doc}). Ask again in a minute for the result, or open {get_report_url(report_name, filters)}."
+            )
+        if doc.get("status") != "Completed":
+            return f"{report_name} is still running ({doc.get('status')}). Ask again shortly for the result."
+
+    result = summarise(report_name, filters, output)
+    frappe.cache().set_value(cache_key, result.as_dict(), expires_in_sec=CACHE_TTL)
+    return result
+
+
+def queue_prepared_report(report_name: str, filters: Dict[str, Any]) -> str:
+    """Start a Prepared Report in the background and return its name"""
+    try:
+        from frappe.core.doctype.prepared_report.prepared_report import make_prepared_report
+
+        return make_prepared_report(report_name, filters)["name"]
+    except ImportError:
+        # Older Frappe versions
+        from frappe.desk.query_report import background_enqueue_run
+
+        return background_enqueue_run(report_name, json.dumps(filters))["name"]
+
+
+def summarise(report_name: str, filters: Dict[str, Any], output: Dict[str, Any]) -> ToolResult:
+    columns = normalise_columns(output.get("columns") or [])
+    data = [_as_list(row, columns) for row in output.get("result") or []]
+
+    # The report's own total row (add_total_row) covers every row, not only the ones shown
+    totals = {}
+    if data and _is_total_row(data[-1]):
+        total_row = data.pop()
+        totals = {
+            col["fieldname"]: value for col, value in zip(columns, total_row)
+            if col["fieldtype"] in ("Currency", "Float", "Int") and isinstance(value, (int, float))
+        }
+    rows = data[:MAX_ROWS]
+
+    properties = [["Filters", ", ".join(f"{k}={v}" for k, v in filters.items())]]
+    for item in output.get("report_summary") or []:
+        properties.append([item.get("label"), _to_plain(item.get("value"))])
+
+    prepared_report = (output.get("doc") or {}).get("name") if output.get("prepared_report") else None
+    return ToolResult(
+        title=f"{report_name} ({len(data)} rows{', first ' + str(MAX_ROWS) + ' shown' if len(data) > MAX_ROWS else ''})",
+        columns=columns,
+        rows=rows,
+        totals=totals,
+        message=output.get("message") if isinstance(output.get("message"), str) else None,
+        properties=properties,
+        links=[{"label": f"Open full {report_name} report", "url": get_report_url(report_name, filters, prepared_report)}],
+        chart=_chart(output.get("chart")),
+        source={
+            "title": report_name,
+            "report": report_name,
+            "filters": filters,
+            "columns": [{"fieldname": col["fieldname"], "label": col["label"]} for col in columns],
+        },
+    )
+
+
+def normalise_columns(columns: List[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Report columns as dicts; string columns look like "Label:Fieldtype/Options:Width" """
+    normalised = []
+    for col in columns:
+        if isinstance(col, str):
+            parts = col.split(":")
+            fieldtype, _, options = (parts[1] if len(parts) > 1 else "Data").partition("/")
+            col = {"label": parts[0], "fieldtype": fieldtype or "Data", "options": options}
+        col = {key: col.get(key) for key in ("fieldname", "label", "fieldtype", "options")}
+        col["fieldname"] = col["fieldname"] or frappe.scrub(col["label"] or "")
+        col["fieldtype"] = col["fieldtype"] or "Data"
+        col["options"] = col["options"] or ""
+        normalised.append(col)
+
+    # Currency options naming a field the report does not return fall back to the default currency
+    fieldnames = {col["fieldname"] for col in normalised}
+    for col in normalised:
+        if col["fieldtype"] == "Currency" and col["options"] not in fieldnames and len(col["options"]) != 3:
+            col["options"] = ""
+    return normalised
+
+
+def _as_list(row, columns: List[Dict[str, Any]]) -> List[Any]:
+    if isinstance(row, dict):
+        return [_to_plain(row.get(col["fieldname"])) for col in columns]
+    values = [_to_plain(value) for value in list(row)[:len(columns)]]
+    return values + [None] * (len(columns) - len(values))
+
+
+def _is_total_row(row: List[Any]) -> bool:
+    return bool(row) and isinstance(row[0], str) and row[0].strip("' ").lower() == "total"
+
+
+def _chart(chart: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Reports return Frappe Charts config in their own shape; flatten it for the chat client"""
+    if not chart or not chart.get("data"):
+        return None
+    return {
+        "type": chart.get("type") or "bar",
+        "title": chart.get("title") or "",
+        "labels": chart["data"].get("labels") or [],
+        "datasets": chart["data"].get("datasets") or [],
+        "height": 300,
+    }
+
+
+def _to_plain(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if hasattr(value, "as_integer_ratio"):
+        return float(value)
+    return str(value)
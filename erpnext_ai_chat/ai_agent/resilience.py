@@ -0,0 +1,259 @@
+"""
+Timeouts, retries, rate limits and a circuit breaker around LLM calls.
+
+ResilientLLM wraps the chat model built by ERPNextAgent._initialize_llm:
+
+- every call has the client timeout from AI Chat Settings, and the client's
+  own retries are off so the policy below is the only one;
+- retryable failures (timeouts, connection errors, 408/409/429/5xx) are
+  retried with full-jitter exponential backoff, honouring Retry-After;
+- a token bucket per user and one per site, kept in Redis so they hold
+  across all web and chat workers, limit LLM calls per minute;
+- a circuit breaker, also in Redis, opens after consecutive provider
+  failures and fails calls fast until the cooldown has passed; the first
+  failure after reopening trips it again at once.
+
+Calls that are refused or fail for good raise LLMUnavailable, which the
+agent turns into a degraded answer: the tool's table summarised locally,
+the user's recent answer to the same question, or a short apology.
+"""
+
+import asyncio
+import random
+import time
+import frappe
+from frappe.utils import add_to_date, cint, flt, now_datetime
+from typing import Optional
+
+from . import metrics
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_USER_RATE_LIMIT = 20
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+
+# Failures within this many seconds count as consecutive for the breaker
+FAILURE_WINDOW = 60
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "Timeout", "TimeoutError", "ConnectTimeout", "ReadTimeout", "ConnectionError"}
+
+# KEYS[1]: bucket; ARGV: tokens per second, capacity, now. Returns {allowed, seconds to wait}
+TOKEN_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class LLMUnavailable(Exception):
+    """An LLM call was refused or failed after retries; the turn should degrade"""
+
+    reason = "unavailable"
+    user_message = "The AI service is not responding right now. Please try again in a minute."
+
+
+class CircuitOpen(LLMUnavailable):
+    reason = "circuit_open"
+
+
+class RateLimited(LLMUnavailable):
+    reason = "rate_limited"
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"{scope} rate limit reached, retry in {retry_after:.0f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+    @property
+    def user_message(self):
+        if self.scope == "user":
+            return f"You are sending messages faster than allowed. Please try again in {max(1, round(self.retry_after))} seconds."
+        return "The AI assistant is very busy right now. Please try again in a minute."
+
+
+def is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status:
+        return status in RETRYABLE_STATUS
+    return e.__class__.__name__ in RETRYABLE_ERRORS or isinstance(e, (TimeoutError, ConnectionError))
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): full jitter, or the server's Retry-After"""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def take_token(scope: str, name: str, per_minute: int) -> float:
+    """
+    Take one call from a Redis token bucket allowing `per_minute` calls with bursts of as many.
+
+    Returns:
+        0 when the call may go ahead, else the seconds until a token is free
+    """
+    if per_minute <= 0:
+        return 0
+    cache = frappe.cache()
+    allowed, wait = cache.eval(
+        TOKEN_BUCKET, 1, cache.make_key(f"ai_chat_llm_bucket:{scope}:{name}"), per_minute / 60, per_minute, time.time()
+    )
+    return 0 if int(allowed) else float(wait)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker shared by all workers of the site through Redis"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.threshold = cint(get_setting("circuit_breaker_threshold", DEFAULT_BREAKER_THRESHOLD))
+        self.cooldown = flt(get_setting("circuit_breaker_cooldown", DEFAULT_BREAKER_COOLDOWN)) or DEFAULT_BREAKER_COOLDOWN
+
+    def _key(self, part: str) -> str:
+        return f"ai_chat_llm_circuit:{self.name}:{part}"
+
+    def check(self):
+        if self.threshold > 0 and frappe.cache().get_value(self._key("open")):
+            raise CircuitOpen(f"Circuit for {self.name} is open")
+
+    def success(self):
+        frappe.cache().delete_value([self._key("failures"), self._key("probation")])
+
+    def failure(self):
+        if self.threshold <= 0:
+            return
+        cache = frappe.cache()
+        key = cache.make_key(self._key("failures"))
+        failures = cache.incr(key)
+        cache.expire(key, FAILURE_WINDOW)
+        # After the cooldown, one failure is enough to open it again
+        if failures >= self.threshold or cache.get_value(self._key("probation")):
+            cache.set_value(self._key("open"), 1, expires_in_sec=int(self.cooldown))
+            cache.set_value(self._key("probation"), 1, expires_in_sec=int(self.cooldown * 10))
+            cache.delete(key)
+            metrics.inc("ai_chat_errors_total", stage="llm", kind="circuit_opened")
+
+
+class ResilientLLM:
+    """A chat model with the site's timeout, retry, rate limit and circuit breaker policy"""
+
+    def __init__(self, llm, user: str):
+        self.llm = llm
+        self.user = user
+        self.breaker = CircuitBreaker(self.model_name)
+        self.max_retries = cint(get_setting("llm_max_retries", DEFAULT_MAX_RETRIES))
+
+    @property
+    def model_name(self) -> str:
+        return self.llm.model_name
+
+    def _admit(self):
+        """Raise instead of calling the provider when the breaker is open or a bucket is empty"""
+        self.breaker.check()
+        wait = take_token("user", self.user, cint(get_setting("user_llm_rate_limit", DEFAULT_USER_RATE_LIMIT)))
+        if wait:
+            raise RateLimited("user", wait)
+        wait = take_token("site", "all", cint(get_setting("site_llm_rate_limit", 0)))
+        if wait:
+            raise RateLimited("site", wait)
+
+    def _failed(self, e: Exception, attempt: int) -> Optional[float]:
+        """Record a failed attempt; returns the delay before retrying, or None to give up"""
+        if not is_retryable(e):
+            raise e
+        self.breaker.failure()
+        metrics.inc("ai_chat_errors_total", stage="llm", kind=e.__class__.__name__)
+        if attempt >= self.max_retries:
+            raise LLMUnavailable(f"{e.__class__.__name__}: {e}") from e
+        metrics.inc("ai_chat_fallbacks_total", kind="llm_retry")
+        return backoff(attempt, get_retry_after(e))
+
+    def invoke(self, messages):
+        self._admit()
+        attempt = 0
+        while True:
+            try:
+                response = self.llm.invoke(messages)
+            except Exception as e:
+                time.sleep(self._failed(e, attempt))
+                self.breaker.check()
+                attempt += 1
+                continue
+            self.breaker.success()
+            return response
+
+    async def ainvoke(self, messages):
+        # Redis calls are short; they stay on the event loop
+        self._admit()
+        attempt = 0
+        while True:
+            try:
+                response = await self.llm.ainvoke(messages)
+            except Exception as e:
+                await asyncio.sleep(self._failed(e, attempt))
+                self.breaker.check()
+                attempt += 1
+                continue
+            self.breaker.success()
+            return response
+
+
+def get_recent_answer(user: str, message: str, hours: int = 24):
+    """
+    The user's most recent answer to the same question, for a turn that cannot reach the LLM.
+
+    Returns:
+        (answer, result dict or None, when it was given), or None
+    """
+    asked = frappe.get_all(
+        "AI Chat Message",
+        filters={
+            "user": user,
+            "message_type": "Human",
+            "content": message,
+            "creation": [">", add_to_date(now_datetime(), hours=-hours)],
+        },
+        fields=["session", "creation"],
+        order_by="creation desc",
+        limit=1,
+    )
+    if not asked:
+        return None
+    answer = frappe.get_all(
+        "AI Chat Message",
+        filters={"session": asked[0].session, "message_type": "Ai", "creation": [">=", asked[0].creation]},
+        fields=["content", "result_data", "creation"],
+        order_by="creation asc",
+        limit=1,
+    )
+    if not answer:
+        return None
+    result = frappe.parse_json(answer[0].result_data) if answer[0].result_data else None
+    return answer[0].content, result, answer[0].creation
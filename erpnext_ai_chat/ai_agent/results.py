@@ -0,0 +1,268 @@
+"""
+Structured tool results.
+
+Tools return a ToolResult (columns, rows, totals, links and an optional
+chart) instead of building HTML themselves. The result is serialised
+compactly (CSV-like) for the LLM, rendered to HTML once by `render_html` for
+the chat UI, and stored in its structured form on the AI message.
+"""
+
+import csv
+import io
+import frappe
+from urllib.parse import quote
+from typing import Any, Dict, List, Optional
+
+
+# Column fieldtypes with special handling; anything else is rendered as text
+NUMERIC_FIELDTYPES = ("Currency", "Float", "Int", "Percent")
+
+
+class ToolResult:
+    """
+    Typed result of a tool call.
+
+    Columns follow Frappe report column conventions: `fieldname`, `label`,
+    `fieldtype` and `options`. For Link columns `options` is the DocType, for
+    Dynamic Link it is the fieldname of the column holding the DocType, and for
+    Currency it is either a currency code or the fieldname of the column that
+    holds each row's currency. Columns with `hidden` are not rendered.
+
+    `chart` is an optional Frappe Charts payload built from the same numbers
+    (see charts.py), forwarded to the client when the user asks for a chart.
+    `sections` are further ToolResults shown below this one, for tools that
+    answer with several tables at once. `source` describes how to re-run the
+    query without a row limit (see export.py), for results that can be exported.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        columns: Optional[List[Dict[str, Any]]] = None,
+        rows: Optional[List[List[Any]]] = None,
+        totals: Optional[Dict[str, Any]] = None,
+        message: Optional[str] = None,
+        properties: Optional[List[List[Any]]] = None,
+        links: Optional[List[Dict[str, str]]] = None,
+        chart: Optional[Dict[str, Any]] = None,
+        sections: Optional[List["ToolResult"]] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ):
+        self.title = title
+        self.columns = columns or []
+        self.rows = rows or []
+        self.totals = totals or {}
+        self.message = message
+        self.properties = properties or []
+        self.links = links or []
+        self.chart = chart
+        self.sections = sections or []
+        self.source = source
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "title": self.title,
+            "columns": self.columns,
+            "rows": self.rows,
+            "totals": self.totals,
+            "message": self.message,
+            "properties": self.properties,
+            "links": self.links,
+            "chart": self.chart,
+            "sections": [section.as_dict() for section in self.sections],
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ToolResult":
+        result = cls(**{key: data.get(key) for key in (
+            "title", "columns", "rows", "totals", "message", "properties", "links", "chart", "source"
+        )})
+        result.sections = [cls.from_dict(section) for section in data.get("sections") or []]
+        return result
+
+    def to_prompt(self) -> str:
+        return serialize_for_prompt(self.as_dict())
+
+    def __str__(self):
+        return self.to_prompt()
+
+
+def serialize_for_prompt(
+    result: Dict[str, Any],
+    rows: Optional[List[Optional[List[Any]]]] = None,
+    notes: Optional[List[str]] = None,
+) -> str:
+    """
+    Compact text form for the LLM: a title line, CSV rows and totals.
+
+    `rows` replaces the rows written out (a None entry is written as "...")
+    while the title still reports the full row count; `notes` are extra lines
+    placed before the CSV.
+    """
+    lines = [f"## {result['title']}" + (f" ({len(result['rows'])} rows)" if result.get("columns") else "")]
+    if result.get("message"):
+        lines.append(result["message"])
+
+    for label, value in result.get("properties") or []:
+        if value not in (None, ""):
+            lines.append(f"{label}: {_plain(value)}")
+
+    lines.extend(notes or [])
+
+    if result.get("columns"):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow([_column_header(col) for col in result["columns"]])
+        for row in result["rows"] if rows is None else rows:
+            if row is None:
+                buffer.write("...\n")
+            else:
+                writer.writerow([_plain(value) for value in row])
+        lines.append(buffer.getvalue().rstrip("\n"))
+
+    if result.get("totals"):
+        totals = "; ".join(f"{fieldname}={_plain_total(value)}" for fieldname, value in result["totals"].items())
+        lines.append(f"Total: {totals}")
+
+    for section in result.get("sections") or []:
+        lines.append("")
+        lines.append(serialize_for_prompt(section))
+
+    return "\n".join(lines)
+
+
+def _column_header(column: Dict[str, Any]) -> str:
+    header = column["fieldname"]
+    # A fixed currency code is stated once in the header instead of on every row
+    if column.get("fieldtype") == "Currency" and _is_currency_code(column.get("options")):
+        header += f"[{column['options']}]"
+    return header
+
+
+def _is_currency_code(options) -> bool:
+    return bool(options) and len(options) == 3 and options.isupper()
+
+
+def _plain(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".") if value % 1 else str(int(value))
+    return str(value)
+
+
+def _plain_total(value) -> str:
+    if isinstance(value, dict):
+        return ", ".join(f"{currency} {_plain(amount)}" for currency, amount in value.items())
+    return _plain(value)
+
+
+def summarise_locally(result: Dict[str, Any]) -> str:
+    """A one-line answer built from the result itself, for turns that skip the summarising LLM call"""
+    parts = [result["title"]]
+    if result.get("message"):
+        parts.append(result["message"])
+    if result.get("rows"):
+        parts.append(f"{len(result['rows'])} rows are shown below.")
+    labels = {col["fieldname"]: col.get("label") or col["fieldname"] for col in result.get("columns") or []}
+    totals = [f"{labels.get(fieldname, fieldname)}: {_plain_total(value)}" for fieldname, value in (result.get("totals") or {}).items()]
+    if totals:
+        parts.append("Totals: " + "; ".join(totals) + ".")
+    return " ".join(parts)
+
+
+def render_html(result: Optional[Dict[str, Any]]) -> str:
+    """Render a stored result dict to the HTML shown in the chat"""
+    if not result:
+        return ""
+
+    escape = frappe.utils.escape_html
+    html = [f"<div class='ai-chat-result'><h4>{escape(result['title'])}</h4>"]
+
+    if result.get("message"):
+        html.append(f"<p>{escape(result['message'])}</p>")
+
+    if result.get("properties"):
+        html.append("<table class='table table-bordered table-sm'><tbody>")
+        for label, value in result["properties"]:
+            if value not in (None, ""):
+                html.append(f"<tr><th>{escape(label)}</th><td>{escape(_plain(value))}</td></tr>")
+        html.append("</tbody></table>")
+
+    columns = result.get("columns") or []
+    if columns:
+        index = {col["fieldname"]: i for i, col in enumerate(columns)}
+        visible = [i for i, col in enumerate(columns) if not col.get("hidden")]
+
+        html.append("<table class='table table-bordered table-striped'><thead><tr>")
+        for i in visible:
+            align = " class='text-right'" if columns[i].get("fieldtype") in NUMERIC_FIELDTYPES else ""
+            html.append(f"<th{align}>{escape(columns[i].get('label') or columns[i]['fieldname'])}</th>")
+        html.append("</tr></thead><tbody>")
+
+        for row in result["rows"]:
+            html.append("<tr>")
+            for i in visible:
+                html.append(_render_cell(columns[i], row, index))
+            html.append("</tr>")
+
+        if result.get("totals"):
+            html.append("<tr class='ai-chat-total-row'>")
+            for position, i in enumerate(visible):
+                fieldname = columns[i]["fieldname"]
+                if fieldname in result["totals"]:
+                    html.append(f"<td class='text-right'>{_format_total(columns[i], result['totals'][fieldname])}</td>")
+                else:
+                    html.append(f"<td>{'Total' if position == 0 else ''}</td>")
+            html.append("</tr>")
+
+        html.append("</tbody></table>")
+
+    for link in result.get("links") or []:
+        html.append(f"<p><a href='{escape(link['url'])}' target='_blank'>{escape(link['label'])}</a></p>")
+
+    for section in result.get("sections") or []:
+        html.append(render_html(section))
+
+    html.append("</div>")
+    return "".join(html)
+
+
+def _render_cell(column: Dict[str, Any], row: List[Any], index: Dict[str, int]) -> str:
+    value = row[index[column["fieldname"]]]
+    fieldtype = column.get("fieldtype")
+
+    if value is None or value == "":
+        return "<td></td>"
+
+    if fieldtype == "Currency":
+        return f"<td class='text-right'>{frappe.utils.fmt_money(value, currency=_row_currency(column, row, index))}</td>"
+
+    if fieldtype in NUMERIC_FIELDTYPES:
+        return f"<td class='text-right'>{frappe.format_value(value, {'fieldtype': fieldtype})}</td>"
+
+    text = frappe.utils.escape_html(_plain(value))
+    doctype = column.get("options") if fieldtype == "Link" else None
+    if fieldtype == "Dynamic Link" and column.get("options") in index:
+        doctype = row[index[column["options"]]]
+    if doctype:
+        route = f"/app/{frappe.scrub(doctype).replace('_', '-')}/{quote(str(value), safe='')}"
+        return f"<td><a href='{route}' target='_blank'>{text}</a></td>"
+
+    return f"<td>{text}</td>"
+
+
+def _row_currency(column: Dict[str, Any], row: List[Any], index: Dict[str, int]) -> Optional[str]:
+    options = column.get("options")
+    if options in index:
+        return row[index[options]]
+    return options
+
+
+def _format_total(column: Dict[str, Any], value) -> str:
+    if isinstance(value, dict):
+        return ", ".join(frappe.utils.fmt_money(amount, currency=currency) for currency, amount in value.items())
+    if column.get("fieldtype") == "Currency":
+        return frappe.utils.fmt_money(value, currency=column.get("options") if _is_currency_code(column.get("options")) else None)
+    return str(frappe.format_value(value, {"fieldtype": column.get("fieldtype") or "Data"}))
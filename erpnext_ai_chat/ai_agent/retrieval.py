@@ -0,0 +1,261 @@
+"""
+Local retrieval index for schema context (enabled by "Enable Embeddings (RAG)").
+
+DocType descriptions and field labels, report names and curated example
+questions are embedded with an offline hashing embedder and kept in a local
+Chroma store under the site's private folder. The agent queries it to put
+only the relevant schema snippets into the prompt instead of having the model
+call get_doctype_structure / get_all_modules as extra round-trips.
+"""
+
+import frappe
+import hashlib
+import json
+import math
+import zlib
+from typing import Any, Dict, List, Optional
+
+from .tool_selector import tokenize
+
+
+EMBEDDING_DIMENSIONS = 512
+EMBEDDER_VERSION = f"hash{EMBEDDING_DIMENSIONS}-v1"
+COLLECTION_NAME = f"ai_chat_schema_{EMBEDDER_VERSION}".replace("-", "_")
+UPSERT_BATCH_SIZE = 256
+REFRESH_INDEX_JOB = "ai_chat_refresh_retrieval_index"
+
+# Fields listed per DocType snippet; enough for the model to build filters
+SNIPPET_FIELDS = 25
+
+# Curated question -> tool mappings, retrieved alongside schema snippets
+EXAMPLE_QUERIES = [
+    ("How many sales orders are pending delivery?", "get_sales_orders", {"status": "To Deliver and Bill", "summary": "by_status"}),
+    ("Show sales orders by status as a chart", "get_sales_orders", {"summary": "by_status"}),
+    ("Recent orders from customer Acme", "get_sales_orders", {"customer": "Acme", "limit": 10}),
+    ("What is the stock of item LAPTOP-001?", "get_stock_balance", {"item_code": "LAPTOP-001"}),
+    ("Stock of all laptops that are below reorder level", "get_stock_balance", {"item_group": "Laptops", "low_stock_only": True}),
+    ("Find products called laptop", "search_items", {"query": "laptop"}),
+    ("Open purchase orders for supplier Global Parts", "get_purchase_orders", {"supplier": "Global Parts", "status": "To Receive and Bill"}),
+    ("Details and outstanding amount of customer Acme", "get_customer_details", {"customer_id": "Acme"}),
+    ("How is customer Acme doing? Recent orders, unpaid invoices, last payment", "get_customer_overview", {"customer_id": "Acme"}),
+    ("List active employees", "query_doctype", {"doctype_name": "Employee", "filters": "status=Active"}),
+    ("How many leads do we have?", "get_doctype_count", {"doctype_name": "Lead"}),
+    ("Which reports are available for accounts?", "get_reports_list", {"module_name": "Accounts"}),
+    ("Show me the accounts receivable ageing", "run_report", {"report_name": "Accounts Receivable"}),
+    ("What fields does the Item doctype have?", "get_doctype_structure", {"doctype_name": "Item"}),
+    ("Search everything for 'Acme'", "search_across_doctypes", {"search_term": "Acme"}),
+    ("Is revenue growing month over month?", "analyze_trend", {"doctype": "Sales Invoice", "metric": "amount", "period": "month"}),
+    ("3-month moving average of purchases", "analyze_trend", {"doctype": "Purchase Order", "window": 3}),
+]
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word unigrams and bigrams, L2-normalised"""
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, text: str) -> List[float]:
+        tokens = tokenize(text)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            # crc32 is stable across processes, unlike hash()
+            h = zlib.crc32(feature.encode())
+            vector[h % self.dimensions] += 1.0 if (h >> 16) & 1 else -1.0
+
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed(text) for text in texts]
+
+
+embedder = HashingEmbedder()
+
+# Chroma clients by site, created on first use
+_collections = {}
+
+
+def is_enabled() -> bool:
+    from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+    return bool(get_setting("enable_embeddings", 0))
+
+
+def get_collection():
+    site = frappe.local.site
+    if site not in _collections:
+        import chromadb
+
+        client = chromadb.PersistentClient(path=frappe.get_site_path("private", "ai_chat", "vector_store"))
+        _collections[site] = client.get_or_create_collection(
+            COLLECTION_NAME,
+            embedding_function=None,
+            metadata={"hnsw:space": "cosine"}
+        )
+    return _collections[site]
+
+
+def build_documents(catalog: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Turn the schema catalog and curated examples into indexable documents"""
+    documents = []
+
+    for name, dt in catalog["doctypes"].items():
+        if dt["istable"]:
+            continue
+        flags = [flag for flag, key in (("submittable", "submittable"), ("tree", "tree"), ("single", "issingle")) if dt[key]]
+        fields = []
+        for fieldname, label, fieldtype, options, *_ in dt["fields"][:SNIPPET_FIELDS]:
+            field = f"{fieldname}:{fieldtype}"
+            if fieldtype == "Link" and options:
+                field += f"->{options}"
+            elif fieldtype == "Select" and options:
+                field += "(" + "|".join(o for o in options.split("\n") if o)[:80] + ")"
+            fields.append(field)
+
+        snippet = f"DocType {name} [{', '.join([dt['module']] + flags)}]"
+        if dt["description"]:
+            snippet += f": {dt['description']}"
+        snippet += f"\nFields: {', '.join(fields)}"
+        if dt["children"]:
+            snippet += f"\nChild tables: {', '.join(dt['children'])}"
+
+        labels = " ".join(f[1] for f in dt["fields"])
+        documents.append({
+            "id": f"doctype:{name}",
+            "text": f"{name} {dt['module']} {dt['description']} {labels}",
+            "snippet": snippet,
+            "metadata": {"kind": "doctype", "doctype": name},
+        })
+
+    for name, report in catalog["reports"].items():
+        documents.append({
+            "id": f"report:{name}",
+            "text": f"{name} report {report['module']} {report['ref_doctype']}",
+            "snippet": f"Report {name} ({report['type']}, {report['module']}) on {report['ref_doctype'] or '-'}",
+            "metadata": {"kind": "report", "doctype": report["ref_doctype"] or "", "report": name, "tool": "run_report"},
+        })
+
+    for question, tool_name, tool_input in EXAMPLE_QUERIES:
+        documents.append({
+            "id": f"example:{hashlib.sha1(question.encode()).hexdigest()[:12]}",
+            "text": question,
+            "snippet": f'Example: "{question}" -> TOOL: {tool_name} INPUT: {json.dumps(tool_input)}',
+            "metadata": {"kind": "example", "tool": tool_name},
+        })
+
+    for document in documents:
+        document["metadata"]["hash"] = hashlib.sha1(document["snippet"].encode() + document["text"].encode()).hexdigest()[:16]
+        document["metadata"]["snippet"] = document["snippet"]
+
+    return documents
+
+
+def refresh_index(catalog: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """Bring the vector store in line with the catalog, re-embedding only changed documents"""
+    if catalog is None:
+        from .catalog import get_catalog
+        catalog = get_catalog()
+
+    collection = get_collection()
+    documents = build_documents(catalog)
+
+    existing = collection.get(include=["metadatas"])
+    existing_hashes = {
+        doc_id: (metadata or {}).get("hash")
+        for doc_id, metadata in zip(existing["ids"], existing["metadatas"])
+    }
+
+    changed = [doc for doc in documents if existing_hashes.get(doc["id"]) != doc["metadata"]["hash"]]
+    for start in range(0, len(changed), UPSERT_BATCH_SIZE):
+        batch = changed[start:start + UPSERT_BATCH_SIZE]
+        collection.upsert(
+            ids=[doc["id"] for doc in batch],
+            embeddings=embedder.embed_many([doc["text"] for doc in batch]),
+            metadatas=[doc["metadata"] for doc in batch],
+        )
+
+    current_ids = {doc["id"] for doc in documents}
+    stale = [doc_id for doc_id in existing_hashes if doc_id not in current_ids]
+    if stale:
+        collection.delete(ids=stale)
+
+    return {"total": len(documents), "updated": len(changed), "deleted": len(stale)}
+
+
+def refresh_index_if_enabled(catalog: Optional[Dict[str, Any]] = None):
+    if not is_enabled():
+        return
+    try:
+        refresh_index(catalog)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AI Chat Retrieval Index")
+
+
+def enqueue_refresh_index():
+    """Build the index in the background; deduplicated so concurrent first queries queue one job"""
+    frappe.enqueue(
+        "erpnext_ai_chat.ai_agent.retrieval.refresh_index_if_enabled",
+        queue="long",
+        job_id=REFRESH_INDEX_JOB,
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+
+
+def retrieve(query: str, context, k: int = 6) -> List[Dict[str, Any]]:
+    """
+    Find the schema snippets and examples most relevant to a message.
+
+    Args:
+        query: The user's message
+        context: ToolContext used to drop DocTypes and reports the user cannot see
+        k: Maximum number of results
+
+    Returns:
+        List of dicts with kind, snippet, score and (for examples) tool
+    """
+    try:
+        collection = get_collection()
+        if not collection.count():
+            # Embeddings were switched on after the last catalog rebuild
+            enqueue_refresh_index()
+            return []
+
+        # Over-fetch so permission filtering still leaves k results
+        result = collection.query(
+            query_embeddings=[embedder.embed(query)],
+            n_results=min(k * 3, collection.count()),
+            include=["metadatas", "distances"]
+        )
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), "AI Chat Retrieval Query")
+        return []
+
+    from .catalog import can_see_report, get_catalog
+
+    reports = get_catalog()["reports"]
+    roles = context.roles
+    readable = context.readable_doctypes
+    hits = []
+    for metadata, distance in zip(result["metadatas"][0], result["distances"][0]):
+        doctype = metadata.get("doctype")
+        if doctype and doctype not in readable:
+            continue
+        if metadata["kind"] == "report":
+            # Same rule as get_reports_list; reports dropped from the catalog are skipped too
+            report = reports.get(metadata["report"])
+            if report is None or not can_see_report(report, roles, readable):
+                continue
+        hits.append({
+            "kind": metadata["kind"],
+            "snippet": metadata["snippet"],
+            "tool": metadata.get("tool"),
+            "score": 1 - distance,
+        })
+        if len(hits) >= k:
+            break
+    return hits
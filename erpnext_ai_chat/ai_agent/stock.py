@@ -0,0 +1,124 @@
+"""
+Set-based stock lookups.
+
+All Bin rows for a list of items or an item group are fetched in one query,
+then rolled up through the Warehouse tree to group warehouses and companies
+in memory, with low-stock flags from the items' reorder levels.
+"""
+
+import frappe
+from typing import Any, Dict, List, Optional
+
+
+def get_bins(
+    item_codes: Optional[List[str]] = None,
+    item_group: Optional[str] = None,
+    warehouse: Optional[str] = None,
+    company: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch Bin rows for many items in one query.
+
+    Args:
+        item_codes: Item codes to include
+        item_group: Item group to include, with its sub-groups
+        warehouse: Warehouse (leaf or group) to restrict to, with its children
+        company: Company to restrict to
+
+    Returns:
+        Bin rows with item_name and the warehouse's company
+    """
+    conditions = ["bin.actual_qty != 0 OR bin.reserved_qty != 0 OR bin.projected_qty != 0"]
+    values = {}
+
+    if item_codes:
+        conditions.append("bin.item_code IN %(item_codes)s")
+        values["item_codes"] = tuple(item_codes)
+
+    if item_group:
+        lft, rgt = frappe.db.get_value("Item Group", item_group, ["lft", "rgt"]) or (None, None)
+        if lft is None:
+            return []
+        conditions.append(
+            "item.item_group IN (SELECT name FROM `tabItem Group` WHERE lft >= %(group_lft)s AND rgt <= %(group_rgt)s)"
+        )
+        values.update(group_lft=lft, group_rgt=rgt)
+
+    if warehouse:
+        lft, rgt = frappe.db.get_value("Warehouse", warehouse, ["lft", "rgt"]) or (None, None)
+        if lft is None:
+            return []
+        conditions.append("wh.lft >= %(warehouse_lft)s AND wh.rgt <= %(warehouse_rgt)s")
+        values.update(warehouse_lft=lft, warehouse_rgt=rgt)
+
+    if company:
+        conditions.append("wh.company = %(company)s")
+        values["company"] = company
+
+    return frappe.db.sql(f"""
+        SELECT
+            bin.item_code, item.item_name, bin.warehouse, wh.company,
+            bin.actual_qty, bin.reserved_qty, bin.projected_qty
+        FROM `tabBin` bin
+        INNER JOIN `tabItem` item ON item.name = bin.item_code
+        INNER JOIN `tabWarehouse` wh ON wh.name = bin.warehouse
+        WHERE {" AND ".join(f"({condition})" for condition in conditions)}
+        ORDER BY bin.item_code, wh.lft
+    """, values, as_dict=True)
+
+
+def get_warehouse_tree(companies: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Warehouses of the given companies keyed by name, with parent and tree position"""
+    if not companies:
+        return {}
+    return {
+        row.name: row
+        for row in frappe.get_all(
+            "Warehouse",
+            filters={"company": ["in", companies]},
+            fields=["name", "parent_warehouse", "company", "is_group", "lft"],
+        )
+    }
+
+
+def rollup(bins: List[Dict[str, Any]], tree: Dict[str, Dict[str, Any]]) -> Dict[tuple, Dict[str, float]]:
+    """
+    Sum bin quantities into every ancestor warehouse and the company.
+
+    Returns:
+        {(item_code, node): {"actual_qty", "reserved_qty", "projected_qty"}} where
+        node is a warehouse name or ("Company", company)
+    """
+    totals = {}
+    for row in bins:
+        nodes = [("Company", row.company)]
+        parent = (tree.get(row.warehouse) or {}).get("parent_warehouse")
+        while parent:
+            nodes.append(parent)
+            parent = (tree.get(parent) or {}).get("parent_warehouse")
+
+        for node in nodes:
+            total = totals.setdefault((row.item_code, node), {"actual_qty": 0, "reserved_qty": 0, "projected_qty": 0})
+            for field in total:
+                total[field] += row[field] or 0
+    return totals
+
+
+def get_reorder_levels(item_codes: List[str]) -> Dict[tuple, float]:
+    """
+    Reorder levels keyed by (item_code, warehouse checked).
+
+    Item Reorder rows with "Check in (group)" are checked against the group
+    warehouse's rolled-up projected quantity, as ERPNext's auto re-order does.
+    """
+    if not item_codes:
+        return {}
+    levels = {}
+    for row in frappe.get_all(
+        "Item Reorder",
+        filters={"parent": ["in", item_codes], "parenttype": "Item"},
+        fields=["parent", "warehouse", "warehouse_group", "warehouse_reorder_level"],
+    ):
+        if row.warehouse_reorder_level:
+            levels[(row.parent, row.warehouse_group or row.warehouse)] = row.warehouse_reorder_level
+    return levels
@@ -0,0 +1,51 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent.analytics import analyze_series
+
+
+class UnitTestAnalytics(UnitTestCase):
+	def test_growth_moving_average_and_cumulative(self):
+		analysis = analyze_series([10, 20, 0, 30], window=2)
+
+		self.assertEqual(analysis["growth"], [None, 100.0, -100.0, None])
+		self.assertEqual(analysis["moving_average"], [None, 15.0, 10.0, 15.0])
+		self.assertEqual(analysis["cumulative"], [10.0, 30.0, 30.0, 60.0])
+		self.assertEqual(analysis["yoy"], [None] * 4)
+
+	def test_empty_and_single_value_series(self):
+		empty = analyze_series([], season=12, window=3, horizon=2)
+		self.assertEqual(empty["values"], [])
+		self.assertEqual(empty["growth"], [])
+		self.assertEqual(empty["projection"], [0.0, 0.0])
+
+		single = analyze_series([5], window=3, horizon=2)
+		self.assertEqual(single["moving_average"], [None])
+		self.assertEqual(single["slope"], 0.0)
+		self.assertEqual(single["projection"], [5.0, 5.0])
+
+	def test_window_longer_than_the_series(self):
+		self.assertEqual(analyze_series([1, 2], window=5)["moving_average"], [None, None])
+		self.assertEqual(analyze_series([1, 2], window=0)["moving_average"], [None, None])
+
+	def test_season_over_season_growth(self):
+		analysis = analyze_series([10, 20, 30, 15, 30, 30], season=3)
+		self.assertEqual(analysis["yoy"], [None, None, None, 50.0, 50.0, 0.0])
+		# Two full seasons are needed before seasonality is projected
+		self.assertTrue(analysis["seasonal"])
+		self.assertFalse(analyze_series([10, 20, 30, 15], season=3)["seasonal"])
+
+	def test_linear_projection(self):
+		analysis = analyze_series([1, 2, 3, 4], horizon=2)
+		self.assertAlmostEqual(analysis["slope"], 1.0)
+		self.assertEqual([round(v, 6) for v in analysis["projection"]], [5.0, 6.0])
+
+	def test_seasonal_projection_repeats_the_pattern(self):
+		analysis = analyze_series([10, 0, 10, 0, 10, 0], season=2, horizon=2)
+		self.assertGreater(analysis["projection"][0], analysis["projection"][1])
+
+	def test_projection_is_floored_at_zero_only_for_non_negative_series(self):
+		self.assertEqual(analyze_series([3, 2, 1], horizon=3)["projection"], [0.0, 0.0, 0.0])
+		self.assertLess(analyze_series([-1, -2, -3], horizon=1)["projection"][0], 0)
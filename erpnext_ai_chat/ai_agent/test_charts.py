@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+import math
+
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent.charts import MAX_PIE_SLICES, lttb_indices, reduce_series
+
+
+class UnitTestChartReduction(UnitTestCase):
+	def test_lttb_keeps_everything_below_the_threshold(self):
+		self.assertEqual(lttb_indices([1, 2, 3], 10).tolist(), [0, 1, 2])
+		self.assertEqual(lttb_indices([1, 2, 3, 4], 4).tolist(), [0, 1, 2, 3])
+		# Fewer than three points cannot form a triangle
+		self.assertEqual(lttb_indices(list(range(10)), 2).tolist(), list(range(10)))
+
+	def test_lttb_keeps_first_last_and_peaks(self):
+		values = [math.sin(i / 10) for i in range(1000)]
+		values[500] = 50
+
+		indices = lttb_indices(values, 50).tolist()
+		self.assertEqual(len(indices), 50)
+		self.assertEqual(indices[0], 0)
+		self.assertEqual(indices[-1], 999)
+		self.assertEqual(indices, sorted(set(indices)))
+		self.assertIn(500, indices)
+
+	def test_lttb_on_a_flat_series(self):
+		# Every candidate ties; one point per bucket is still chosen
+		indices = lttb_indices([5] * 100, 10).tolist()
+		self.assertEqual(len(indices), 10)
+		self.assertEqual(indices, sorted(set(indices)))
+
+	def test_series_within_budget_is_unchanged(self):
+		labels = ["a", "b", "c"]
+		datasets = [{"name": "Orders", "values": [1, 2, 3]}]
+		self.assertEqual(reduce_series("line", labels, datasets, max_points=10), (labels, datasets))
+		self.assertEqual(reduce_series("line", labels, [], max_points=1), (labels, []))
+		self.assertEqual(reduce_series("percentage", labels * 10, datasets, max_points=2)[0], labels * 10)
+
+	def test_line_series_share_the_budget(self):
+		labels = [f"Day {i}" for i in range(300)]
+		datasets = [
+			{"name": "Orders", "values": list(range(300))},
+			# Shorter series are padded with zeros
+			{"name": "Returns", "values": [i % 7 for i in range(250)]},
+		]
+
+		new_labels, new_datasets = reduce_series("line", labels, datasets, max_points=40)
+		self.assertLessEqual(len(new_labels), 40)
+		self.assertEqual(new_labels[0], "Day 0")
+		self.assertEqual(new_labels[-1], "Day 299")
+		self.assertTrue(all(len(d["values"]) == len(new_labels) for d in new_datasets))
+		self.assertEqual(new_datasets[1]["name"], "Returns")
+
+	def test_categories_keep_top_n_in_order_and_sum_the_rest(self):
+		labels = ["a", "b", "c", "d", "e"]
+		datasets = [{"values": [5, 50, 1, 40, 2]}, {"values": [1, 1, 1, 1, 1]}]
+
+		new_labels, new_datasets = reduce_series("bar", labels, datasets, max_points=3)
+		self.assertEqual(new_labels, ["b", "d", "Other"])
+		self.assertEqual(new_datasets[0]["values"], [50, 40, 8])
+		self.assertEqual(new_datasets[1]["values"], [1, 1, 3])
+
+	def test_category_ties_keep_the_earlier_label(self):
+		new_labels, new_datasets = reduce_series("bar", ["a", "b", "c", "d"], [{"values": [3, 3, 3, 1]}], max_points=3)
+		self.assertEqual(new_labels, ["a", "b", "Other"])
+		self.assertEqual(new_datasets[0]["values"], [3, 3, 4])
+
+	def test_pie_is_capped_at_max_slices(self):
+		labels = [str(i) for i in range(50)]
+		new_labels, new_datasets = reduce_series("pie", labels, [{"values": list(range(50))}], max_points=500)
+		self.assertEqual(len(new_labels), MAX_PIE_SLICES)
+		self.assertEqual(sum(new_datasets[0]["values"]), sum(range(50)))
@@ -0,0 +1,111 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent import compaction
+from erpnext_ai_chat.ai_agent.compaction import column_stats, compact_result, compact_text, count_tokens
+
+
+COLUMNS = [
+	{"fieldname": "name", "fieldtype": "Link"},
+	{"fieldname": "status", "fieldtype": "Data"},
+	{"fieldname": "grand_total", "fieldtype": "Currency"},
+]
+
+
+class CharEncoding:
+	"""One token per character"""
+
+	def encode(self, text, disallowed_special=()):
+		return list(text)
+
+	def decode(self, tokens):
+		return "".join(tokens)
+
+
+def orders(count):
+	return {
+		"title": "Sales Orders",
+		"columns": COLUMNS,
+		"rows": [[f"SO-{i:05d}", "Draft" if i % 3 else "Completed", float(i)] for i in range(count)],
+	}
+
+
+class UnitTestCompaction(UnitTestCase):
+	def setUp(self):
+		# The length estimate keeps these tests independent of tiktoken's downloaded encodings
+		patcher = patch.dict(compaction._encodings, {None: None})
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_result_within_budget_is_unchanged(self):
+		result = orders(3)
+		text = compact_result(result, 1000)
+		self.assertIn("SO-00002", text)
+		self.assertNotIn("...", text)
+		# A budget of 0 disables compaction
+		self.assertEqual(compact_result(orders(500), 0), compact_result(orders(500), 10 ** 6))
+
+	def test_large_result_keeps_head_tail_and_statistics(self):
+		text = compact_result(orders(500), 300)
+
+		self.assertLessEqual(count_tokens(text), 300)
+		self.assertIn("(500 rows)", text)
+		self.assertIn("SO-00000", text)
+		self.assertIn("SO-00499", text)
+		self.assertNotIn("SO-00250", text)
+		self.assertIn("\n...\n", text)
+		self.assertIn("grand_total min=0 max=499 sum=124750", text)
+		self.assertIn("of 500 rows are included", text)
+
+	def test_result_without_rows_is_truncated_as_text(self):
+		result = {"title": "Notes", "message": "word " * 2000}
+		text = compact_result(result, 100)
+		self.assertIn("characters omitted", text)
+		self.assertLessEqual(len(text), 100 * 4 + 100)
+
+	def test_sections_share_the_budget(self):
+		result = dict(orders(300), sections=[orders(300), orders(300)])
+		text = compact_result(result, 600)
+		self.assertEqual(text.count("## Sales Orders"), 3)
+		self.assertEqual(text.count("of 300 rows are included"), 3)
+
+	def test_sections_beyond_the_budget_are_dropped(self):
+		result = dict(orders(300), sections=[orders(300) for _ in range(20)])
+		text = compact_result(result, 600)
+		self.assertEqual(text.count("## Sales Orders"), 6)
+		self.assertIn("[... 15 more sections omitted ...]", text)
+		self.assertLessEqual(count_tokens(text), 600 + 20)
+
+		# Too small a budget for any section: only the main result, still compacted
+		text = compact_result(result, 50)
+		self.assertEqual(text.count("## Sales Orders"), 1)
+		self.assertIn("[... 20 more sections omitted ...]", text)
+		self.assertLessEqual(count_tokens(text), 50 + 20)
+
+	def test_compact_text(self):
+		self.assertEqual(compact_text("short", 10), "short")
+		text = compact_text("x" * 1000, 50)
+		self.assertTrue(text.startswith("x" * 140))
+		self.assertIn("[... 800 characters omitted ...]", text)
+		# Too small a budget for any tail: none is kept rather than all of it
+		text = compact_text("x" * 1000, 0)
+		self.assertIn("[... 1000 characters omitted ...]", text)
+		self.assertLess(len(text), 100)
+		with patch.dict(compaction._encodings, {None: CharEncoding()}):
+			self.assertEqual(compact_text("x" * 1000, 1), "\n[... 1000 tokens omitted ...]\n")
+
+	def test_column_stats(self):
+		rows = [["a", "Draft", 1.0, None], ["b", "Draft", 2.5, ""], ["c", "Completed", 3.0, None]]
+		columns = COLUMNS + [{"fieldname": "notes", "fieldtype": "Data"}]
+
+		stats = column_stats(columns, rows)
+		self.assertEqual(stats, [
+			"name 3 distinct",
+			"status 2 distinct, top: Draft (2), Completed (1)",
+			"grand_total min=1 max=3 sum=6.5 avg=2.17",
+		])
+		self.assertEqual(column_stats(COLUMNS, []), [])
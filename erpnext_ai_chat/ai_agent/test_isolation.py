@@ -0,0 +1,81 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent import isolation, query_plans
+from erpnext_ai_chat.ai_agent.isolation import MARIADB_STATEMENT_TIMEOUT, get_statement_timeout, tool_queries
+
+
+SETTINGS = {"tool_statement_timeout": 5}
+
+
+class StubDB:
+	"""Records statements; the session starts with a limit of its own"""
+
+	def __init__(self, session_timeout=2.5, fail_on=None):
+		self.session_timeout = session_timeout
+		self.fail_on = fail_on
+		self.statements = []
+
+	def sql(self, query, values=None, **kwargs):
+		self.statements.append((query, values))
+		if query == self.fail_on:
+			raise Exception(MARIADB_STATEMENT_TIMEOUT, "Query execution was interrupted (max_statement_time exceeded)")
+		if query == "SELECT @@SESSION.max_statement_time":
+			return [[self.session_timeout]]
+		return []
+
+
+class UnitTestIsolation(UnitTestCase):
+	def setUp(self):
+		for patcher in (
+			patch.object(isolation, "get_setting", lambda fieldname, default=None: SETTINGS.get(fieldname, default)),
+			patch.object(query_plans, "is_enabled", return_value=False),
+			patch.dict(frappe.conf, {"db_type": "mariadb", "read_from_replica": 0}),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+		self.context = SimpleNamespace(replica_db=None)
+
+	def run_tool(self, tool_name, db, query="SELECT 1"):
+		with patch.object(frappe.local, "db", db, create=True):
+			with tool_queries(tool_name, self.context) as guard:
+				try:
+					frappe.local.db.sql(query)
+				except Exception:
+					pass
+			self.assertIs(frappe.local.db, db)
+		return guard
+
+	def test_tool_limit_is_applied_and_the_session_limit_restored(self):
+		db = StubDB(session_timeout=2.5)
+		guard = self.run_tool("some_tool", db)
+
+		self.assertFalse(guard.timed_out)
+		self.assertEqual(db.statements, [
+			("SELECT @@SESSION.max_statement_time", None),
+			("SET SESSION max_statement_time = %s", 5),
+			("SELECT 1", None),
+			("SET SESSION max_statement_time = %s", 2.5),
+		])
+		# The wrapper is taken off the connection again
+		self.assertNotIn("sql", db.__dict__)
+
+	def test_timed_out_statement_is_noted(self):
+		guard = self.run_tool("analyze_trend", StubDB(fail_on="SELECT 1"))
+		self.assertTrue(guard.timed_out)
+		self.assertIn("20 seconds", guard.message)
+
+	def test_per_tool_limits(self):
+		self.assertEqual(get_statement_timeout("some_tool"), 5)
+		self.assertEqual(get_statement_timeout("run_report"), 60)
+		with patch.dict(SETTINGS, {"tool_statement_timeout": 0}):
+			self.assertEqual(get_statement_timeout("run_report"), 0)
+			db = StubDB()
+			self.run_tool("run_report", db)
+			self.assertEqual(db.statements, [("SELECT 1", None)])
@@ -0,0 +1,41 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent.query_plans import analyse, get_shape_key, normalise_query
+
+
+class UnitTestQueryPlans(UnitTestCase):
+	def test_literals_and_placeholders_become_one_shape(self):
+		first = normalise_query("SELECT name FROM `tabItem` WHERE item_code = 'ABC-1' AND qty > 10 LIMIT 20")
+		second = normalise_query("SELECT  name\nFROM `tabItem`\nWHERE item_code = %(code)s AND qty > -2.5 LIMIT %s")
+		self.assertEqual(first, "SELECT name FROM `tabItem` WHERE item_code = ? AND qty > ? LIMIT ?")
+		self.assertEqual(first, second)
+		self.assertEqual(get_shape_key(first), get_shape_key(second))
+
+	def test_in_lists_of_any_length_collapse(self):
+		three = normalise_query("SELECT * FROM `tabBin` WHERE item_code IN ('a', 'b', 'c')")
+		one = normalise_query("SELECT * FROM `tabBin` WHERE item_code IN (%s)")
+		self.assertEqual(three, one)
+		self.assertIn("IN (?+)", three)
+
+	def test_quotes_and_identifiers_are_kept_apart(self):
+		# Escaped and doubled quotes stay inside the literal; digits in names are not literals
+		shape = normalise_query("SELECT `col2`, t1.name FROM `tabSales Order` t1 WHERE title = 'It''s \\'x\\'' AND idx = 3")
+		self.assertEqual(shape, "SELECT `col2`, t1.name FROM `tabSales Order` t1 WHERE title = ? AND idx = ?")
+
+	def test_empty_query(self):
+		self.assertEqual(normalise_query("   "), "")
+
+	def test_full_scan_gets_an_index_suggestion(self):
+		query = "SELECT name FROM `tabSales Order` WHERE customer = %s AND transaction_date >= %s ORDER BY modified DESC"
+		plan = [{"table": "tabSales Order", "type": "ALL", "rows": 50000, "Extra": "Using where; Using filesort"}]
+
+		findings, suggestions = analyse(query, plan)
+		self.assertEqual(findings, ["Full table scan of tabSales Order (~50000 rows)", "Filesort on tabSales Order"])
+		self.assertEqual(suggestions, ["ALTER TABLE `tabSales Order` ADD INDEX (`customer`, `transaction_date`)"])
+
+	def test_indexed_lookup_has_no_findings(self):
+		plan = [{"table": "tabItem", "type": "ref", "key": "item_code", "rows": 1, "Extra": ""}]
+		self.assertEqual(analyse("SELECT name FROM `tabItem` WHERE item_code = %s", plan), ([], []))
@@ -0,0 +1,138 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent import resilience
+from erpnext_ai_chat.ai_agent.resilience import (
+	BACKOFF_CAP,
+	CircuitBreaker,
+	CircuitOpen,
+	LLMUnavailable,
+	ResilientLLM,
+	backoff,
+	get_retry_after,
+	is_retryable,
+	take_token,
+)
+
+
+SETTINGS = {"circuit_breaker_threshold": 3, "circuit_breaker_cooldown": 5, "llm_max_retries": 2, "user_llm_rate_limit": 0}
+
+
+class ProviderError(Exception):
+	def __init__(self, status_code, headers=None):
+		super().__init__(f"status {status_code}")
+		self.status_code = status_code
+		self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class FlakyLLM:
+	model_name = "test-resilience-model"
+
+	def __init__(self, failures):
+		self.failures = list(failures)
+		self.calls = 0
+
+	def invoke(self, messages):
+		self.calls += 1
+		if self.failures:
+			raise self.failures.pop(0)
+		return "ok"
+
+
+class UnitTestResilience(UnitTestCase):
+	def setUp(self):
+		patcher = patch.object(resilience, "get_setting", lambda fieldname, default=None: SETTINGS.get(fieldname, default))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		for name in ("test-breaker", FlakyLLM.model_name):
+			frappe.cache().delete_value([f"ai_chat_llm_circuit:{name}:{part}" for part in ("open", "failures", "probation")])
+		frappe.cache().delete(frappe.cache().make_key("ai_chat_llm_bucket:test:bucket"))
+
+	def test_backoff_is_jittered_and_capped(self):
+		for attempt in range(10):
+			delay = backoff(attempt)
+			self.assertGreaterEqual(delay, 0)
+			self.assertLessEqual(delay, min(BACKOFF_CAP, resilience.BACKOFF_BASE * 2 ** attempt))
+
+	def test_retry_after_is_honoured_but_capped(self):
+		self.assertEqual(backoff(0, 3), 3)
+		self.assertEqual(backoff(0, 3600), BACKOFF_CAP)
+		self.assertEqual(get_retry_after(ProviderError(429, {"retry-after": "7"})), 7.0)
+		self.assertIsNone(get_retry_after(ProviderError(429, {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})))
+		self.assertIsNone(get_retry_after(ValueError()))
+
+	def test_retryable_errors(self):
+		self.assertTrue(is_retryable(ProviderError(429)))
+		self.assertTrue(is_retryable(ProviderError(503)))
+		self.assertFalse(is_retryable(ProviderError(400)))
+		self.assertTrue(is_retryable(TimeoutError()))
+		self.assertFalse(is_retryable(ValueError()))
+
+	def open_breaker(self):
+		breaker = CircuitBreaker("test-breaker")
+		for _ in range(SETTINGS["circuit_breaker_threshold"]):
+			breaker.check()
+			breaker.failure()
+		return breaker
+
+	def test_breaker_opens_after_the_threshold(self):
+		self.open_breaker()
+		with self.assertRaises(CircuitOpen):
+			CircuitBreaker("test-breaker").check()
+
+	def test_breaker_reopens_on_the_first_failure_in_probation(self):
+		breaker = self.open_breaker()
+
+		# The cooldown has passed: calls are let through again, on probation
+		frappe.cache().delete_value(breaker._key("open"))
+		breaker.check()
+		breaker.failure()
+		with self.assertRaises(CircuitOpen):
+			breaker.check()
+
+	def test_success_ends_probation(self):
+		breaker = self.open_breaker()
+		frappe.cache().delete_value(breaker._key("open"))
+
+		breaker.success()
+		breaker.failure()
+		breaker.check()
+
+	def test_token_bucket(self):
+		self.assertEqual(take_token("test", "bucket", 2), 0)
+		self.assertEqual(take_token("test", "bucket", 2), 0)
+		wait = take_token("test", "bucket", 2)
+		self.assertGreater(wait, 0)
+		self.assertLessEqual(wait, 30)
+		# No limit configured
+		self.assertEqual(take_token("test", "unlimited", 0), 0)
+
+	@patch.object(resilience, "backoff", return_value=0)
+	def test_retryable_failures_are_retried(self, _backoff):
+		llm = FlakyLLM([ProviderError(503), ProviderError(429)])
+		self.assertEqual(ResilientLLM(llm, "Guest").invoke([]), "ok")
+		self.assertEqual(llm.calls, 3)
+
+	@patch.object(resilience, "backoff", return_value=0)
+	def test_errors_that_are_not_retryable_are_raised_at_once(self, _backoff):
+		llm = FlakyLLM([ProviderError(400)])
+		with self.assertRaises(ProviderError):
+			ResilientLLM(llm, "Guest").invoke([])
+		self.assertEqual(llm.calls, 1)
+
+	@patch.object(resilience, "backoff", return_value=0)
+	def test_giving_up_raises_llm_unavailable(self, _backoff):
+		llm = FlakyLLM([ProviderError(503)] * 5)
+		with self.assertRaises(LLMUnavailable):
+			ResilientLLM(llm, "Guest").invoke([])
+		self.assertEqual(llm.calls, 1 + SETTINGS["llm_max_retries"])
+
+		# The failures opened the breaker, so the next call fails fast
+		with self.assertRaises(CircuitOpen):
+			ResilientLLM(FlakyLLM([]), "Guest").invoke([])
@@ -0,0 +1,54 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from types import SimpleNamespace
+
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent.tool_selector import FALLBACK_TOOLS, ToolIndex, select_tools, tokenize
+
+
+def make_tools(*specs):
+	return [SimpleNamespace(name=name, description=description) for name, description in specs]
+
+
+TOOLS = make_tools(
+	("get_sales_orders", "Get sales orders with filters"),
+	("get_purchase_orders", "Get purchase orders from suppliers"),
+	("get_stock_balance", "Stock balance per warehouse"),
+	("search_items", "Search items by code or name"),
+	("query_doctype", "Query any DocType"),
+	("search_across_doctypes", "Search every DocType"),
+)
+
+
+class UnitTestToolSelector(UnitTestCase):
+	def test_tokenize_drops_stop_words_and_folds_plurals(self):
+		self.assertEqual(tokenize("Show me the Sales Orders"), ["sale", "order"])
+		self.assertEqual(tokenize("address"), ["address"])
+		self.assertEqual(tokenize(None), [])
+
+	def test_empty_corpus(self):
+		self.assertEqual(ToolIndex([]).score("sales orders"), {})
+		self.assertEqual(select_tools("sales orders", [], top_k=3), [])
+
+	def test_top_k_of_zero_or_more_than_the_tools_keeps_all(self):
+		self.assertEqual(select_tools("sales orders", TOOLS, top_k=0), TOOLS)
+		self.assertEqual(select_tools("sales orders", TOOLS, top_k=len(TOOLS)), TOOLS)
+
+	def test_most_relevant_tool_and_fallbacks_in_registration_order(self):
+		selected = [tool.name for tool in select_tools("stock in the main warehouse", TOOLS, top_k=1)]
+		self.assertEqual(selected, ["get_stock_balance", *FALLBACK_TOOLS])
+
+	def test_unmatched_message_gets_only_the_fallbacks(self):
+		selected = [tool.name for tool in select_tools("zzz qqq", TOOLS, top_k=2)]
+		self.assertEqual(selected, list(FALLBACK_TOOLS))
+
+	def test_ties_keep_the_earlier_tool(self):
+		tools = make_tools(("tool_one", "Invoice lookup"), ("tool_two", "Invoice lookup"), *[(name, "") for name in FALLBACK_TOOLS])
+		selected = [tool.name for tool in select_tools("invoice", tools, top_k=1)]
+		self.assertEqual(selected, ["tool_one", *FALLBACK_TOOLS])
+
+	def test_boosts_change_the_ranking(self):
+		selected = [tool.name for tool in select_tools("orders", TOOLS, top_k=1, boosts={"get_purchase_orders": 10})]
+		self.assertEqual(selected, ["get_purchase_orders", *FALLBACK_TOOLS])
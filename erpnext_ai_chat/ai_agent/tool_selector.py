@@ -0,0 +1,139 @@
+"""
+Relevance-based tool selection.
+
+Only the tools relevant to the current message are described in the system
+prompt. Tools are scored with BM25 over their names, docstrings and a few
+curated keywords; the index is built once per worker and reused.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+
+DEFAULT_TOP_K = 6
+
+# Name the model uses to ask for the full tool list
+EXPAND_TOOLS = "expand_tools"
+
+# Generic tools that can answer almost anything; always offered
+FALLBACK_TOOLS = ("query_doctype", "search_across_doctypes")
+
+# Extra vocabulary users commonly use for each tool
+TOOL_KEYWORDS = {
+    "search_customers": "client clients buyer account",
+    "get_customer_details": "client contact email phone outstanding balance owe",
+    "get_customer_overview": "client customer 360 overview account orders unpaid overdue invoice invoices ageing payment paid buy top items",
+    "search_items": "product products sku catalog price rate",
+    "get_sales_orders": "so order orders sale sales selling revenue status deliver pending chart",
+    "get_purchase_orders": "po purchase purchases buying supplier vendor procurement",
+    "get_stock_balance": "stock inventory warehouse quantity qty available on hand reorder low group items",
+    "search_doctype": "find lookup record document",
+    "get_all_modules": "module modules app apps overview",
+    "get_doctypes_in_module": "doctype doctypes module forms",
+    "query_doctype": "list show records filter employee lead invoice",
+    "get_reports_list": "report reports analytics",
+    "run_report": "run report reports receivable payable ageing ledger balance sheet profit loss register statement",
+    "get_doctype_structure": "field fields schema structure columns",
+    "search_across_doctypes": "search anywhere everything find",
+    "get_doctype_count": "count how many number total breakdown",
+    "analyze_trend": "trend growth growing month week quarter year yoy mom moving average rolling cumulative forecast projection seasonality revenue",
+}
+
+STOP_WORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "by", "and", "or", "is", "are", "me", "my", "our",
+    "with", "what", "which", "show", "get", "give", "please", "can", "you", "i", "we", "all", "from",
+    "this", "that", "it", "be", "as", "at", "do", "does", "optional", "default", "returns", "args",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+_index_cache = {}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in STOP_WORDS or len(token) < 2:
+            continue
+        # Crude plural folding so "orders" matches "order"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class ToolIndex:
+    """BM25 index over tool descriptions"""
+
+    def __init__(self, tools: Sequence):
+        self.names = [tool.name for tool in tools]
+        self.documents = []
+        for tool in tools:
+            # The tool name is the strongest signal, so it is repeated
+            name_tokens = tokenize(tool.name.replace("_", " ")) * 3
+            text = f"{tool.description} {TOOL_KEYWORDS.get(tool.name, '')}"
+            self.documents.append(Counter(name_tokens + tokenize(text)))
+
+        self.avg_length = (sum(sum(doc.values()) for doc in self.documents) / len(self.documents)) if self.documents else 0
+        document_frequency = Counter()
+        for doc in self.documents:
+            document_frequency.update(doc.keys())
+        total = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def score(self, query: str) -> Dict[str, float]:
+        terms = tokenize(query)
+        scores = {}
+        for name, doc in zip(self.names, self.documents):
+            length = sum(doc.values())
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if not tf:
+                    continue
+                score += self.idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self.avg_length))
+            scores[name] = score
+        return scores
+
+
+def get_tool_index(tools: Sequence) -> ToolIndex:
+    """Get the cached index for this tool set"""
+    key = tuple(tool.name for tool in tools)
+    if key not in _index_cache:
+        _index_cache[key] = ToolIndex(tools)
+    return _index_cache[key]
+
+
+def select_tools(message: str, tools: Sequence, top_k: Optional[int] = None, boosts: Optional[Dict[str, float]] = None) -> List:
+    """
+    Pick the tools most relevant to a message.
+
+    Args:
+        message: The user's message
+        tools: All registered tools
+        top_k: How many scored tools to keep (0 or None keeps every tool)
+        boosts: Optional extra score per tool name from other relevance signals
+
+    Returns:
+        Selected tools in registration order, always including the fallbacks
+    """
+    if not top_k or top_k >= len(tools):
+        return list(tools)
+
+    scores = get_tool_index(tools).score(message)
+    for name, boost in (boosts or {}).items():
+        if name in scores:
+            scores[name] += boost
+
+    ranked = [name for name, score in sorted(scores.items(), key=lambda x: x[1], reverse=True) if score > 0]
+    selected = set(ranked[:top_k]) | set(FALLBACK_TOOLS)
+    return [tool for tool in tools if tool.name in selected]
@@ -1,11 +1,25 @@
 import frappe
 from langchain.tools import tool
-from typing import List, Dict, Any, Optional
-from .charts import create_sales_by_status_chart, create_pie_chart, create_donut_chart, create_line_chart
+from typing import List, Dict, Any, Optional, Union
+from .charts import generate_chart_data, create_sales_by_status_chart, create_pie_chart, create_donut_chart, create_line_chart, create_axis_mixed_chart
+from .context import get_tool_context
+from .results import ToolResult
+from . import analytics, catalog, reports, stock
+from .concurrency import run_concurrently
+
+
+# Outstanding invoice ageing buckets: (label, maximum days past due)
+AGEING_BUCKETS = [
+    ("Not Due", 0),
+    ("1-30 Days", 30),
+    ("31-60 Days", 60),
+    ("61-90 Days", 90),
+    ("Over 90 Days", float("inf")),
+]
 
 
 @tool
-def search_customers(query: str, limit: int = 10) -> str:
+def search_customers(query: str, limit: int = 10) -> Union[ToolResult, str]:
     """
     Search for customers by name or other fields.
     
@@ -27,18 +41,23 @@ def search_customers(query: str, limit: int = 10) -> str:
         if not customers:
             return f"No customers found matching '{query}'"
         
-        result = f"Found {len(customers)} customer(s):\n\n"
-        for idx, customer in enumerate(customers, 1):
-            result += f"{idx}. {customer.customer_name} (ID: {customer.name})\n"
-            result += f"   Type: {customer.customer_type}, Group: {customer.customer_group}\n"
-        
-        return result
+        return ToolResult(
+            title=f"Found {len(customers)} customer(s) matching '{query}'",
+            columns=[
+                {"fieldname": "name", "label": "ID", "fieldtype": "Link", "options": "Customer"},
+                {"fieldname": "customer_name", "label": "Customer Name"},
+                {"fieldname": "customer_type", "label": "Type"},
+                {"fieldname": "customer_group", "label": "Group"},
+                {"fieldname": "territory", "label": "Territory"},
+            ],
+            rows=[[c.name, c.customer_name, c.customer_type, c.customer_group, c.territory] for c in customers]
+        )
     except Exception as e:
         return f"Error searching customers: {str(e)}"
 
 
 @tool
-def get_customer_details(customer_id: str) -> str:
+def get_customer_details(customer_id: str) -> Union[ToolResult, str]:
     """
     Get detailed information about a specific customer.
     
@@ -49,42 +68,205 @@ def get_customer_details(customer_id: str) -> str:
         Detailed customer information
     """
     try:
-        customer = frappe.get_doc("Customer", customer_id)
-        
-        result = f"Customer Details for: {customer.customer_name}\n\n"
-        result += f"ID: {customer.name}\n"
-        result += f"Type: {customer.customer_type}\n"
-        result += f"Group: {customer.customer_group}\n"
-        result += f"Territory: {customer.territory}\n"
-        
-        if customer.mobile_no:
-            result += f"Mobile: {customer.mobile_no}\n"
-        if customer.email_id:
-            result += f"Email: {customer.email_id}\n"
-        
-        outstanding = frappe.get_value(
+        customer = frappe.db.get_value(
             "Customer",
             customer_id,
-            "outstanding_amount"
-        ) or 0
-        result += f"\nOutstanding Amount: {frappe.utils.fmt_money(outstanding, currency='USD')}\n"
-        
-        return result
+            ["name", "customer_name", "customer_type", "customer_group", "territory", "mobile_no", "email_id"],
+            as_dict=True
+        )
+        if not customer:
+            return f"Customer {customer_id} not found"
+        
+        outstanding = frappe.db.sql("""
+            SELECT SUM(outstanding_amount) FROM `tabSales Invoice`
+            WHERE customer = %s AND docstatus = 1
+        """, customer.name)[0][0] or 0
+        
+        return ToolResult(
+            title=f"Customer Details for: {customer.customer_name}",
+            properties=[
+                ["ID", customer.name],
+                ["Type", customer.customer_type],
+                ["Group", customer.customer_group],
+                ["Territory", customer.territory],
+                ["Mobile", customer.mobile_no],
+                ["Email", customer.email_id],
+                ["Outstanding Amount", frappe.utils.fmt_money(outstanding, currency=get_tool_context().default_currency)],
+            ]
+        )
     except Exception as e:
         return f"Error fetching customer details: {str(e)}"
 
 
 @tool
-def search_items(query: str, limit: int = 10) -> str:
+def get_customer_overview(customer_id: str, recent_orders: int = 5) -> Union[ToolResult, str]:
+    """
+    Customer 360 in one call: profile, recent sales orders, unpaid invoices with ageing, last payment and top items.
+    Use this when asked about a customer's orders, unpaid/overdue invoices, payments or what they buy.
+    
+    Args:
+        customer_id: The customer ID or name
+        recent_orders: Number of recent sales orders to include (default: 5)
+    
+    Returns:
+        Customer profile with outstanding ageing and tables of recent orders, unpaid invoices and top items
+    """
+    try:
+        context = get_tool_context()
+        if not context.has_permission("Customer", "read"):
+            return "You don't have permission to access Customer"
+        
+        fields = ["name", "customer_name", "customer_type", "customer_group", "territory", "mobile_no", "email_id", "default_currency"]
+        customer = frappe.db.get_value("Customer", customer_id, fields, as_dict=True)
+        if not customer:
+            customer = frappe.db.get_value("Customer", {"customer_name": ["like", f"%{customer_id}%"]}, fields, as_dict=True)
+        if not customer:
+            return f"Customer {customer_id} not found"
+        
+        tasks = {}
+        if context.has_permission("Sales Order", "read"):
+            tasks["orders"] = lambda: frappe.db.sql("""
+                SELECT name, transaction_date, status, grand_total, currency, per_delivered, per_billed
+                FROM `tabSales Order`
+                WHERE customer = %(customer)s AND docstatus = 1
+                ORDER BY transaction_date DESC, creation DESC
+                LIMIT %(limit)s
+            """, {"customer": customer.name, "limit": int(recent_orders or 5)}, as_dict=True)
+        if context.has_permission("Sales Invoice", "read"):
+            tasks["invoices"] = lambda: frappe.db.sql("""
+                SELECT name, posting_date, due_date, outstanding_amount, currency,
+                    DATEDIFF(CURDATE(), IFNULL(due_date, posting_date)) AS days_overdue
+                FROM `tabSales Invoice`
+                WHERE customer = %(customer)s AND docstatus = 1 AND outstanding_amount > 0
+                ORDER BY IFNULL(due_date, posting_date)
+            """, {"customer": customer.name}, as_dict=True)
+            tasks["top_items"] = lambda: frappe.db.sql("""
+                SELECT item.item_code, item.item_name, inv.currency,
+                    SUM(item.stock_qty) AS qty, SUM(item.net_amount) AS amount
+                FROM `tabSales Invoice Item` item
+                INNER JOIN `tabSales Invoice` inv ON inv.name = item.parent
+                WHERE inv.customer = %(customer)s AND inv.docstatus = 1
+                    AND inv.posting_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
+                GROUP BY item.item_code, item.item_name, inv.currency
+                ORDER BY amount DESC
+                LIMIT 5
+            """, {"customer": customer.name}, as_dict=True)
+        if context.has_permission("Payment Entry", "read"):
+            tasks["payment"] = lambda: frappe.db.sql("""
+                SELECT name, posting_date, paid_amount, paid_from_account_currency AS currency, mode_of_payment
+                FROM `tabPayment Entry`
+                WHERE party_type = 'Customer' AND party = %(customer)s AND docstatus = 1 AND payment_type = 'Receive'
+                ORDER BY posting_date DESC, creation DESC
+                LIMIT 1
+            """, {"customer": customer.name}, as_dict=True)
+        
+        # The lookups are independent, so they run in parallel; failures are logged by run_concurrently
+        results = run_concurrently(tasks)
+        failed = [name for name, value in results.items() if isinstance(value, Exception)]
+        results = {name: value for name, value in results.items() if name not in failed}
+        
+        currency = customer.default_currency or context.default_currency
+        
+        ageing = {bucket: 0 for bucket, _ in AGEING_BUCKETS}
+        for invoice in results.get("invoices", []):
+            invoice.ageing = next(bucket for bucket, days in AGEING_BUCKETS if invoice.days_overdue <= days)
+            ageing[invoice.ageing] += invoice.outstanding_amount or 0
+        
+        properties = [
+            ["ID", customer.name],
+            ["Type", customer.customer_type],
+            ["Group", customer.customer_group],
+            ["Territory", customer.territory],
+            ["Mobile", customer.mobile_no],
+            ["Email", customer.email_id],
+        ]
+        if "invoices" in results:
+            properties.append(["Outstanding Amount", frappe.utils.fmt_money(sum(ageing.values()), currency=currency)])
+            properties.extend(
+                [f"Outstanding {bucket}", frappe.utils.fmt_money(amount, currency=currency)]
+                for bucket, amount in ageing.items() if amount
+            )
+        if results.get("payment"):
+            payment = results["payment"][0]
+            properties.append([
+                "Last Payment",
+                f"{frappe.utils.fmt_money(payment.paid_amount, currency=payment.currency)} on {payment.posting_date} ({payment.name})"
+            ])
+        
+        sections = []
+        if results.get("orders"):
+            sections.append(ToolResult(
+                title="Recent Sales Orders",
+                columns=[
+                    {"fieldname": "name", "label": "Order ID", "fieldtype": "Link", "options": "Sales Order"},
+                    {"fieldname": "transaction_date", "label": "Date", "fieldtype": "Date"},
+                    {"fieldname": "status", "label": "Status"},
+                    {"fieldname": "grand_total", "label": "Amount", "fieldtype": "Currency", "options": "currency"},
+                    {"fieldname": "per_delivered", "label": "% Delivered", "fieldtype": "Percent"},
+                    {"fieldname": "per_billed", "label": "% Billed", "fieldtype": "Percent"},
+                    {"fieldname": "currency", "label": "Currency", "hidden": 1},
+                ],
+                rows=[
+                    [o.name, str(o.transaction_date), o.status, o.grand_total, o.per_delivered, o.per_billed, o.currency]
+                    for o in results["orders"]
+                ]
+            ))
+        if results.get("invoices"):
+            sections.append(ToolResult(
+                title="Unpaid Sales Invoices",
+                columns=[
+                    {"fieldname": "name", "label": "Invoice", "fieldtype": "Link", "options": "Sales Invoice"},
+                    {"fieldname": "posting_date", "label": "Date", "fieldtype": "Date"},
+                    {"fieldname": "due_date", "label": "Due Date", "fieldtype": "Date"},
+                    {"fieldname": "outstanding_amount", "label": "Outstanding", "fieldtype": "Currency", "options": "currency"},
+                    {"fieldname": "ageing", "label": "Ageing"},
+                    {"fieldname": "currency", "label": "Currency", "hidden": 1},
+                ],
+                rows=[
+                    [i.name, str(i.posting_date), str(i.due_date or ""), i.outstanding_amount, i.ageing, i.currency]
+                    for i in results["invoices"]
+                ]
+            ))
+        if results.get("top_items"):
+            sections.append(ToolResult(
+                title="Top Items (last 12 months)",
+                columns=[
+                    {"fieldname": "item_code", "label": "Item", "fieldtype": "Link", "options": "Item"},
+                    {"fieldname": "item_name", "label": "Item Name"},
+                    {"fieldname": "qty", "label": "Qty", "fieldtype": "Float"},
+                    {"fieldname": "amount", "label": "Amount", "fieldtype": "Currency", "options": "currency"},
+                    {"fieldname": "currency", "label": "Currency", "hidden": 1},
+                ],
+                rows=[[i.item_code, i.item_name, i.qty, i.amount, i.currency] for i in results["top_items"]]
+            ))
+        
+        return ToolResult(
+            title=f"Customer Overview: {customer.customer_name}",
+            properties=properties,
+            sections=sections,
+            message=f"Could not load: {', '.join(failed).replace('_', ' ')}" if failed else None,
+            chart=generate_chart_data(
+                chart_type="bar",
+                title="Outstanding by Age",
+                labels=list(ageing),
+                datasets=[{"name": "Outstanding", "values": list(ageing.values())}]
+            ) if any(ageing.values()) else None
+        )
+    except Exception as e:
+        return f"Error fetching customer overview: {str(e)}"
+
+
+@tool
+def search_items(query: str, limit: int = 10) -> Union[ToolResult, str]:
     """
-    Search for items/products by name or item code. Returns REAL data from database in HTML table format.
+    Search for items/products by name or item code. Returns REAL data from database as a table.
     
     Args:
         query: Search term for item name or code
         limit: Maximum number of results to return (default: 10)
     
     Returns:
-        List of ACTUAL items from database matching the search criteria in HTML table format
+        List of ACTUAL items from database matching the search criteria
     """
     try:
         items = frappe.get_all(
@@ -102,34 +284,28 @@ def search_items(query: str, limit: int = 10) -> str:
         if not items:
             return f"No items found matching '{query}' in the database."
         
-        # Get default currency
-        default_currency = frappe.db.get_single_value("System Settings", "currency") or frappe.defaults.get_global_default("currency") or "INR"
-        
-        # Format as HTML table
-        result = f"<div class='items-list'><h4>Found {len(items)} Item(s) matching '{query}'</h4>"
-        result += "<table class='table table-bordered table-striped' style='width:100%; margin-top:10px;'>"
-        result += "<thead><tr><th>Item Code</th><th>Item Name</th><th>Item Group</th><th>UOM</th><th style='text-align:right;'>Rate</th></tr></thead><tbody>"
-        
-        for item in items:
-            item_link = f"<a href='/app/item/{item.name}' target='_blank'>{frappe.utils.escape_html(item.item_code or item.name)}</a>"
-            item_name = frappe.utils.escape_html(item.item_name or "")
-            item_group = frappe.utils.escape_html(item.item_group or "")
-            uom = frappe.utils.escape_html(item.stock_uom or "")
-            rate = frappe.utils.fmt_money(item.standard_rate or 0, currency=default_currency) if item.standard_rate else "-"
-            
-            result += f"<tr><td>{item_link}</td><td>{item_name}</td><td>{item_group}</td><td>{uom}</td><td style='text-align:right;'>{rate}</td></tr>"
-        
-        result += "</tbody></table></div>"
-        
-        return result
+        return ToolResult(
+            title=f"Found {len(items)} Item(s) matching '{query}'",
+            columns=[
+                {"fieldname": "item_code", "label": "Item Code", "fieldtype": "Link", "options": "Item"},
+                {"fieldname": "item_name", "label": "Item Name"},
+                {"fieldname": "item_group", "label": "Item Group"},
+                {"fieldname": "stock_uom", "label": "UOM"},
+                {"fieldname": "standard_rate", "label": "Rate", "fieldtype": "Currency", "options": get_tool_context().default_currency},
+            ],
+            rows=[
+                [item.item_code or item.name, item.item_name, item.item_group, item.stock_uom, item.standard_rate or None]
+                for item in items
+            ]
+        )
     except Exception as e:
         return f"Error searching items: {str(e)}"
 
 
 @tool
-def get_sales_orders(customer: Optional[str] = None, status: Optional[str] = None, limit: int = 10, summary: str = "no") -> str:
+def get_sales_orders(customer: Optional[str] = None, status: Optional[str] = None, limit: int = 10, summary: str = "no") -> Union[ToolResult, str]:
     """
-    Get sales orders with optional filters. Returns data in HTML table format.
+    Get sales orders with optional filters. Returns data as a table.
     
     Args:
         customer: Filter by customer name (optional)
@@ -138,74 +314,61 @@ def get_sales_orders(customer: Optional[str] = None, status: Optional[str] = Non
         summary: Set to "by_status" to get summary grouped by status with totals (default: "no")
     
     Returns:
-        List of sales orders in HTML table format, or summary table grouped by status if summary="by_status"
+        List of sales orders, or summary table grouped by status if summary="by_status"
     """
     try:
-        # Get default currency from company
-        default_currency = frappe.db.get_single_value("System Settings", "currency") or frappe.defaults.get_global_default("currency") or "INR"
+        default_currency = get_tool_context().default_currency
         
         # If summary by status requested
         if summary == "by_status":
-            query = """
-                SELECT 
+            filter_conditions = []
+            if status:
+                filter_conditions.append("AND status = %(status)s")
+            if customer:
+                filter_conditions.append("AND customer LIKE %(customer)s")
+            
+            results = frappe.db.sql(f"""
+                SELECT
                     status,
                     COUNT(*) as count,
                     SUM(IFNULL(grand_total, 0)) as total_amount,
                     currency
                 FROM `tabSales Order`
                 WHERE docstatus != 2
-                {filters}
+                {" ".join(filter_conditions)}
                 GROUP BY status, currency
                 ORDER BY count DESC
-            """
-            
-            filter_conditions = []
-            if status:
-                filter_conditions.append(f"AND status = '{frappe.db.escape(status)}'")
-            if customer:
-                filter_conditions.append(f"AND customer LIKE '%{frappe.db.escape(customer)}%'")
-            
-            filter_str = " ".join(filter_conditions) if filter_conditions else ""
-            query = query.format(filters=filter_str)
-            
-            results = frappe.db.sql(query, as_dict=True)
+            """, {"status": status, "customer": f"%{customer}%"}, as_dict=True)
             
             if not results:
                 return "No sales orders found"
             
-            # Aggregate by status across currencies
-            status_totals = {}
-            for row in results:
-                status_key = row.status or "None"
-                if status_key not in status_totals:
-                    status_totals[status_key] = {"count": 0, "amounts": {}}
-                status_totals[status_key]["count"] += row.count
-                curr = row.currency or default_currency
-                if curr not in status_totals[status_key]["amounts"]:
-                    status_totals[status_key]["amounts"][curr] = 0
-                status_totals[status_key]["amounts"][curr] += (row.total_amount or 0)
-            
-            # Format as HTML table
-            result = "<div class='sales-orders-summary'><h4>Sales Orders by Status</h4>"
-            result += "<table class='table table-bordered table-striped' style='width:100%; margin-top:10px;'>"
-            result += "<thead><tr><th>Status</th><th>Count</th><th>Total Amount</th></tr></thead><tbody>"
-            
             total_count = 0
             grand_totals = {}
-            
-            for status_name, data in sorted(status_totals.items(), key=lambda x: x[1]["count"], reverse=True):
-                total_count += data["count"]
-                amounts_str = ", ".join([f"{frappe.utils.fmt_money(amt, currency=curr)}" for curr, amt in data["amounts"].items()])
-                for curr, amt in data["amounts"].items():
-                    grand_totals[curr] = grand_totals.get(curr, 0) + amt
+            by_status = {}
+            rows = []
+            for row in results:
+                curr = row.currency or default_currency
+                total_count += row.count
+                grand_totals[curr] = grand_totals.get(curr, 0) + (row.total_amount or 0)
+                rows.append([row.status or "None", row.count, row.total_amount or 0, curr])
                 
-                result += f"<tr><td><strong>{status_name}</strong></td><td style='text-align:center;'>{data['count']}</td><td style='text-align:right;'>{amounts_str}</td></tr>"
-            
-            grand_total_str = ", ".join([f"{frappe.utils.fmt_money(amt, currency=curr)}" for curr, amt in grand_totals.items()])
-            result += f"<tr style='font-weight:bold; background-color:#f0f0f0;'><td>Total</td><td style='text-align:center;'>{total_count}</td><td style='text-align:right;'>{grand_total_str}</td></tr>"
-            result += "</tbody></table></div>"
+                status_row = by_status.setdefault(row.status or "None", {"status": row.status or "None", "count": 0, "total_amount": 0})
+                status_row["count"] += row.count
+                status_row["total_amount"] += row.total_amount or 0
             
-            return result
+            return ToolResult(
+                title="Sales Orders by Status",
+                columns=[
+                    {"fieldname": "status", "label": "Status"},
+                    {"fieldname": "count", "label": "Count", "fieldtype": "Int"},
+                    {"fieldname": "total_amount", "label": "Total Amount", "fieldtype": "Currency", "options": "currency"},
+                    {"fieldname": "currency", "label": "Currency", "hidden": 1},
+                ],
+                rows=rows,
+                totals={"count": total_count, "total_amount": grand_totals},
+                chart=create_sales_by_status_chart(list(by_status.values()))
+            )
         
         # Otherwise return individual records
         filters = {"docstatus": ["!=", 2]}
@@ -231,31 +394,36 @@ def get_sales_orders(customer: Optional[str] = None, status: Optional[str] = Non
             curr = order.currency or default_currency
             currency_totals[curr] = currency_totals.get(curr, 0) + (order.grand_total or 0)
         
-        # Format as HTML table
-        result = f"<div class='sales-orders-list'><h4>Sales Orders ({len(orders)} records)</h4>"
-        result += "<table class='table table-bordered table-striped' style='width:100%; margin-top:10px;'>"
-        result += "<thead><tr><th>Order ID</th><th>Customer</th><th>Date</th><th>Status</th><th style='text-align:right;'>Amount</th></tr></thead><tbody>"
-        
-        for order in orders:
-            order_link = f"<a href='/app/sales-order/{order.name}' target='_blank'>{order.name}</a>"
-            cust = frappe.utils.escape_html(order.customer or "")
-            date = str(order.transaction_date or "")
-            stat = frappe.utils.escape_html(order.status or "")
-            curr = order.currency or default_currency
-            amt = frappe.utils.fmt_money(order.grand_total or 0, currency=curr)
-            result += f"<tr><td>{order_link}</td><td>{cust}</td><td>{date}</td><td><span class='indicator-pill'>{stat}</span></td><td style='text-align:right;'>{amt}</td></tr>"
-        
-        total_str = ", ".join([f"{frappe.utils.fmt_money(amt, currency=curr)}" for curr, amt in currency_totals.items()])
-        result += f"<tr style='font-weight:bold; background-color:#f0f0f0;'><td colspan='4'>Total</td><td style='text-align:right;'>{total_str}</td></tr>"
-        result += "</tbody></table></div>"
-        
-        return result
+        columns = [
+            {"fieldname": "name", "label": "Order ID", "fieldtype": "Link", "options": "Sales Order"},
+            {"fieldname": "customer", "label": "Customer"},
+            {"fieldname": "transaction_date", "label": "Date", "fieldtype": "Date"},
+            {"fieldname": "status", "label": "Status"},
+            {"fieldname": "grand_total", "label": "Amount", "fieldtype": "Currency", "options": "currency"},
+            {"fieldname": "currency", "label": "Currency", "hidden": 1},
+        ]
+        return ToolResult(
+            title=f"Sales Orders ({len(orders)} records)",
+            columns=columns,
+            rows=[
+                [o.name, o.customer, str(o.transaction_date or ""), o.status, o.grand_total or 0, o.currency or default_currency]
+                for o in orders
+            ],
+            totals={"grand_total": currency_totals},
+            chart=generate_chart_data(
+                chart_type="bar",
+                title="Sales Orders",
+                labels=[o.name for o in orders],
+                datasets=[{"name": "Amount", "values": [o.grand_total or 0 for o in orders]}]
+            ),
+            source=_export_source("Sales Orders", "Sales Order", columns, filters, "transaction_date desc")
+        )
     except Exception as e:
         return f"Error fetching sales orders: {str(e)}"
 
 
 @tool
-def get_purchase_orders(supplier: Optional[str] = None, status: Optional[str] = None, limit: int = 10) -> str:
+def get_purchase_orders(supplier: Optional[str] = None, status: Optional[str] = None, limit: int = 10) -> Union[ToolResult, str]:
     """
     Get purchase orders with optional filters.
     
@@ -277,7 +445,7 @@ def get_purchase_orders(supplier: Optional[str] = None, status: Optional[str] =
         orders = frappe.get_all(
             "Purchase Order",
             filters=filters,
-            fields=["name", "supplier", "transaction_date", "grand_total", "status"],
+            fields=["name", "supplier", "transaction_date", "grand_total", "status", "currency"],
             order_by="transaction_date desc",
             limit=limit
         )
@@ -285,78 +453,144 @@ def get_purchase_orders(supplier: Optional[str] = None, status: Optional[str] =
         if not orders:
             return "No purchase orders found matching the criteria"
         
-        result = f"Found {len(orders)} purchase order(s):\n\n"
-        for idx, order in enumerate(orders, 1):
-            result += f"{idx}. PO: {order.name}\n"
-            result += f"   Supplier: {order.supplier}\n"
-            result += f"   Date: {order.transaction_date}\n"
-            result += f"   Amount: {frappe.utils.fmt_money(order.grand_total, currency='USD')}\n"
-            result += f"   Status: {order.status}\n\n"
-        
-        return result
+        default_currency = get_tool_context().default_currency
+        columns = [
+            {"fieldname": "name", "label": "PO", "fieldtype": "Link", "options": "Purchase Order"},
+            {"fieldname": "supplier", "label": "Supplier"},
+            {"fieldname": "transaction_date", "label": "Date", "fieldtype": "Date"},
+            {"fieldname": "grand_total", "label": "Amount", "fieldtype": "Currency", "options": "currency"},
+            {"fieldname": "status", "label": "Status"},
+            {"fieldname": "currency", "label": "Currency", "hidden": 1},
+        ]
+        return ToolResult(
+            title=f"Found {len(orders)} purchase order(s)",
+            columns=columns,
+            rows=[
+                [o.name, o.supplier, str(o.transaction_date or ""), o.grand_total or 0, o.status, o.currency or default_currency]
+                for o in orders
+            ],
+            chart=generate_chart_data(
+                chart_type="bar",
+                title="Purchase Orders",
+                labels=[o.name for o in orders],
+                datasets=[{"name": "Amount", "values": [o.grand_total or 0 for o in orders]}]
+            ),
+            source=_export_source("Purchase Orders", "Purchase Order", columns, filters, "transaction_date desc")
+        )
     except Exception as e:
         return f"Error fetching purchase orders: {str(e)}"
 
 
 @tool
-def get_stock_balance(item_code: str, warehouse: Optional[str] = None) -> str:
+def get_stock_balance(
+    item_code: Optional[str] = None,
+    warehouse: Optional[str] = None,
+    item_group: Optional[str] = None,
+    company: Optional[str] = None,
+    low_stock_only: bool = False
+) -> Union[ToolResult, str]:
     """
-    Get REAL stock balance for an item from database. Returns actual warehouse data in HTML table format.
+    Get REAL stock balance for one or many items from database, rolled up through the warehouse tree, as a table.
     
     Args:
-        item_code: Item code to check stock for
-        warehouse: Specific warehouse to check (optional, shows all warehouses if not specified)
+        item_code: Item code, or several item codes separated by commas (optional if item_group is given)
+        warehouse: Warehouse or warehouse group to check (optional, shows all warehouses if not specified)
+        item_group: Item group to check every item of, e.g. "Laptops" (optional)
+        company: Restrict to one company's warehouses (optional)
+        low_stock_only: Only show rows at or below the item's reorder level (default: False)
     
     Returns:
-        ACTUAL stock balance information from database
+        ACTUAL stock per item and warehouse, with group warehouse and company totals and low-stock flags
     """
     try:
-        from erpnext.stock.utils import get_stock_balance as get_stock_bal
+        item_codes = [code.strip() for code in (item_code or "").split(",") if code.strip()]
+        if not item_codes and not item_group:
+            return "Please give an item code, a list of item codes or an item group"
+        
+        if not get_tool_context().has_permission("Bin", "read"):
+            return "You don't have permission to view stock balances"
+        
+        bins = stock.get_bins(item_codes, item_group, warehouse, company)
+        if not bins:
+            return f"No stock found for {item_code or item_group} in the database."
+        
+        tree = stock.get_warehouse_tree(list({b.company for b in bins}))
+        totals = stock.rollup(bins, tree)
+        items = {b.item_code: b.item_name for b in bins}
+        reorder_levels = stock.get_reorder_levels(list(items))
+        
+        def make_row(code, location, location_type, qty):
+            level = reorder_levels.get((code, location))
+            low = level is not None and qty["projected_qty"] <= level
+            return [
+                code, items[code], location, location_type,
+                qty["actual_qty"] or 0, qty["reserved_qty"] or 0, qty["projected_qty"] or 0,
+                level, "Yes" if low else ""
+            ]
         
-        if warehouse:
-            balance = get_stock_bal(item_code, warehouse)
-            return f"<div><strong>Stock balance for {frappe.utils.escape_html(item_code)} in {frappe.utils.escape_html(warehouse)}:</strong> {balance} units</div>"
+        # Leaf bins and rolled-up group warehouses per item, then per company
+        nodes = {}
+        for b in bins:
+            nodes.setdefault(b.item_code, {}).setdefault(b.company, {})[b.warehouse] = b
+        for (code, node), qty in totals.items():
+            if isinstance(node, str):
+                nodes[code].setdefault(tree[node].company, {})[node] = qty
+        
+        # Per item and company: the company total, then every warehouse node in tree order
+        rows = []
+        for code in items:
+            for company_name in sorted(nodes[code]):
+                rows.append(make_row(code, company_name, "Company", totals[(code, ("Company", company_name))]))
+                company_nodes = nodes[code][company_name]
+                for node in sorted(company_nodes, key=lambda name: (tree.get(name) or {}).get("lft") or 0):
+                    rows.append(make_row(code, node, "Warehouse", company_nodes[node]))
+        
+        if low_stock_only:
+            rows = [row for row in rows if row[8]]
+            if not rows:
+                return f"No items at or below their reorder level for {item_code or item_group}"
+        
+        # Totals and chart come from the leaf bins only, so roll-up rows are not counted twice
+        if len(items) > 1:
+            chart_labels = list(items)
+            chart_values = [sum(b.actual_qty or 0 for b in bins if b.item_code == code) for code in items]
         else:
-            bins = frappe.get_all(
-                "Bin",
-                filters={"item_code": item_code},
-                fields=["warehouse", "actual_qty", "reserved_qty", "projected_qty"]
+            chart_labels = [b.warehouse for b in bins]
+            chart_values = [b.actual_qty or 0 for b in bins]
+        
+        return ToolResult(
+            title=f"Stock Balance for {item_code or item_group}" + (f" in {warehouse}" if warehouse else ""),
+            columns=[
+                {"fieldname": "item_code", "label": "Item", "fieldtype": "Link", "options": "Item"},
+                {"fieldname": "item_name", "label": "Item Name"},
+                {"fieldname": "location", "label": "Warehouse", "fieldtype": "Dynamic Link", "options": "location_type"},
+                {"fieldname": "location_type", "label": "Level", "hidden": 1},
+                {"fieldname": "actual_qty", "label": "Actual Qty", "fieldtype": "Float"},
+                {"fieldname": "reserved_qty", "label": "Reserved Qty", "fieldtype": "Float"},
+                {"fieldname": "projected_qty", "label": "Available Qty", "fieldtype": "Float"},
+                {"fieldname": "reorder_level", "label": "Reorder Level", "fieldtype": "Float"},
+                {"fieldname": "low_stock", "label": "Low Stock"},
+            ],
+            rows=rows,
+            message=None if low_stock_only else "Company and group warehouse rows are totals of the warehouses below them.",
+            totals={
+                "actual_qty": sum(b.actual_qty or 0 for b in bins),
+                "reserved_qty": sum(b.reserved_qty or 0 for b in bins),
+                "projected_qty": sum(b.projected_qty or 0 for b in bins),
+            },
+            chart=generate_chart_data(
+                chart_type="bar",
+                title=f"Stock Balance for {item_code or item_group}",
+                labels=chart_labels,
+                datasets=[{"name": "Actual Qty", "values": chart_values}]
             )
-            
-            if not bins:
-                return f"No stock found for item: {frappe.utils.escape_html(item_code)} in the database."
-            
-            # Format as HTML table
-            result = f"<div class='stock-balance'><h4>Stock Balance for {frappe.utils.escape_html(item_code)}</h4>"
-            result += "<table class='table table-bordered table-striped' style='width:100%; margin-top:10px;'>"
-            result += "<thead><tr><th>Warehouse</th><th style='text-align:right;'>Actual Qty</th><th style='text-align:right;'>Reserved Qty</th><th style='text-align:right;'>Available Qty</th></tr></thead><tbody>"
-            
-            total_actual = 0
-            total_reserved = 0
-            total_available = 0
-            
-            for bin_data in bins:
-                wh = frappe.utils.escape_html(bin_data.warehouse or "")
-                actual = bin_data.actual_qty or 0
-                reserved = bin_data.reserved_qty or 0
-                available = bin_data.projected_qty or 0
-                
-                total_actual += actual
-                total_reserved += reserved
-                total_available += available
-                
-                result += f"<tr><td>{wh}</td><td style='text-align:right;'>{actual}</td><td style='text-align:right;'>{reserved}</td><td style='text-align:right;'>{available}</td></tr>"
-            
-            result += f"<tr style='font-weight:bold; background-color:#f0f0f0;'><td>Total</td><td style='text-align:right;'>{total_actual}</td><td style='text-align:right;'>{total_reserved}</td><td style='text-align:right;'>{total_available}</td></tr>"
-            result += "</tbody></table></div>"
-            
-            return result
+        )
     except Exception as e:
         return f"Error fetching stock balance: {str(e)}"
 
 
 @tool
-def search_doctype(doctype: str, query: str, limit: int = 10) -> str:
+def search_doctype(doctype: str, query: str, limit: int = 10) -> Union[ToolResult, str]:
     """
     Search for documents in any ERPNext doctype.
     
@@ -369,10 +603,11 @@ def search_doctype(doctype: str, query: str, limit: int = 10) -> str:
         List of matching documents
     """
     try:
-        if not frappe.has_permission(doctype, "read"):
+        context = get_tool_context()
+        if not context.has_permission(doctype, "read"):
             return f"You don't have permission to access {doctype}"
         
-        meta = frappe.get_meta(doctype)
+        meta = context.get_meta(doctype)
         search_field = meta.search_fields.split(",")[0].strip() if meta.search_fields else "name"
         
         filters = [[search_field, "like", f"%{query}%"]]
@@ -393,14 +628,12 @@ def search_doctype(doctype: str, query: str, limit: int = 10) -> str:
         if not docs:
             return f"No {doctype} documents found matching '{query}'"
         
-        result = f"Found {len(docs)} {doctype} document(s):\n\n"
-        for idx, doc in enumerate(docs, 1):
-            result += f"{idx}. {doc.name}\n"
-            for field in fields:
-                if field != "name" and doc.get(field):
-                    result += f"   {field}: {doc.get(field)}\n"
-        
-        return result
+        return ToolResult(
+            title=f"Found {len(docs)} {doctype} document(s)",
+            columns=[{"fieldname": "name", "label": "ID", "fieldtype": "Link", "options": doctype}]
+            + [{"fieldname": field, "label": meta.get_label(field)} for field in fields[1:]],
+            rows=[[_to_plain(doc.get(field)) for field in fields] for doc in docs]
+        )
     except Exception as e:
         return f"Error searching {doctype}: {str(e)}"
 
@@ -414,32 +647,23 @@ def get_all_modules() -> str:
         List of all modules with their doctypes
     """
     try:
-        modules = frappe.get_all("Module Def", 
-                                fields=["name", "module_name", "app_name"],
-                                order_by="app_name, module_name")
+        apps = catalog.get_modules(get_tool_context())
         
-        if not modules:
+        if not apps:
             return "No modules found"
         
-        result = "Available Modules:\n\n"
-        current_app = None
+        result = "Available Modules (by app):\n"
+        for app_name, modules in apps.items():
+            result += f"{app_name or 'other'}: {', '.join(modules)}\n"
         
-        for module in modules:
-            if current_app != module.app_name:
-                current_app = module.app_name
-                result += f"\n📦 {current_app.upper()}\n"
-                result += "=" * 50 + "\n"
-            
-            result += f"  • {module.module_name}\n"
-        
-        result += f"\nTotal: {len(modules)} modules\n"
+        result += f"Total: {sum(len(modules) for modules in apps.values())} modules\n"
         return result
     except Exception as e:
         return f"Error fetching modules: {str(e)}"
 
 
 @tool
-def get_doctypes_in_module(module_name: str) -> str:
+def get_doctypes_in_module(module_name: str) -> Union[ToolResult, str]:
     """
     Get all doctypes in a specific module.
     
@@ -450,34 +674,34 @@ def get_doctypes_in_module(module_name: str) -> str:
         List of doctypes in the module
     """
     try:
-        doctypes = frappe.get_all("DocType",
-                                 filters={"module": module_name, "istable": 0},
-                                 fields=["name", "is_submittable", "is_tree"],
-                                 order_by="name")
+        doctypes = catalog.get_module_doctypes(get_tool_context(), module_name)
         
         if not doctypes:
             return f"No doctypes found in module '{module_name}'"
         
-        result = f"DocTypes in '{module_name}' module:\n\n"
-        
+        rows = []
         for dt in doctypes:
             flags = []
-            if dt.is_submittable:
+            if dt["submittable"]:
                 flags.append("Submittable")
-            if dt.is_tree:
+            if dt["tree"]:
                 flags.append("Tree")
-            
-            flag_str = f" [{', '.join(flags)}]" if flags else ""
-            result += f"  • {dt.name}{flag_str}\n"
+            rows.append([dt["name"], ", ".join(flags)])
         
-        result += f"\nTotal: {len(doctypes)} doctypes\n"
-        return result
+        return ToolResult(
+            title=f"DocTypes in '{module_name}' module",
+            columns=[
+                {"fieldname": "doctype", "label": "DocType", "fieldtype": "Link", "options": "DocType"},
+                {"fieldname": "flags", "label": "Type"},
+            ],
+            rows=rows
+        )
     except Exception as e:
         return f"Error fetching doctypes: {str(e)}"
 
 
 @tool
-def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Optional[str] = None, limit: int = 10) -> str:
+def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Optional[str] = None, limit: int = 10) -> Union[ToolResult, str]:
     """
     Query any doctype with filters and field selection.
     
@@ -491,8 +715,8 @@ def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Opti
         Query results from the doctype
     """
     try:
-        # Check permission
-        if not frappe.has_permission(doctype_name, "read"):
+        context = get_tool_context()
+        if not context.has_permission(doctype_name, "read"):
             return f"You don't have permission to access {doctype_name}"
         
         # Parse filters
@@ -503,6 +727,8 @@ def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Opti
                     key, val = f.strip().split("=", 1)
                     filter_dict[key.strip()] = val.strip()
         
+        meta = context.get_meta(doctype_name)
+        
         # Parse fields
         field_list = ["name"]
         if fields:
@@ -511,7 +737,6 @@ def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Opti
                 field_list.insert(0, "name")
         else:
             # Get default fields from meta
-            meta = frappe.get_meta(doctype_name)
             if meta.title_field and meta.title_field not in field_list:
                 field_list.append(meta.title_field)
             
@@ -532,27 +757,30 @@ def query_doctype(doctype_name: str, filters: Optional[str] = None, fields: Opti
             filter_str = f" with filters {filter_dict}" if filter_dict else ""
             return f"No records found in {doctype_name}{filter_str}"
         
-        result = f"Found {len(docs)} record(s) in {doctype_name}:\n\n"
-        
-        for idx, doc in enumerate(docs, 1):
-            result += f"{idx}. {doc.name}\n"
-            for field in field_list[1:]:  # Skip 'name' as it's already shown
-                if field in doc and doc[field]:
-                    value = doc[field]
-                    # Format value
-                    if isinstance(value, (int, float)):
-                        if field in ["grand_total", "total", "amount", "outstanding_amount"]:
-                            value = frappe.utils.fmt_money(value, currency="USD")
-                    result += f"   {field}: {value}\n"
-            result += "\n"
-        
-        return result
+        columns = [{"fieldname": "name", "label": "ID", "fieldtype": "Link", "options": doctype_name}]
+        for field in field_list[1:]:
+            df = meta.get_field(field)
+            column = {"fieldname": field, "label": df.label if df else field}
+            if df and df.fieldtype in ("Currency", "Float", "Int", "Percent", "Date", "Link"):
+                column["fieldtype"] = df.fieldtype
+                if df.fieldtype == "Link":
+                    column["options"] = df.options
+                elif df.fieldtype == "Currency":
+                    column["options"] = context.default_currency
+            columns.append(column)
+        
+        return ToolResult(
+            title=f"Found {len(docs)} record(s) in {doctype_name}",
+            columns=columns,
+            rows=[[_to_plain(doc.get(field)) for field in field_list] for doc in docs],
+            source=_export_source(doctype_name, doctype_name, columns, filter_dict, "modified desc")
+        )
     except Exception as e:
         return f"Error querying {doctype_name}: {str(e)}"
 
 
 @tool
-def get_reports_list(module_name: Optional[str] = None) -> str:
+def get_reports_list(module_name: Optional[str] = None) -> Union[ToolResult, str]:
     """
     Get list of available reports, optionally filtered by module.
     
@@ -563,41 +791,51 @@ def get_reports_list(module_name: Optional[str] = None) -> str:
         List of available reports
     """
     try:
-        filters = {}
-        if module_name:
-            filters["module"] = module_name
-        
-        reports = frappe.get_all("Report",
-                                filters=filters,
-                                fields=["name", "ref_doctype", "report_type", "module"],
-                                order_by="module, name")
+        reports = catalog.get_reports(get_tool_context(), module_name)
         
         if not reports:
             filter_str = f" in module '{module_name}'" if module_name else ""
             return f"No reports found{filter_str}"
         
-        result = "Available Reports:\n\n"
-        current_module = None
-        
-        for report in reports:
-            if current_module != report.module:
-                current_module = report.module
-                result += f"\n📊 {current_module}\n"
-                result += "-" * 50 + "\n"
-            
-            result += f"  • {report.name}"
-            if report.ref_doctype:
-                result += f" (Based on: {report.ref_doctype})"
-            result += f" [{report.report_type}]\n"
-        
-        result += f"\nTotal: {len(reports)} reports\n"
-        return result
+        return ToolResult(
+            title=f"Available Reports in {module_name}" if module_name else "Available Reports",
+            columns=[
+                {"fieldname": "report", "label": "Report"},
+                {"fieldname": "module", "label": "Module"},
+                {"fieldname": "ref_doctype", "label": "Based On"},
+                {"fieldname": "report_type", "label": "Type"},
+            ],
+            rows=[[r["name"], r["module"], r["ref_doctype"], r["type"]] for r in reports]
+        )
     except Exception as e:
         return f"Error fetching reports: {str(e)}"
 
 
 @tool
-def get_doctype_structure(doctype_name: str) -> str:
+def run_report(report_name: str, filters: Optional[Union[str, Dict[str, Any]]] = None) -> Union[ToolResult, str]:
+    """
+    Run an ERPNext report (Query or Script report) and get its result, e.g. "Accounts Receivable", "Stock Balance", "General Ledger".
+    Prefer this over rebuilding a report with other tools. Use get_reports_list to find report names.
+    
+    Args:
+        report_name: Exact report name
+        filters: Report filters as JSON, e.g. {"report_date": "2026-10-19", "ageing_based_on": "Due Date"} (optional, company defaults to the user's company)
+    
+    Returns:
+        First rows of the report with its totals and summary, and a link to the full report
+    """
+    try:
+        return reports.run_report(report_name, filters, get_tool_context())
+    except frappe.PermissionError:
+        return f"You don't have permission to run the report {report_name}"
+    except frappe.DoesNotExistError:
+        return f"Report '{report_name}' does not exist. Use get_reports_list to find the right name."
+    except Exception as e:
+        return f"Error running report {report_name}: {str(e)}"
+
+
+@tool
+def get_doctype_structure(doctype_name: str) -> Union[ToolResult, str]:
     """
     Get the structure/schema of a doctype including all fields.
     
@@ -608,43 +846,42 @@ def get_doctype_structure(doctype_name: str) -> str:
         Structure information including fields, links, and properties
     """
     try:
-        if not frappe.db.exists("DocType", doctype_name):
+        schema = catalog.get_doctype_schema(get_tool_context(), doctype_name)
+        if not schema:
             return f"DocType '{doctype_name}' does not exist"
         
-        meta = frappe.get_meta(doctype_name)
-        
-        result = f"DocType Structure: {doctype_name}\n"
-        result += "=" * 60 + "\n\n"
-        
-        result += f"Module: {meta.module}\n"
-        result += f"Is Submittable: {'Yes' if meta.is_submittable else 'No'}\n"
-        result += f"Is Tree: {'Yes' if meta.is_tree else 'No'}\n"
-        result += f"Track Changes: {'Yes' if meta.track_changes else 'No'}\n"
-        result += f"Allow Rename: {'Yes' if meta.allow_rename else 'No'}\n\n"
-        
-        # Fields
-        result += "FIELDS:\n"
-        result += "-" * 60 + "\n"
-        
-        for field in meta.fields:
-            if field.fieldtype not in ["Section Break", "Column Break", "HTML"]:
-                mandatory = " *" if field.reqd else ""
-                unique = " [Unique]" if field.unique else ""
-                result += f"  • {field.label or field.fieldname}{mandatory}{unique}\n"
-                result += f"    Type: {field.fieldtype}"
-                if field.options:
-                    result += f", Options: {field.options}"
-                result += "\n"
-        
-        result += f"\nTotal Fields: {len([f for f in meta.fields if f.fieldtype not in ['Section Break', 'Column Break', 'HTML']])}\n"
-        
-        return result
+        flags = []
+        for key, label in (("submittable", "Submittable"), ("tree", "Tree"), ("istable", "Child Table"),
+                           ("issingle", "Single"), ("track_changes", "Track Changes"), ("allow_rename", "Allow Rename")):
+            if schema[key]:
+                flags.append(label)
+        
+        return ToolResult(
+            title=f"DocType Structure: {doctype_name}",
+            properties=[
+                ["Module", schema["module"]],
+                ["Properties", ", ".join(flags)],
+                ["Links to", ", ".join(schema["links"])],
+                ["Child tables", ", ".join(schema["children"])],
+            ],
+            columns=[
+                {"fieldname": "fieldname", "label": "Field"},
+                {"fieldname": "label", "label": "Label"},
+                {"fieldname": "fieldtype", "label": "Type"},
+                {"fieldname": "options", "label": "Options"},
+                {"fieldname": "reqd", "label": "Mandatory", "fieldtype": "Int"},
+            ],
+            rows=[
+                [f["fieldname"], f["label"], f["fieldtype"], (f["options"] or "").replace("\n", "|"), f["reqd"]]
+                for f in schema["fields"]
+            ]
+        )
     except Exception as e:
         return f"Error fetching doctype structure: {str(e)}"
 
 
 @tool
-def search_across_doctypes(search_term: str, doctype_list: Optional[str] = None, limit: int = 5) -> str:
+def search_across_doctypes(search_term: str, doctype_list: Optional[str] = None, limit: int = 5) -> Union[ToolResult, str]:
     """
     Search for a term across multiple doctypes.
     
@@ -669,15 +906,15 @@ def search_across_doctypes(search_term: str, doctype_list: Optional[str] = None,
         else:
             doctypes_to_search = default_doctypes
         
-        result = f"Searching for '{search_term}' across doctypes:\n\n"
-        total_results = 0
+        context = get_tool_context()
+        rows = []
         
         for doctype in doctypes_to_search:
             try:
-                if not frappe.has_permission(doctype, "read"):
+                if not context.has_permission(doctype, "read"):
                     continue
                 
-                meta = frappe.get_meta(doctype)
+                meta = context.get_meta(doctype)
                 
                 # Build search filters
                 search_fields = []
@@ -699,31 +936,34 @@ def search_across_doctypes(search_term: str, doctype_list: Optional[str] = None,
                                          fields=["name"] + search_fields[:2],
                                          limit=limit)
                     
-                    if docs:
-                        result += f"📄 {doctype} ({len(docs)} found):\n"
-                        for doc in docs:
-                            result += f"   • {doc.name}\n"
-                            for field in search_fields[:2]:
-                                if field in doc and field != "name" and doc[field]:
-                                    result += f"     {field}: {doc[field]}\n"
-                        result += "\n"
-                        total_results += len(docs)
+                    for doc in docs:
+                        details = ", ".join(
+                            f"{field}: {doc[field]}" for field in search_fields[:2]
+                            if field in doc and field != "name" and doc[field]
+                        )
+                        rows.append([doctype, doc.name, details])
             
             except Exception as e:
                 continue
         
-        if total_results == 0:
-            result += f"No results found for '{search_term}'\n"
-        else:
-            result += f"Total results: {total_results}\n"
+        if not rows:
+            return f"No results found for '{search_term}'"
         
-        return result
+        return ToolResult(
+            title=f"Search results for '{search_term}' ({len(rows)} found)",
+            columns=[
+                {"fieldname": "doctype", "label": "DocType"},
+                {"fieldname": "name", "label": "ID", "fieldtype": "Dynamic Link", "options": "doctype"},
+                {"fieldname": "details", "label": "Details"},
+            ],
+            rows=rows
+        )
     except Exception as e:
         return f"Error searching: {str(e)}"
 
 
 @tool
-def get_doctype_count(doctype_name: str, filters: Optional[str] = None) -> str:
+def get_doctype_count(doctype_name: str, filters: Optional[str] = None) -> Union[ToolResult, str]:
     """
     Get count of documents in a doctype with optional filters.
     
@@ -735,7 +975,8 @@ def get_doctype_count(doctype_name: str, filters: Optional[str] = None) -> str:
         Count of documents
     """
     try:
-        if not frappe.has_permission(doctype_name, "read"):
+        context = get_tool_context()
+        if not context.has_permission(doctype_name, "read"):
             return f"You don't have permission to access {doctype_name}"
         
         # Parse filters
@@ -749,22 +990,33 @@ def get_doctype_count(doctype_name: str, filters: Optional[str] = None) -> str:
         count = frappe.db.count(doctype_name, filters=filter_dict if filter_dict else None)
         
         filter_str = f" with filters {filter_dict}" if filter_dict else ""
-        result = f"Count of {doctype_name}{filter_str}: {count:,} record(s)\n"
+        result = ToolResult(
+            title=f"Count of {doctype_name}{filter_str}",
+            message=f"{count:,} record(s)"
+        )
         
         # Get some stats if possible
         if not filters:
             try:
                 # Try to get status breakdown if status field exists
-                meta = frappe.get_meta(doctype_name)
+                meta = context.get_meta(doctype_name)
                 if any(f.fieldname == "status" for f in meta.fields):
                     status_counts = frappe.get_all(doctype_name,
                                                    fields=["status", "count(*) as count"],
                                                    group_by="status",
                                                    order_by="count desc")
                     if status_counts:
-                        result += "\nBreakdown by Status:\n"
-                        for stat in status_counts:
-                            result += f"  • {stat.status or 'None'}: {stat.count:,}\n"
+                        result.columns = [
+                            {"fieldname": "status", "label": "Status"},
+                            {"fieldname": "count", "label": "Count", "fieldtype": "Int"},
+                        ]
+                        result.rows = [[stat.status or "None", stat.count] for stat in status_counts]
+                        result.chart = generate_chart_data(
+                            chart_type="bar",
+                            title=f"{doctype_name} by Status",
+                            labels=[row[0] for row in result.rows],
+                            datasets=[{"name": "Count", "values": [row[1] for row in result.rows]}]
+                        )
             except:
                 pass
         
@@ -773,6 +1025,133 @@ def get_doctype_count(doctype_name: str, filters: Optional[str] = None) -> str:
         return f"Error counting {doctype_name}: {str(e)}"
 
 
+@tool
+def analyze_trend(
+    doctype: str = "Sales Invoice",
+    metric: str = "amount",
+    period: str = "month",
+    window: int = 3,
+    horizon: int = 3,
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    company: Optional[str] = None,
+    party: Optional[str] = None,
+    item_code: Optional[str] = None
+) -> Union[ToolResult, str]:
+    """
+    Analyse a trend over time: period-over-period and year-over-year (week-over-week for days) growth, moving average, cumulative total and a projection.
+    Use for questions like "is revenue growing month over month?" or "3-month moving average of purchases".
+    
+    Args:
+        doctype: "Sales Invoice", "Sales Order", "Purchase Order" or "Stock Ledger Entry" (default: "Sales Invoice")
+        metric: "amount", "qty" or "count" (default: "amount")
+        period: "day", "week", "month", "quarter" or "year" (default: "month")
+        window: Moving average window in periods (default: 3)
+        horizon: Number of future periods to project (default: 3, 0 for none)
+        from_date: Start date YYYY-MM-DD (optional, defaults to two years of months)
+        to_date: End date YYYY-MM-DD (optional, defaults to today)
+        company: Filter by company (optional)
+        party: Filter by customer or supplier (optional)
+        item_code: Filter by item, Stock Ledger Entry only (optional)
+    
+    Returns:
+        Table of periods with value, growth %, moving average and cumulative total, followed by projected periods
+    """
+    try:
+        if doctype not in analytics.SERIES_SOURCES:
+            return f"Trend analysis supports: {', '.join(analytics.SERIES_SOURCES)}"
+        if period not in analytics.PERIODS:
+            return f"Period must be one of: {', '.join(analytics.PERIODS)}"
+        if metric not in ("amount", "qty", "count"):
+            return "Metric must be one of: amount, qty, count"
+        
+        context = get_tool_context()
+        if not context.has_permission(doctype, "read"):
+            return f"You don't have permission to access {doctype}"
+        
+        window = max(int(window or 1), 1)
+        horizon = max(int(horizon or 0), 0)
+        series = analytics.get_bucketed_series(doctype, metric, period, from_date, to_date, company, party, item_code)
+        if not any(series["values"]):
+            return f"No {doctype} data found for this period"
+        
+        season = analytics.PERIODS[period]["season"]
+        analysis = analytics.analyze_series(series["values"], season, window, horizon)
+        
+        value_column = {"fieldname": "value", "label": metric.title(), "fieldtype": "Float"}
+        if metric == "amount":
+            value_column.update(fieldtype="Currency", options=context.default_currency)
+        elif metric == "count":
+            value_column["fieldtype"] = "Int"
+        
+        columns = [
+            {"fieldname": "period", "label": period.title()},
+            value_column,
+            {"fieldname": "growth_pct", "label": "Growth %", "fieldtype": "Percent"},
+            {"fieldname": "moving_average", "label": f"{window}-{period} Moving Avg", "fieldtype": "Float"},
+            {"fieldname": "cumulative", "label": "Cumulative", "fieldtype": "Float"},
+        ]
+        rows = [
+            [label, value, growth, average, cumulative]
+            for label, value, growth, average, cumulative in zip(
+                series["labels"], analysis["values"], analysis["growth"],
+                analysis["moving_average"], analysis["cumulative"]
+            )
+        ]
+        
+        # Same period a season earlier: week-over-week for days, year-over-year otherwise
+        season_label = analytics.PERIODS[period]["season_label"]
+        if season_label:
+            columns.insert(3, {"fieldname": "season_pct", "label": season_label, "fieldtype": "Percent"})
+            for row, change in zip(rows, analysis["yoy"]):
+                row.insert(3, change)
+        
+        # Projected periods continue from the last bucket
+        start = series["starts"][-1]
+        for value in analysis["projection"]:
+            start = analytics.next_period(start, period)
+            rows.append([f"{analytics.period_label(start, period)} (projected)", round(value, 2)] + [None] * (len(columns) - 2))
+        
+        name = f"{doctype} {metric}"
+        chart = analytics.chart_series(series["labels"], analysis, metric.title())
+        return ToolResult(
+            title=f"{name.title()} by {period}",
+            columns=columns,
+            rows=rows,
+            properties=[
+                ["Trend", f"{analysis['slope']:+,.2f} per {period} (linear fit)"],
+                ["Projection", "linear trend with seasonality" if analysis["seasonal"] else "linear trend"],
+            ],
+            totals={"value": sum(analysis["values"])},
+            chart=create_axis_mixed_chart(
+                chart["labels"], chart["bar_data"], chart["line_data"], title=f"{name.title()} by {period}"
+            )
+        )
+    except Exception as e:
+        return f"Error analysing trend: {str(e)}"
+
+
+def _export_source(title, doctype, columns, filters, order_by):
+    """Query spec that export.py re-runs without a limit; fields follow the column order"""
+    return {
+        "title": title,
+        "doctype": doctype,
+        "fields": [column["fieldname"] for column in columns],
+        "filters": filters,
+        "order_by": order_by,
+        "columns": [{"fieldname": column["fieldname"], "label": column.get("label")} for column in columns],
+    }
+
+
+def _to_plain(value):
+    """Convert DB values (dates, decimals) to JSON-friendly plain values"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if hasattr(value, "as_integer_ratio"):
+        return float(value)
+    return str(value)
+
+
 def get_erpnext_tools(user=None):
     """
     Get all available tools for the ERPNext agent.
@@ -787,6 +1166,7 @@ def get_erpnext_tools(user=None):
         # Original tools
         search_customers,
         get_customer_details,
+        get_customer_overview,
         search_items,
         get_sales_orders,
         get_purchase_orders,
@@ -798,7 +1178,9 @@ def get_erpnext_tools(user=None):
         get_doctypes_in_module,
         query_doctype,
         get_reports_list,
+        run_report,
         get_doctype_structure,
         search_across_doctypes,
-        get_doctype_count
+        get_doctype_count,
+        analyze_trend
     ]
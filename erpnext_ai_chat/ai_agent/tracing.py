@@ -0,0 +1,249 @@
+"""
+Per-turn tracing of the chat pipeline.
+
+A trace is started for each send_message call and collects spans for memory
+loads, LLM calls (with token counts), tool runs, the SQL a tool issues, chart
+extraction and persistence. Spans are kept in memory while the turn runs and
+saved as one AI Chat Trace document at the end when the turn is sampled,
+slow or failed; the form shows them as a waterfall. Code outside a trace
+(background jobs, benchmarks) records nothing.
+"""
+
+import json
+import random
+import threading
+import time
+import frappe
+from contextlib import contextmanager
+from frappe.utils import add_days, cint, flt, now_datetime
+from typing import Any, Dict, List, Optional
+
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_SLOW_THRESHOLD = 10
+DEFAULT_RETENTION_DAYS = 7
+
+# Spans kept per trace; SQL-heavy tools can issue thousands of statements
+MAX_SPANS = 300
+
+# Characters of SQL kept on a span
+MAX_SQL_LENGTH = 300
+
+
+class Trace:
+    """Spans of one chat turn"""
+
+    def __init__(self, user: str, session: Optional[str] = None):
+        self.user = user
+        self.session = session
+        self.message = None
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.error = None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def offset_ms(self, at: Optional[float] = None) -> float:
+        return round(((at or time.perf_counter()) - self.started) * 1000, 2)
+
+    @property
+    def current_span(self) -> Optional[int]:
+        """Id of the span open in this thread, the parent of new spans"""
+        return getattr(self._local, "parent", None)
+
+    def attach(self, parent: Optional[int] = None):
+        """Make this the current trace of a worker thread, under the span that started the thread"""
+        frappe.local.ai_chat_trace = self
+        self._local.parent = parent
+
+    def annotate(self, **attrs):
+        open_attrs = getattr(self._local, "attrs", None)
+        if open_attrs is not None:
+            open_attrs.update(attrs)
+
+    def _reserve(self) -> Optional[int]:
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return None
+            self.spans.append(None)
+            return len(self.spans) - 1
+
+    def _finish(self, span_id: int, parent: Optional[int], name: str, start: float, end: float, attrs: Dict[str, Any]):
+        span = {
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start_ms": self.offset_ms(start),
+            "duration_ms": round((end - start) * 1000, 2),
+            "thread": threading.current_thread().name,
+        }
+        span.update({key: value for key, value in attrs.items() if value is not None})
+        self.spans[span_id] = span
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        """Record a finished span from perf_counter timestamps"""
+        span_id = self._reserve()
+        if span_id is not None:
+            self._finish(span_id, self.current_span, name, start, end, attrs)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Time a block as a span. Spans opened inside the block become its children.
+
+        Yields:
+            A dict of attributes to attach to the span, e.g. token counts
+        """
+        parent, parent_attrs = self.current_span, getattr(self._local, "attrs", None)
+        # The slot is reserved up front so children can point at it
+        span_id = self._reserve()
+        if span_id is not None:
+            self._local.parent = span_id
+        self._local.attrs = attrs
+
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs["error"] = f"{e.__class__.__name__}: {e}"
+            raise
+        finally:
+            self._local.parent, self._local.attrs = parent, parent_attrs
+            if span_id is not None:
+                self._finish(span_id, parent, name, start, time.perf_counter(), attrs)
+
+    @property
+    def duration_ms(self) -> float:
+        return self.offset_ms()
+
+    def totals(self) -> Dict[str, Any]:
+        spans = [span for span in self.spans if span]
+        llm = [span for span in spans if span["name"] == "llm"]
+        return {
+            "llm_calls": len(llm),
+            "llm_ms": sum(span["duration_ms"] for span in llm),
+            "prompt_tokens": sum(span.get("prompt_tokens") or 0 for span in llm),
+            "completion_tokens": sum(span.get("completion_tokens") or 0 for span in llm),
+            "sql_queries": sum(1 for span in spans if span["name"] == "sql"),
+            "sql_ms": sum(span["duration_ms"] for span in spans if span["name"] == "sql"),
+        }
+
+
+def get_current_trace() -> Optional[Trace]:
+    return getattr(frappe.local, "ai_chat_trace", None)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block in the current trace; does nothing outside a traced turn"""
+    trace = get_current_trace()
+    if trace is None:
+        yield dict(attrs)
+        return
+    with trace.span(name, **attrs) as extra:
+        yield extra
+
+
+def annotate(**attrs):
+    """Add attributes, e.g. an error that was handled, to the innermost open span"""
+    trace = get_current_trace()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+def record_error(e: BaseException):
+    """Mark the current turn as failed so its trace is kept"""
+    trace = get_current_trace()
+    if trace is not None:
+        trace.error = f"{e.__class__.__name__}: {e}"
+
+
+def add_span(name: str, start: float, end: float, **attrs):
+    """Record a finished span in the current trace from perf_counter timestamps"""
+    trace = get_current_trace()
+    if trace is not None:
+        trace.add_span(name, start, end, **attrs)
+
+
+def add_sql_span(query, start: float, end: float, error: Optional[str] = None):
+    trace = get_current_trace()
+    if trace is not None:
+        trace.add_span("sql", start, end, query=str(query).strip()[:MAX_SQL_LENGTH], error=error)
+
+
+def is_enabled() -> bool:
+    return bool(cint(get_setting("enable_tracing", 1)))
+
+
+@contextmanager
+def trace_turn(user: str, session: Optional[str] = None):
+    """
+    Trace one chat turn and save it if it is sampled, slow or failed.
+
+    Yields:
+        The Trace, or None when tracing is switched off
+    """
+    if not is_enabled():
+        yield None
+        return
+
+    previous = get_current_trace()
+    trace = Trace(user, session)
+    frappe.local.ai_chat_trace = trace
+    try:
+        yield trace
+    except Exception as e:
+        trace.error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        frappe.local.ai_chat_trace = previous
+        reason = get_keep_reason(trace)
+        if reason:
+            try:
+                save_trace(trace, reason)
+            except Exception:
+                frappe.log_error(frappe.get_traceback(), "AI Chat Trace")
+
+
+def get_keep_reason(trace: Trace) -> Optional[str]:
+    """Why a trace is kept: failed and slow turns always are, others by sampling"""
+    if trace.error:
+        return "Error"
+    if trace.duration_ms >= flt(get_setting("trace_slow_threshold", DEFAULT_SLOW_THRESHOLD)) * 1000:
+        return "Slow"
+    if random.random() < flt(get_setting("trace_sample_rate", DEFAULT_SAMPLE_RATE)):
+        return "Sampled"
+    return None
+
+
+def save_trace(trace: Trace, reason: str):
+    spans = [span for span in trace.spans if span]
+    tools = [span["tool"] for span in spans if span["name"] == "tool" and span.get("tool")]
+    doc = frappe.get_doc({
+        "doctype": "AI Chat Trace",
+        "user": trace.user,
+        "session": trace.session,
+        "message": trace.message,
+        "status": "Error" if trace.error else "OK",
+        "keep_reason": reason,
+        "error": trace.error,
+        "duration_ms": trace.duration_ms,
+        "tools": ", ".join(tools),
+        "span_count": len(spans),
+        "dropped_spans": trace.dropped,
+        "spans": json.dumps(spans, separators=(",", ":"), default=str),
+        **trace.totals(),
+    })
+    doc.insert(ignore_permissions=True)
+
+
+def delete_old_traces():
+    """Daily: drop traces older than the retention period"""
+    days = cint(get_setting("trace_retention_days", DEFAULT_RETENTION_DAYS))
+    if days <= 0:
+        return
+    frappe.db.delete("AI Chat Trace", {"creation": ["<", add_days(now_datetime(), -days)]})
@@ -0,0 +1,139 @@
+"""
+Token usage ledger and per-user daily budgets.
+
+Every LLM call of a turn is written to AI Chat Usage when the turn ends,
+attributed to the user, session, AI message and the tool the turn ran. A
+daily job rolls the ledger up into AI Chat Usage Summary per day, user, tool
+and model and drops ledger rows past retention.
+
+Users over their daily token budget are degraded rather than refused: the
+turn runs on the configured fallback model and answers from a tool's table
+without the summarising LLM call.
+"""
+
+import frappe
+from frappe.utils import add_days, cint, getdate, today
+from typing import Any, Dict, List, Optional
+
+from erpnext_ai_chat.erpnext_ai_chat.doctype.ai_chat_settings.ai_chat_settings import get_setting
+
+
+DEFAULT_RETENTION_DAYS = 90
+
+# Estimated USD per million tokens (prompt, completion), for cost attribution only
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0, 0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class TurnUsage:
+    """LLM calls of one chat turn, saved to the ledger when the turn ends"""
+
+    def __init__(self, user: str, session: Optional[str] = None):
+        self.user = user
+        self.session = session
+        self.tool = None
+        self.message = None
+        self.degraded = False
+        self.calls: List[Dict[str, Any]] = []
+
+    def add(self, model: str, step: str, prompt_tokens: int, completion_tokens: int, latency: float):
+        self.calls.append({
+            "model": model,
+            "step": step,
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "latency_ms": latency * 1000,
+        })
+
+    def save(self):
+        usage_date = today()
+        for call in self.calls:
+            frappe.get_doc({
+                "doctype": "AI Chat Usage",
+                "user": self.user,
+                "session": self.session,
+                "message": self.message,
+                "tool": self.tool,
+                "usage_date": usage_date,
+                "total_tokens": call["prompt_tokens"] + call["completion_tokens"],
+                "estimated_cost": estimate_cost(call["model"], call["prompt_tokens"], call["completion_tokens"]),
+                "degraded": int(self.degraded),
+                **call,
+            }).insert(ignore_permissions=True)
+
+
+def get_daily_budget(user: str) -> int:
+    """Tokens a user may spend per day; 0 means unlimited"""
+    try:
+        settings = frappe.get_cached_doc("AI Chat Settings")
+    except Exception:
+        return 0
+    for row in settings.get("user_token_budgets") or []:
+        if row.user == user:
+            return cint(row.daily_token_budget)
+    return cint(settings.get("daily_token_budget"))
+
+
+def get_tokens_used_today(user: str) -> int:
+    result = frappe.db.sql(
+        """
+        SELECT COALESCE(SUM(total_tokens), 0)
+        FROM `tabAI Chat Usage`
+        WHERE user = %s AND usage_date = %s
+        """,
+        (user, today()),
+    )
+    return cint(result[0][0])
+
+
+def is_over_budget(user: str) -> bool:
+    budget = get_daily_budget(user)
+    return bool(budget) and get_tokens_used_today(user) >= budget
+
+
+def get_fallback_model() -> Optional[str]:
+    return get_setting("budget_fallback_model") or None
+
+
+def rollup_daily(date: Optional[str] = None):
+    """Daily: summarise a day's ledger (yesterday by default) per user, tool and model"""
+    date = getdate(date) if date else add_days(getdate(today()), -1)
+    frappe.db.delete("AI Chat Usage Summary", {"usage_date": date})
+
+    rows = frappe.db.sql(
+        """
+        SELECT
+            user, IFNULL(tool, '') AS tool, model,
+            COUNT(*) AS calls,
+            SUM(prompt_tokens) AS prompt_tokens,
+            SUM(completion_tokens) AS completion_tokens,
+            SUM(total_tokens) AS total_tokens,
+            SUM(estimated_cost) AS estimated_cost,
+            AVG(latency_ms) AS avg_latency_ms,
+            SUM(degraded) AS degraded_calls
+        FROM `tabAI Chat Usage`
+        WHERE usage_date = %s
+        GROUP BY user, IFNULL(tool, ''), model
+        """,
+        date,
+        as_dict=True,
+    )
+    for row in rows:
+        frappe.get_doc({"doctype": "AI Chat Usage Summary", "usage_date": date, **row}).insert(ignore_permissions=True)
+
+
+def delete_old_usage():
+    """Daily: drop ledger rows past retention; the summaries are kept"""
+    days = cint(get_setting("usage_retention_days", DEFAULT_RETENTION_DAYS))
+    if days <= 0:
+        return
+    frappe.db.delete("AI Chat Usage", {"usage_date": ["<", add_days(today(), -days)]})
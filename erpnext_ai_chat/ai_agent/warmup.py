@@ -0,0 +1,38 @@
+"""
+Pre-loading of the LLM stack.
+
+The agent, tools, charts and langchain are imported on the first chat turn of
+a process, so web and background workers that never serve chat do not pay
+their import time and memory. Workers dedicated to chat can load them ahead
+of the first turn by running with AI_CHAT_PREWARM=1 in their environment.
+"""
+
+import importlib
+import os
+
+
+ENV_FLAG = "AI_CHAT_PREWARM"
+
+HEAVY_MODULES = (
+    "langchain_openai",
+    "langchain_core.messages",
+    "erpnext_ai_chat.ai_agent.agent",
+    "erpnext_ai_chat.ai_agent.tools",
+    "erpnext_ai_chat.ai_agent.charts",
+)
+
+_prewarmed = False
+
+
+def prewarm():
+    """Import the LLM stack now rather than on the first chat turn"""
+    global _prewarmed
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    _prewarmed = True
+
+
+def maybe_prewarm():
+    """before_request / before_job hook: prewarm once in processes started with AI_CHAT_PREWARM=1"""
+    if not _prewarmed and os.environ.get(ENV_FLAG) == "1":
+        prewarm()
@@ -1,144 +1,195 @@
+import json
+import re
+import time
 import frappe
 from frappe import _
-from erpnext_ai_chat.ai_agent import ERPNextAgent
+from frappe.utils import cint
+from erpnext_ai_chat.ai_agent import metrics, profiling, tracing
+from erpnext_ai_chat.ai_agent.results import render_html
+
+
+CHART_KEYWORDS = ['chart', 'graph', 'visualize', 'plot', 'show chart']
 
 
 @frappe.whitelist()
-def send_message(message, session_id=None):
+def send_message(message, session_id=None, profile=0, allow_queue=0):
     """
     Send a message to the AI agent and get a response.
     
     Args:
         message: User's message
         session_id: Optional session ID to continue a conversation
+        profile: Profile this turn (System Managers only, with profiling enabled)
+        allow_queue: The client listens for the ai_chat_reply realtime event, so
+            the turn may be queued for the chat worker
     
     Returns:
         dict: Response with AI message, session info, and optional chart data
     """
+    from erpnext_ai_chat.ai_agent import chat_worker
+    from erpnext_ai_chat.ai_agent.agent import run_turn
+    
+    start = time.perf_counter()
+    status = "error"
     try:
         if not message:
             frappe.throw(_("Message cannot be empty"))
         
         user = frappe.session.user
-        agent = ERPNextAgent(user=user, session_id=session_id)
         
-        response = agent.chat(message)
+        # Answered by the chat worker and sent back over realtime
+        if cint(allow_queue) and chat_worker.is_enabled():
+            status = "queued"
+            return chat_worker.enqueue_turn(message, session_id, user)
         
-        # Check if user requested a chart visualization
-        chart_data = None
-        if response["success"]:
-            response_text = response["message"]
-            
-            # Check for chart keywords in user message
-            has_chart_keyword = any(keyword in message.lower() for keyword in ['chart', 'graph', 'visualize', 'plot', 'show chart'])
-            
-            if has_chart_keyword:
-                import json
-                import re
-                
-                # First, try to parse if AI returned JSON directly
-                json_match = re.search(r'\{["\']labels["\']\s*:\s*\[.*?\].*?\}', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        json_str = json_match.group(0)
-                        json_data = json.loads(json_str)
-                        
-                        # Convert to proper format if needed
-                        if "labels" in json_data and ("data" in json_data or "datasets" in json_data):
-                            # Determine chart type from message
-                            chart_type = "bar"  # default
-                            if "pie" in message.lower():
-                                chart_type = "pie"
-                            elif "donut" in message.lower():
-                                chart_type = "donut"
-                            elif "line" in message.lower():
-                                chart_type = "line"
-                            
-                            # Extract title from message context
-                            title = json_data.get("title", "Data Visualization")
-                            if not title or title == "Data Visualization":
-                                if "sales order" in message.lower():
-                                    title = "Sales Orders by Status"
-                                elif "sales" in message.lower():
-                                    title = "Sales Data"
-                                elif "purchase order" in message.lower():
-                                    title = "Purchase Orders"
-                                elif "customer" in message.lower():
-                                    title = "Customer Data"
-                            
-                            # Handle flat data array (convert to datasets format)
-                            if "data" in json_data and "datasets" not in json_data:
-                                chart_data = {
-                                    "type": chart_type,
-                                    "title": title,
-                                    "labels": json_data["labels"],
-                                    "datasets": [{"name": "Count", "values": json_data["data"]}],
-                                    "height": 300,
-                                    "colors": ['#7cd6fd', '#743ee2', '#5e64ff', '#ff5858', '#ffa00a']
-                                }
-                            elif "datasets" in json_data:
-                                chart_data = {
-                                    "type": chart_type,
-                                    "title": title,
-                                    "labels": json_data["labels"],
-                                    "datasets": json_data["datasets"],
-                                    "height": 300,
-                                    "colors": ['#7cd6fd', '#743ee2', '#5e64ff', '#ff5858', '#ffa00a']
-                                }
-                            
-                            frappe.log_error(f"Chart from JSON: {chart_data}", "AI Chat Chart JSON")
-                    except Exception as e:
-                        frappe.log_error(f"Error parsing JSON chart: {str(e)}\n\nJSON: {json_str if 'json_str' in locals() else 'N/A'}", "AI Chat Chart JSON Error")
-                
-                # If no JSON chart data found, try parsing HTML table
-                if not chart_data and '<table' in response_text:
-                    try:
-                        from erpnext_ai_chat.ai_agent.charts import parse_html_table_to_chart
-                        
-                        # Determine chart type from message
-                        chart_type = "bar"  # default
-                        if "pie" in message.lower():
-                            chart_type = "pie"
-                        elif "donut" in message.lower():
-                            chart_type = "donut"
-                        elif "line" in message.lower():
-                            chart_type = "line"
-                        
-                        # Extract title from message context
-                        title = "Data Visualization"
-                        if "sales order" in message.lower():
-                            title = "Sales Orders by Status"
-                        elif "sales" in message.lower():
-                            title = "Sales Data"
-                        elif "purchase order" in message.lower():
-                            title = "Purchase Orders"
-                        elif "customer" in message.lower():
-                            title = "Customer Data"
-                        
-                        chart_data = parse_html_table_to_chart(response_text, chart_type, title)
-                        
-                        if chart_data:
-                            frappe.log_error(f"Chart from HTML table generated: {len(chart_data.get('labels', []))} labels", "AI Chat Chart HTML Success")
-                        else:
-                            frappe.log_error(f"HTML table parsing failed", "AI Chat Chart HTML Failed")
-                    except Exception as e:
-                        frappe.log_error(f"Error generating chart from HTML: {str(e)}", "AI Chat Chart HTML Error")
+        with profiling.profile_turn(user, profile) as turn_profile:
+            reply = run_turn(answer_turn(message, session_id, user))
+            if turn_profile:
+                turn_profile.session, turn_profile.message = reply["session_id"], reply["message_id"]
         
-        return {
-            "success": response["success"],
-            "response": response["message"],
-            "message": response["message"],
-            "session_id": agent.session_id,
-            "user": user,
-            "chart_data": chart_data
-        }
+        status = "ok" if reply["success"] else "error"
+        reply["profile"] = get_profile_info(turn_profile)
+        return reply
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "AI Chat API Error")
+        metrics.inc("ai_chat_errors_total", stage="api")
         return {
             "success": False,
             "message": f"Error: {str(e)}",
             "response": f"Error: {str(e)}"
         }
+    finally:
+        if status != "queued":
+            metrics.observe("ai_chat_turn_seconds", time.perf_counter() - start, status=status)
+            metrics.inc("ai_chat_turns_total", status=status)
+        metrics.flush()
+
+
+def answer_turn(message, session_id, user):
+    """
+    A chat turn from the message to the client's reply, as a generator driven
+    like ERPNextAgent.turn: by run_turn in send_message, by the chat worker
+    otherwise.
+    """
+    # The agent pulls in langchain and the tool graph; loaded on the first turn only
+    from erpnext_ai_chat.ai_agent import ERPNextAgent
+    
+    with tracing.trace_turn(user, session_id) as trace:
+        agent = ERPNextAgent(user=user, session_id=session_id)
+        
+        response = yield from agent.turn(message)
+        
+        # Structured tool results are rendered once, here, for the client
+        with tracing.span("render"):
+            result_html = render_html(response.get("result"))
+        
+        # Check if user requested a chart visualization
+        chart_data = None
+        if response["success"] and any(keyword in message.lower() for keyword in CHART_KEYWORDS):
+            with tracing.span("chart"):
+                chart_data = get_chart_data(message, response, result_html)
+        
+        if trace:
+            trace.session, trace.message = agent.session_id, response.get("message_id")
+    
+    return {
+        "success": response["success"],
+        "response": response["message"],
+        "message": response["message"],
+        "result_html": result_html,
+        "message_id": response.get("message_id"),
+        "exportable": bool((response.get("result") or {}).get("source")),
+        "session_id": agent.session_id,
+        "user": user,
+        "chart_data": chart_data
+    }
+
+
+def get_profile_info(turn_profile):
+    """Where the turn's profile was saved, with its hottest functions"""
+    if not turn_profile or not turn_profile.file_url:
+        return None
+    return {
+        "file_url": turn_profile.file_url,
+        "mode": turn_profile.mode,
+        "duration": round(turn_profile.duration, 3),
+        "truncated": turn_profile.profiler.truncated,
+        "summary": turn_profile.summary(),
+    }
+
+
+def get_chart_data(message, response, result_html):
+    """
+    Chart for a reply: the series the tool attached to its result, or, for
+    tools that did not attach one, a chart parsed from the reply text.
+    """
+    from erpnext_ai_chat.ai_agent.charts import with_chart_type
+    
+    chart_type = get_requested_chart_type(message)
+    
+    result = response.get("result") or {}
+    if result.get("chart"):
+        return with_chart_type(result["chart"], chart_type)
+    
+    metrics.inc("ai_chat_fallbacks_total", kind="text_chart")
+    return parse_chart_from_text(response["message"] + result_html, chart_type or "bar", get_chart_title(message))
+
+
+def get_requested_chart_type(message):
+    """Chart type named in the message, if any"""
+    message = message.lower()
+    for chart_type in ("pie", "donut", "line"):
+        if chart_type in message:
+            return chart_type
+    return None
+
+
+def get_chart_title(message):
+    """Fallback chart title from the message context"""
+    message = message.lower()
+    if "sales order" in message:
+        return "Sales Orders by Status"
+    elif "sales" in message:
+        return "Sales Data"
+    elif "purchase order" in message:
+        return "Purchase Orders"
+    elif "customer" in message:
+        return "Customer Data"
+    return "Data Visualization"
+
+
+def parse_chart_from_text(response_text, chart_type, title):
+    """Fallback: chart from a JSON object or HTML table in the reply text"""
+    # First, try to parse if AI returned JSON directly
+    json_match = re.search(r'\{["\']labels["\']\s*:\s*\[.*?\].*?\}', response_text, re.DOTALL)
+    if json_match:
+        try:
+            json_data = json.loads(json_match.group(0))
+            
+            if "labels" in json_data and ("data" in json_data or "datasets" in json_data):
+                # Handle flat data array (convert to datasets format)
+                datasets = json_data.get("datasets") or [{"name": "Count", "values": json_data["data"]}]
+                return {
+                    "type": chart_type,
+                    "title": json_data.get("title") or title,
+                    "labels": json_data["labels"],
+                    "datasets": datasets,
+                    "height": 300,
+                    "colors": ['#7cd6fd', '#743ee2', '#5e64ff', '#ff5858', '#ffa00a']
+                }
+        except Exception as e:
+            tracing.annotate(error=f"JSON chart: {e}")
+    
+    # If no JSON chart data found, try parsing HTML table
+    if '<table' in response_text:
+        from erpnext_ai_chat.ai_agent.charts import parse_html_table_to_chart
+        
+        try:
+            return parse_html_table_to_chart(response_text, chart_type, title)
+        except Exception as e:
+            tracing.annotate(error=f"HTML table chart: {e}")
+    
+    return None
 
 
 @frappe.whitelist()
@@ -170,17 +221,47 @@ def get_chat_history(session_id=None, limit=50):
         messages = frappe.get_all(
             "AI Chat Message",
             filters={"session": session_id},
-            fields=["message_type", "content", "creation"],
+            fields=["name", "message_type", "content", "result_data", "creation"],
             order_by="creation asc",
             limit=limit
         )
         
+        for msg in messages:
+            result = json.loads(msg.pop("result_data", None) or "null")
+            msg["result_html"] = render_html(result)
+            msg["exportable"] = bool((result or {}).get("source"))
+        
         return messages
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "Get Chat History Error")
         return []
 
 
+@frappe.whitelist()
+def export_result(message_id, file_format="csv"):
+    """
+    Export the full result behind a chat message to a CSV or XLSX file in the background.
+    
+    Args:
+        message_id: AI Chat Message holding the result
+        file_format: "csv" or "xlsx"
+    
+    Returns:
+        dict: Success flag; the download link arrives as a new chat message when ready
+    """
+    session = frappe.db.get_value("AI Chat Message", message_id, "session")
+    if not session or frappe.db.get_value("AI Chat Session", session, "user") != frappe.session.user:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+    
+    from erpnext_ai_chat.ai_agent.export import enqueue_export
+    enqueue_export(message_id, file_format)
+    
+    return {
+        "success": True,
+        "message": _("Export started. The download link will appear in this chat when it is ready.")
+    }
+
+
 @frappe.whitelist()
 def get_sessions():
     """
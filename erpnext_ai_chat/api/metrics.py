@@ -0,0 +1,16 @@
+import frappe
+from werkzeug.wrappers import Response
+from erpnext_ai_chat.ai_agent import metrics
+
+
+@frappe.whitelist()
+def prometheus():
+    """
+    Chat metrics in the Prometheus text exposition format.
+
+    Scrape with the API key of a System Manager user
+    (Authorization: token <api_key>:<api_secret>).
+    """
+    frappe.only_for("System Manager")
+    metrics.flush()
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
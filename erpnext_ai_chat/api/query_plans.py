@@ -0,0 +1,28 @@
+import frappe
+from erpnext_ai_chat.ai_agent import query_plans
+
+
+@frappe.whitelist()
+def get_report(limit=50):
+    """
+    Get the captured AI tool query shapes with their plans and index suggestions.
+
+    Args:
+        limit: Maximum number of query shapes, slowest in total first
+
+    Returns:
+        dict: Whether capture is on and the aggregated query shapes
+    """
+    frappe.only_for("System Manager")
+    return {
+        "enabled": query_plans.is_enabled(),
+        "queries": query_plans.get_report(int(limit)),
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def clear_report():
+    """Discard the captured query shapes"""
+    frappe.only_for("System Manager")
+    query_plans.clear()
+    return {"success": True}
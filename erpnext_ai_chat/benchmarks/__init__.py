@@ -0,0 +1,20 @@
+"""
+Offline benchmarks for the AI chat pipeline.
+
+Run on a dedicated site with `allow_tests` enabled:
+
+    bench --site bench.localhost ai-chat-benchmark --seed-data --scale small --output results.json
+    bench --site bench.localhost ai-chat-benchmark --baseline results.json
+
+The LLM is replaced by FakeLLM, so runs need no network or API key and only
+measure our own overhead.
+
+Real conversations are replayed with `ai-chat-replay` (see replay.py):
+
+    bench --site bench.localhost ai-chat-replay export --turns turns.jsonl
+    bench --site bench.localhost ai-chat-replay record --turns turns.jsonl --cassette cassette.json --output baseline.json
+    bench --site bench.localhost ai-chat-replay replay --turns turns.jsonl --cassette cassette.json --baseline baseline.json
+
+Hedging across LLM backends is tested against two local OpenAI-compatible
+servers (fake_server.py), so it needs no network either.
+"""
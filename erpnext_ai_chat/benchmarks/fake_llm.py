@@ -0,0 +1,78 @@
+"""
+Deterministic stand-in for ChatOpenAI.
+
+Replies come from a script of (question pattern, reply) pairs after a fixed
+delay; the second call of a tool turn ("Tool result: ...") gets a fixed
+summary. Token usage is estimated from message length so the usage ledger and
+metrics are exercised as with a real model.
+"""
+
+import asyncio
+import re
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage
+
+
+DEFAULT_SCRIPT = [
+    (r"sales orders? summary|orders by status", 'TOOL: get_sales_orders\nINPUT: {"summary": "yes"}'),
+    (r"sales orders?", 'TOOL: get_sales_orders\nINPUT: {"limit": 20}'),
+    (r"low stock", 'TOOL: get_stock_balance\nINPUT: {"low_stock_only": true}'),
+    (r"stock", 'TOOL: get_stock_balance\nINPUT: {"item_code": "BENCH-ITEM-00001,BENCH-ITEM-00002"}'),
+    (r"trend|forecast", 'TOOL: analyze_trend\nINPUT: {"doctype": "Sales Order", "period": "month"}'),
+    (r"how many", 'TOOL: get_doctype_count\nINPUT: {"doctype_name": "Sales Order", "filters": "status=To Deliver and Bill"}'),
+    (r"customer", 'TOOL: search_customers\nINPUT: {"query": "Bench Customer 42"}'),
+    (r"item", 'TOOL: search_items\nINPUT: {"query": "Bench Item 17"}'),
+]
+
+DEFAULT_ANSWER = "Here is the summary of the figures shown in the table below."
+FALLBACK_REPLY = "I can help with questions about your ERPNext data."
+
+
+class FakeLLM:
+    """Offline replacement for the chat model used by ERPNextAgent"""
+
+    def __init__(
+        self,
+        script: Optional[Sequence[Tuple[str, str]]] = None,
+        latency: float = 0.0,
+        model_name: str = "fake-llm",
+        answer: str = DEFAULT_ANSWER,
+    ):
+        self.script = [(re.compile(pattern, re.I), reply) for pattern, reply in (script or DEFAULT_SCRIPT)]
+        self.latency = latency
+        self.model_name = model_name
+        self.answer = answer
+        self.calls = 0
+
+    def invoke(self, messages: List) -> AIMessage:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.reply(messages)
+
+    async def ainvoke(self, messages: List) -> AIMessage:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.reply(messages)
+
+    def reply(self, messages: List) -> AIMessage:
+        self.calls += 1
+        last = messages[-1].content
+        reply = self.answer if last.startswith("Tool result:") else self.route(last)
+        prompt_tokens = sum(len(message.content) for message in messages) // 4
+        completion_tokens = len(reply) // 4 + 1
+        return AIMessage(
+            content=reply,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def route(self, question: str) -> str:
+        for pattern, reply in self.script:
+            if pattern.search(question):
+                return reply
+        return FALLBACK_REPLY
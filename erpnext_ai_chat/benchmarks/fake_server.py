@@ -0,0 +1,106 @@
+"""
+Local OpenAI-compatible server for offline tests of the LLM layer.
+
+Answers POST /v1/chat/completions with a fixed reply, streamed as server-sent
+events when the request asks for it, after `first_token_delay` seconds; with
+`status` set it fails every request with that HTTP status instead. Used as a
+context manager, it serves on a free port of 127.0.0.1 from a daemon thread.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class FakeOpenAIServer:
+    def __init__(self, reply: str = "Hello from the fake server", first_token_delay: float = 0.0, status: Optional[int] = None):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.status = status
+        self.requests = 0
+        # Streams the client closed before they were complete
+        self.disconnected = 0
+        self.server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-openai-server", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or "{}")
+                fake.requests += 1
+                if fake.status:
+                    self._send_json(fake.status, {"error": {"message": "fake failure", "type": "server_error"}})
+                    return
+
+                time.sleep(fake.first_token_delay)
+                if not body.get("stream"):
+                    self._send_json(200, fake.completion(body))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                try:
+                    for chunk in fake.chunks(body):
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        # Leaves time to notice a client that went away
+                        time.sleep(0.01)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    fake.disconnected += 1
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def usage(self, body) -> dict:
+        prompt_tokens = sum(len(str(message.get("content") or "")) for message in body.get("messages", [])) // 4
+        completion_tokens = len(self.reply) // 4 + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def completion(self, body) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+            "usage": self.usage(body),
+        }
+
+    def chunks(self, body):
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "fake")}
+        yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+        for number, word in enumerate(self.reply.split(" ")):
+            content = word if number == 0 else f" {word}"
+            yield {**base, "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": self.usage(body)}
@@ -0,0 +1,242 @@
+"""
+Conversation replay for latency and tool-routing regression tests.
+
+1. export_turns: human messages of recent sessions, anonymised, as JSON lines
+2. record: replay the turns once against the real model, saving every LLM
+   reply in a cassette
+3. replay: run the turns again offline, with the cassette as the model, and
+   report per-turn latency, LLM calls, tools invoked and the answer
+
+Cassette entries are keyed by turn and call number rather than by prompt, so a
+prompt change still replays deterministically; the prompt hash is kept and a
+mismatch is reported as a changed prompt. Against a baseline report, turns
+whose tools, number of LLM calls or answer changed are listed with a diff.
+"""
+
+import difflib
+import hashlib
+import json
+import re
+import statistics
+import time
+import frappe
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+from .run import stats, temporary_session
+
+
+DEFAULT_SESSIONS = 50
+
+# Replaced in exported questions; document names and item codes are kept so
+# the tools still find the same records
+ANONYMISE = (
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "user@example.com"),
+    # Phone numbers, but not dates or document names such as SAL-ORD-2026-00001
+    (re.compile(r"(?<![\w-])\+?\d{1,3}[\s()-]*\d{2,4}[\s-]\d{3,4}(?:[\s-]?\d{3,4})?(?![\w-])"), "0000000000"),
+    (re.compile(r"\b(?:[A-Z]{2}\d{2}[A-Z0-9]{10,30})\b"), "XX00000000000000"),
+)
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def anonymise(text: str, names: Optional[List[str]] = None) -> str:
+    for pattern, replacement in ANONYMISE:
+        text = pattern.sub(replacement, text)
+    for name in names or []:
+        if name:
+            text = re.sub(re.escape(name), "User", text, flags=re.I)
+    return text
+
+
+def export_turns(sessions: int = DEFAULT_SESSIONS, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Human messages of the most recent sessions, anonymised.
+
+    Args:
+        sessions: Number of sessions, most recently modified first
+        since: Only sessions modified on or after this date
+
+    Returns:
+        One dict per turn: id, conversation (hashed session name), turn number and question
+    """
+    filters = {"modified": [">=", since]} if since else {}
+    session_names = frappe.get_all(
+        "AI Chat Session", filters=filters, pluck="name", order_by="modified desc", limit=sessions
+    )
+
+    turns = []
+    for session in session_names:
+        conversation = hashlib.sha1(session.encode()).hexdigest()[:10]
+        messages = frappe.get_all(
+            "AI Chat Message",
+            filters={"session": session, "message_type": "Human"},
+            fields=["content", "user"],
+            order_by="creation asc",
+        )
+        for number, message in enumerate(messages, 1):
+            names = [message.user, frappe.db.get_value("User", message.user, "full_name")]
+            turns.append({
+                "id": f"{conversation}-{number}",
+                "conversation": conversation,
+                "turn": number,
+                "question": anonymise(message.content or "", names),
+            })
+    return turns
+
+
+def prompt_hash(messages: List) -> str:
+    text = "\n".join(f"{message.type}:{message.content}" for message in messages)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class CassetteLLM:
+    """
+    Records the replies of a real model, or plays them back.
+
+    In record mode every call goes to `llm` and its reply is stored under the
+    current turn id and call number; in replay mode the stored reply is
+    returned without a network call. start_turn must be called before each turn.
+    """
+
+    def __init__(self, cassette: Optional[Dict[str, Any]] = None, llm=None):
+        self.cassette = cassette if cassette is not None else {}
+        self.llm = llm
+        self.model_name = getattr(llm, "model_name", None) or self.cassette.get("model") or "cassette"
+        self.recording = llm is not None
+        self.turn = None
+        self.calls = 0
+        self.changed_prompts = 0
+        self.missed = False
+
+    def start_turn(self, turn_id: str):
+        self.turn = turn_id
+        self.calls = 0
+        self.changed_prompts = 0
+        self.missed = False
+
+    def invoke(self, messages: List) -> AIMessage:
+        self.calls += 1
+        key = f"{self.turn}:{self.calls}"
+        digest = prompt_hash(messages)
+        entries = self.cassette.setdefault("entries", {})
+
+        if self.recording:
+            response = self.llm.invoke(messages)
+            entries[key] = {
+                "prompt_hash": digest,
+                "content": response.content,
+                "usage_metadata": getattr(response, "usage_metadata", None),
+            }
+            self.cassette["model"] = self.model_name
+            return response
+
+        entry = entries.get(key)
+        if not entry:
+            self.missed = True
+            raise CassetteMiss(f"No recorded reply for call {self.calls} of turn {self.turn}")
+        if entry["prompt_hash"] != digest:
+            self.changed_prompts += 1
+        return AIMessage(content=entry["content"], usage_metadata=entry.get("usage_metadata"))
+
+
+def replay(turns: List[Dict[str, Any]], llm: CassetteLLM) -> Dict[str, Any]:
+    """
+    Replay the turns through ERPNextAgent, one throwaway session per conversation.
+
+    Args:
+        turns: As returned by export_turns
+        llm: The cassette, in record or replay mode
+
+    Returns:
+        The report: summary (latency distribution, LLM calls, misses) and per-turn results
+    """
+    from erpnext_ai_chat.ai_agent import ERPNextAgent
+
+    results = {}
+    conversations: Dict[str, List[Dict[str, Any]]] = {}
+    for turn in turns:
+        conversations.setdefault(turn["conversation"], []).append(turn)
+
+    for conversation, conversation_turns in conversations.items():
+        with temporary_session(f"Replay {conversation}") as session:
+            for turn in sorted(conversation_turns, key=lambda t: t["turn"]):
+                llm.start_turn(turn["id"])
+                agent = ERPNextAgent(session_id=session, llm=llm)
+                start = time.perf_counter()
+                # The agent catches errors, so a CassetteMiss ends the turn with an error answer
+                response = agent.chat(turn["question"])
+                latency = (time.perf_counter() - start) * 1000
+                results[turn["id"]] = {
+                    "question": turn["question"],
+                    "latency_ms": round(latency, 3),
+                    "llm_calls": llm.calls,
+                    "changed_prompts": llm.changed_prompts,
+                    "tools": [step["tool"] for step in response.get("intermediate_steps") or []],
+                    "success": bool(response.get("success")),
+                    "cassette_miss": llm.missed,
+                    "answer": response.get("message") or response.get("error") or "",
+                }
+
+    replayed = [row for row in results.values() if not row["cassette_miss"]]
+    summary = {
+        "turns": len(results),
+        "cassette_misses": len(results) - len(replayed),
+        "changed_prompts": sum(row["changed_prompts"] for row in results.values()),
+        "failed": sum(1 for row in replayed if not row["success"]),
+    }
+    if replayed:
+        summary["latency"] = stats([row["latency_ms"] for row in replayed])
+        summary["llm_calls_per_turn"] = round(statistics.fmean(row["llm_calls"] for row in replayed), 2)
+        summary["tools"] = dict(Counter(tool for row in replayed for tool in row["tools"]).most_common())
+
+    return {
+        "meta": {"site": frappe.local.site, "timestamp": frappe.utils.now(), "model": llm.model_name},
+        "summary": summary,
+        "turns": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Turns whose tools, number of LLM calls or answer differ from the baseline report"""
+    changes = {}
+    for turn_id, row in current["turns"].items():
+        before = (baseline.get("turns") or {}).get(turn_id)
+        if not before:
+            continue
+        change = {}
+        if before["tools"] != row["tools"]:
+            change["tools"] = {"baseline": before["tools"], "current": row["tools"]}
+        if before["llm_calls"] != row["llm_calls"]:
+            change["llm_calls"] = {"baseline": before["llm_calls"], "current": row["llm_calls"]}
+        if before["answer"] != row["answer"]:
+            change["answer_diff"] = "\n".join(difflib.unified_diff(
+                before["answer"].splitlines(), row["answer"].splitlines(), "baseline", "current", lineterm="", n=1
+            ))
+        if change:
+            changes[turn_id] = {"question": row["question"], **change}
+
+    latency = {}
+    before_latency = (baseline.get("summary") or {}).get("latency")
+    current_latency = current["summary"].get("latency")
+    if before_latency and current_latency:
+        latency = {
+            key: {"baseline": before_latency[key], "current": current_latency[key]}
+            for key in ("p50_ms", "p95_ms", "max_ms")
+        }
+    return {"latency": latency, "changed_turns": changes}
+
+
+def read_turns(path: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_turns(path: str, turns: List[Dict[str, Any]]):
+    with open(path, "w") as f:
+        for turn in turns:
+            f.write(json.dumps(turn) + "\n")
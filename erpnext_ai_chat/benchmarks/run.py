@@ -0,0 +1,266 @@
+"""
+Benchmark runner.
+
+Measures, on the seeded data:
+
+- turn_overhead: ERPNextAgent.chat with FakeLLM, minus the fake's latency
+- tool.<name>: each tool called directly with typical arguments
+- history_load: ConversationMemoryManager.get_messages on the seeded session
+- chart_parse: charts.parse_html_table_to_chart on a generated table
+- import.<case>: import time and resident memory added by the app's modules
+  in a fresh interpreter; "desk" is what every worker loads, "llm_stack"
+  what the first chat turn adds
+
+Timings are reported in milliseconds (n, mean, p50, p95, max) and written as
+JSON. Given a baseline file, every benchmark whose p50 got slower by more
+than the tolerance is flagged as a regression.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import frappe
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from .fake_llm import FakeLLM
+from .seed import PREFIX, check_site
+
+
+DEFAULT_ITERATIONS = 20
+WARMUP = 2
+
+# Slowdown of the p50 flagged as a regression
+DEFAULT_TOLERANCE = 0.2
+
+TOOL_CASES = {
+    "get_sales_orders": ("get_sales_orders", {"limit": 20}),
+    "get_sales_orders_summary": ("get_sales_orders", {"summary": "yes"}),
+    "search_customers": ("search_customers", {"query": "Bench Customer 42"}),
+    "search_items": ("search_items", {"query": "Bench Item 17"}),
+    "get_stock_balance": ("get_stock_balance", {"item_code": f"{PREFIX}-ITEM-00001,{PREFIX}-ITEM-00002"}),
+    "get_doctype_count": ("get_doctype_count", {"doctype_name": "Sales Order"}),
+    "query_doctype": ("query_doctype", {"doctype_name": "Sales Order", "limit": 20}),
+    "search_across_doctypes": ("search_across_doctypes", {"search_term": "Bench"}),
+    "analyze_trend": ("analyze_trend", {"doctype": "Sales Order", "period": "month"}),
+}
+
+# Modules per import case; frappe is imported first and not counted
+IMPORT_CASES = {
+    "desk": (
+        "erpnext_ai_chat.hooks",
+        "erpnext_ai_chat.api.chat",
+        "erpnext_ai_chat.api.metrics",
+        "erpnext_ai_chat.ai_agent.catalog",
+        "erpnext_ai_chat.ai_agent.warmup",
+    ),
+    "llm_stack": ("erpnext_ai_chat.ai_agent.warmup:prewarm",),
+}
+
+IMPORT_RUNS = 5
+
+# Run in a fresh interpreter; prints import milliseconds and the peak RSS added (kB on Linux)
+IMPORT_SCRIPT = """
+import importlib, json, resource, sys, time
+import frappe
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+for target in sys.argv[1:]:
+    module, _, function = target.partition(":")
+    module = importlib.import_module(module)
+    if function:
+        getattr(module, function)()
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before}))
+"""
+
+TURN_QUESTIONS = [
+    "Show me the latest sales orders",
+    "Give me a sales order summary",
+    "What is the stock of the bench items?",
+    "How many sales orders are to deliver and bill?",
+    "Find customer Bench Customer 42",
+    "Hello",
+]
+
+
+def stats(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    for _ in range(WARMUP):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return stats(samples)
+
+
+def bench_tools(iterations: int) -> Dict[str, Dict[str, float]]:
+    from erpnext_ai_chat.ai_agent.context import tool_context
+    from erpnext_ai_chat.ai_agent.tools import get_erpnext_tools
+
+    tools = {tool.name: tool for tool in get_erpnext_tools()}
+
+    def run(tool_name, args):
+        # A fresh context per call, as each chat turn gets one
+        with tool_context():
+            return tools[tool_name].func(**args)
+
+    return {
+        f"tool.{case}": measure(lambda tool_name=tool_name, args=args: run(tool_name, args), iterations)
+        for case, (tool_name, args) in TOOL_CASES.items()
+    }
+
+
+def bench_history(iterations: int) -> Dict[str, float]:
+    from erpnext_ai_chat.ai_agent.memory import ConversationMemoryManager
+
+    memory = ConversationMemoryManager("Administrator", f"{PREFIX}-SESSION")
+    return measure(lambda: memory.get_messages(limit=10), iterations)
+
+
+def bench_chart_parsing(iterations: int, rows: int = 50) -> Dict[str, float]:
+    from erpnext_ai_chat.ai_agent.charts import parse_html_table_to_chart
+
+    html = "<table><thead><tr><th>Month</th><th>Orders</th><th>Amount</th></tr></thead><tbody>"
+    html += "".join(f"<tr><td>Month {i}</td><td>{i * 3}</td><td>{i * 1234.5:,.2f}</td></tr>" for i in range(rows))
+    html += "</tbody></table>"
+
+    result = measure(lambda: parse_html_table_to_chart(html, "bar", "Benchmark"), iterations)
+    result["ops_per_sec"] = round(1000 / result["mean_ms"], 1) if result["mean_ms"] else 0
+    return result
+
+
+def bench_imports(runs: int = IMPORT_RUNS) -> Dict[str, Dict[str, float]]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    results = {}
+    for case, modules in IMPORT_CASES.items():
+        samples, rss = [], []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", IMPORT_SCRIPT, *modules], env=env, capture_output=True, text=True, check=True
+            ).stdout
+            measured = json.loads(output.strip().splitlines()[-1])
+            samples.append(measured["ms"])
+            rss.append(measured["rss_kb"])
+        results[f"import.{case}"] = {**stats(samples), "rss_mb": round(statistics.median(rss) / 1024, 1)}
+    return results
+
+
+@contextmanager
+def temporary_session(session_name: str):
+    """A chat session that is deleted, with its messages and usage, afterwards"""
+    session = frappe.get_doc({
+        "doctype": "AI Chat Session",
+        "session_name": session_name,
+        "user": frappe.session.user,
+        "is_active": 0,
+    }).insert(ignore_permissions=True)
+    try:
+        yield session.name
+    finally:
+        frappe.db.delete("AI Chat Usage", {"session": session.name})
+        frappe.db.delete("AI Chat Message", {"session": session.name})
+        frappe.delete_doc("AI Chat Session", session.name, ignore_permissions=True, force=True)
+        frappe.db.commit()
+
+
+def bench_turns(iterations: int, llm_latency: float) -> Dict[str, Any]:
+    from erpnext_ai_chat.ai_agent import ERPNextAgent
+
+    llm = FakeLLM(latency=llm_latency)
+    samples, llm_calls = [], []
+    with temporary_session("Benchmark turns") as session:
+        for i in range(WARMUP + iterations):
+            question = TURN_QUESTIONS[i % len(TURN_QUESTIONS)]
+            agent = ERPNextAgent(session_id=session, llm=llm)
+            calls_before = llm.calls
+            start = time.perf_counter()
+            agent.chat(question)
+            elapsed = (time.perf_counter() - start) * 1000
+            if i >= WARMUP:
+                calls = llm.calls - calls_before
+                samples.append(elapsed - calls * llm_latency * 1000)
+                llm_calls.append(calls)
+
+    result = stats(samples)
+    result["llm_calls_per_turn"] = round(statistics.fmean(llm_calls), 2)
+    return result
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Any]:
+    """p50 of each benchmark against the baseline run"""
+    comparison = {}
+    for name, result in current["results"].items():
+        before = (baseline.get("results") or {}).get(name)
+        if not before or not before.get("p50_ms"):
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"]
+        comparison[name] = {
+            "baseline_p50_ms": before["p50_ms"],
+            "p50_ms": result["p50_ms"],
+            "change": round(change, 3),
+            "regressed": change > tolerance,
+        }
+    return comparison
+
+
+def run(
+    iterations: int = DEFAULT_ITERATIONS,
+    llm_latency: float = 0.0,
+    baseline: Optional[Dict[str, Any]] = None,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> Dict[str, Any]:
+    """
+    Run every benchmark on the current (seeded) site.
+
+    Args:
+        iterations: Timed iterations per benchmark, after a short warm-up
+        llm_latency: Seconds FakeLLM sleeps per call; subtracted from turn_overhead
+        baseline: A previous report to compare against
+        tolerance: Relative p50 slowdown counted as a regression
+
+    Returns:
+        The report: run metadata, results and, with a baseline, the comparison
+    """
+    check_site()
+    results = {"chart_parse": bench_chart_parsing(iterations), "history_load": bench_history(iterations)}
+    results.update(bench_tools(iterations))
+    results.update(bench_imports())
+    results["turn_overhead"] = bench_turns(iterations, llm_latency)
+
+    report = {
+        "meta": {
+            "site": frappe.local.site,
+            "timestamp": frappe.utils.now(),
+            "python": platform.python_version(),
+            "frappe": frappe.__version__,
+            "iterations": iterations,
+            "llm_latency": llm_latency,
+            "sales_orders": frappe.db.count("Sales Order", {"name": ["like", f"{PREFIX}-%"]}),
+            "items": frappe.db.count("Item", {"name": ["like", f"{PREFIX}-%"]}),
+        },
+        "results": results,
+    }
+    if baseline:
+        report["comparison"] = compare(baseline, report, tolerance)
+    return report
+
+
+def to_json(report: Dict[str, Any]) -> str:
+    return json.dumps(report, indent=2, sort_keys=True, default=str)
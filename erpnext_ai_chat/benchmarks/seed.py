@@ -0,0 +1,151 @@
+"""
+Synthetic data for the benchmarks.
+
+Rows are bulk-inserted straight into the tables (no controllers or hooks), so
+a million Sales Orders take minutes rather than days. Every seeded name
+starts with PREFIX, and seeding again first removes the previous data.
+"""
+
+import random
+import frappe
+from frappe.utils import add_days, getdate, now_datetime
+from typing import Any, Dict, List
+
+
+PREFIX = "BENCH"
+CHUNK_SIZE = 10_000
+
+SCALES = {
+    "small": {"customers": 200, "items": 1_000, "sales_orders": 10_000, "history": 200},
+    "medium": {"customers": 5_000, "items": 100_000, "sales_orders": 100_000, "history": 500},
+    "large": {"customers": 20_000, "items": 100_000, "sales_orders": 1_000_000, "history": 1_000},
+}
+
+SALES_ORDER_STATUSES = ("To Deliver and Bill", "To Bill", "To Deliver", "Completed", "Closed")
+
+# Seeded DocTypes and the field holding the seeded name; children go first
+SEEDED = (
+    ("AI Chat Message", "session"),
+    ("AI Chat Session", "name"),
+    ("Sales Order Item", "parent"),
+    ("Sales Order", "name"),
+    ("Bin", "item_code"),
+    ("Item", "name"),
+    ("Customer", "name"),
+)
+
+
+def check_site():
+    if not frappe.conf.allow_tests:
+        frappe.throw("Benchmarks insert synthetic data; run them only on a site with allow_tests enabled")
+
+
+def seed(scale: str = "small", seed: int = 42) -> Dict[str, int]:
+    """
+    Replace the synthetic data with a fresh set.
+
+    Args:
+        scale: Key of SCALES
+        seed: Random seed, so a scale always produces the same data
+
+    Returns:
+        Number of rows inserted per DocType
+    """
+    check_site()
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    clear()
+
+    company = frappe.get_all("Company", pluck="name", limit=1)
+    if not company:
+        frappe.throw("Create a Company on the benchmark site before seeding")
+    company = company[0]
+    currency = frappe.db.get_value("Company", company, "default_currency")
+    warehouse = frappe.db.get_value("Warehouse", {"company": company, "is_group": 0}, "name")
+    customer_group = frappe.db.get_value("Customer Group", {"is_group": 1}, "name", order_by="lft asc")
+    territory = frappe.db.get_value("Territory", {"is_group": 1}, "name", order_by="lft asc")
+    item_group = frappe.db.get_value("Item Group", {"is_group": 1}, "name", order_by="lft asc")
+
+    customers = [f"{PREFIX}-CUST-{i:05d}" for i in range(1, sizes["customers"] + 1)]
+    insert("Customer", [
+        {"name": name, "customer_name": f"Bench Customer {i}", "customer_type": "Company",
+         "customer_group": customer_group, "territory": territory}
+        for i, name in enumerate(customers, 1)
+    ])
+
+    items = [f"{PREFIX}-ITEM-{i:05d}" for i in range(1, sizes["items"] + 1)]
+    insert("Item", [
+        {"name": code, "item_code": code, "item_name": f"Bench Item {i}", "item_group": item_group,
+         "stock_uom": "Nos", "is_stock_item": 1, "include_item_in_manufacturing": 0}
+        for i, code in enumerate(items, 1)
+    ])
+    insert("Bin", [
+        {"name": f"{PREFIX}-BIN-{i:06d}", "item_code": code, "warehouse": warehouse, "stock_uom": "Nos",
+         "actual_qty": rng.randint(0, 500), "reserved_qty": rng.randint(0, 50), "projected_qty": rng.randint(-50, 500)}
+        for i, code in enumerate(items, 1)
+    ])
+
+    start = add_days(getdate(), -730)
+    orders, order_items = [], []
+    for i in range(1, sizes["sales_orders"] + 1):
+        name = f"{PREFIX}-SO-{i:07d}"
+        customer = rng.choice(customers)
+        date = add_days(start, rng.randint(0, 729))
+        qty = rng.randint(1, 20)
+        rate = rng.randint(10, 1000)
+        orders.append({
+            "name": name, "customer": customer, "customer_name": customer, "company": company,
+            "transaction_date": date, "delivery_date": add_days(date, 7), "status": rng.choice(SALES_ORDER_STATUSES),
+            "docstatus": 1, "currency": currency, "conversion_rate": 1, "total_qty": qty,
+            "grand_total": qty * rate, "base_grand_total": qty * rate, "creation": date, "modified": date,
+        })
+        item = rng.choice(items)
+        order_items.append({
+            "name": f"{name}-1", "parent": name, "parenttype": "Sales Order", "parentfield": "items", "idx": 1,
+            "item_code": item, "item_name": item, "qty": qty, "stock_qty": qty, "rate": rate, "amount": qty * rate,
+            "base_amount": qty * rate, "uom": "Nos", "stock_uom": "Nos", "conversion_factor": 1,
+            "warehouse": warehouse, "delivery_date": add_days(date, 7), "docstatus": 1,
+        })
+        if len(orders) >= CHUNK_SIZE:
+            insert("Sales Order", orders)
+            insert("Sales Order Item", order_items)
+            orders, order_items = [], []
+    insert("Sales Order", orders)
+    insert("Sales Order Item", order_items)
+
+    seed_history(sizes["history"])
+    frappe.db.commit()
+    return {doctype: frappe.db.count(doctype, {field: ["like", f"{PREFIX}-%"]}) for doctype, field in SEEDED}
+
+
+def seed_history(messages: int) -> str:
+    """A chat session with `messages` alternating human/AI messages, for history load timings"""
+    session = f"{PREFIX}-SESSION"
+    insert("AI Chat Session", [
+        {"name": session, "session_name": "Benchmark history", "user": "Administrator", "is_active": 0}
+    ])
+    insert("AI Chat Message", [
+        {"name": f"{PREFIX}-MSG-{i:06d}", "session": session, "user": "Administrator",
+         "message_type": "Human" if i % 2 else "Ai", "content": f"Benchmark message {i} " + "lorem ipsum " * 20}
+        for i in range(1, messages + 1)
+    ])
+    return session
+
+
+def insert(doctype: str, rows: List[Dict[str, Any]]):
+    """Bulk insert rows with the standard columns filled in"""
+    if not rows:
+        return
+    now = now_datetime()
+    standard = {"owner": "Administrator", "modified_by": "Administrator", "creation": now, "modified": now, "docstatus": 0}
+    fields = list(dict.fromkeys(list(standard) + list(rows[0])))
+    values = [[row.get(field, standard.get(field)) for field in fields] for row in rows]
+    frappe.db.bulk_insert(doctype, fields, values, chunk_size=CHUNK_SIZE)
+
+
+def clear():
+    """Remove all synthetic data"""
+    check_site()
+    for doctype, field in SEEDED:
+        frappe.db.delete(doctype, {field: ["like", f"{PREFIX}-%"]})
+    frappe.db.commit()
@@ -0,0 +1,76 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+from langchain_core.messages import HumanMessage
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.benchmarks.fake_llm import FakeLLM, FALLBACK_REPLY
+from erpnext_ai_chat.benchmarks.replay import CassetteLLM, CassetteMiss, anonymise, compare as compare_replay
+from erpnext_ai_chat.benchmarks.run import compare, stats
+
+
+class UnitTestBenchmarks(UnitTestCase):
+	def test_fake_llm_routes_questions_and_answers_tool_results(self):
+		llm = FakeLLM(script=[(r"stock", "TOOL: get_stock_balance\nINPUT: {}")])
+
+		plan = llm.invoke([HumanMessage(content="What is in stock?")])
+		self.assertTrue(plan.content.startswith("TOOL: get_stock_balance"))
+		self.assertGreater(plan.usage_metadata["input_tokens"], 0)
+
+		answer = llm.invoke([HumanMessage(content="Tool result:\nitem,qty")])
+		self.assertEqual(answer.content, llm.answer)
+		self.assertEqual(llm.invoke([HumanMessage(content="Hello")]).content, FALLBACK_REPLY)
+		self.assertEqual(llm.calls, 3)
+
+	def test_stats(self):
+		result = stats([5.0, 1.0, 3.0, 2.0, 4.0])
+		self.assertEqual(result["n"], 5)
+		self.assertEqual(result["p50_ms"], 3.0)
+		self.assertEqual(result["max_ms"], 5.0)
+		self.assertEqual(result["mean_ms"], 3.0)
+
+	def test_compare_flags_slower_p50(self):
+		baseline = {"results": {"fast": {"p50_ms": 10.0}, "slow": {"p50_ms": 10.0}}}
+		current = {"results": {"fast": {"p50_ms": 11.0}, "slow": {"p50_ms": 15.0}, "new": {"p50_ms": 1.0}}}
+
+		comparison = compare(baseline, current, tolerance=0.2)
+		self.assertFalse(comparison["fast"]["regressed"])
+		self.assertTrue(comparison["slow"]["regressed"])
+		self.assertNotIn("new", comparison)
+
+	def test_cassette_records_and_replays_per_turn(self):
+		recorder = CassetteLLM(llm=FakeLLM())
+		recorder.start_turn("abc-1")
+		recorded = recorder.invoke([HumanMessage(content="Show me the latest sales orders")])
+
+		player = CassetteLLM(recorder.cassette)
+		player.start_turn("abc-1")
+		self.assertEqual(player.invoke([HumanMessage(content="Show me the latest sales orders")]).content, recorded.content)
+		self.assertEqual(player.changed_prompts, 0)
+
+		player.start_turn("abc-1")
+		player.invoke([HumanMessage(content="Show me the newest sales orders")])
+		self.assertEqual(player.changed_prompts, 1)
+
+		with self.assertRaises(CassetteMiss):
+			player.invoke([HumanMessage(content="Tool result:\nname")])
+		self.assertTrue(player.missed)
+
+	def test_anonymise(self):
+		text = anonymise("Mail jane.doe@example.org or +44 20 7946 0958 about SO-0001, Jane", ["Jane"])
+		self.assertNotIn("jane", text.lower())
+		self.assertNotIn("7946", text)
+		self.assertIn("SO-0001", text)
+
+	def test_compare_replay_lists_changed_turns(self):
+		row = {"question": "q", "tools": ["get_sales_orders"], "llm_calls": 2, "answer": "10 orders"}
+		baseline = {"turns": {"a-1": row, "a-2": row}}
+		current = {
+			"summary": {},
+			"turns": {"a-1": row, "a-2": {**row, "tools": ["query_doctype"], "answer": "9 orders"}},
+		}
+
+		changes = compare_replay(baseline, current)["changed_turns"]
+		self.assertEqual(list(changes), ["a-2"])
+		self.assertEqual(changes["a-2"]["tools"]["current"], ["query_doctype"])
+		self.assertIn("+9 orders", changes["a-2"]["answer_diff"])
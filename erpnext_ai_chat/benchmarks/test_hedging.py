@@ -0,0 +1,95 @@
+# Copyright (c) 2026, Your Company and Contributors
+# See license.txt
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import frappe
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+from frappe.tests import UnitTestCase
+
+from erpnext_ai_chat.ai_agent import hedging
+from erpnext_ai_chat.ai_agent.hedging import LATENCY_KEY, HedgedLLM, first_token_samples
+from erpnext_ai_chat.benchmarks.fake_server import FakeOpenAIServer
+
+
+BACKENDS = ("test-primary", "test-secondary")
+MESSAGES = [HumanMessage(content="Show me the latest sales orders")]
+
+
+def chat_model(server):
+	return ChatOpenAI(model="fake", base_url=server.url, api_key="unused", max_retries=0, timeout=10, stream_usage=True)
+
+
+class UnitTestHedging(UnitTestCase):
+	def setUp(self):
+		for name in BACKENDS:
+			frappe.cache().delete_value(LATENCY_KEY.format(name))
+			frappe.cache().delete_value([f"ai_chat_llm_circuit:backend:{name}:{part}" for part in ("open", "failures", "probation")])
+
+	def hedged(self, primary, secondary, initial_delay=0.1):
+		return HedgedLLM(list(zip(BACKENDS, (chat_model(primary), chat_model(secondary)))), percentile=95, initial_delay=initial_delay)
+
+	def test_fast_primary_is_not_hedged(self):
+		with FakeOpenAIServer("primary answer") as primary, FakeOpenAIServer("secondary answer") as secondary:
+			response = self.hedged(primary, secondary, initial_delay=2).invoke(MESSAGES)
+
+		self.assertEqual(response.content, "primary answer")
+		self.assertEqual(secondary.requests, 0)
+		self.assertGreater(response.usage_metadata["output_tokens"], 0)
+		self.assertEqual(len(first_token_samples("test-primary")), 1)
+
+	def test_slow_primary_is_hedged_and_cancelled(self):
+		with FakeOpenAIServer("primary answer", first_token_delay=1.5) as primary, FakeOpenAIServer("secondary answer") as secondary:
+			start = time.perf_counter()
+			response = self.hedged(primary, secondary).invoke(MESSAGES)
+			elapsed = time.perf_counter() - start
+			# The primary notices the closed stream once it starts writing
+			time.sleep(1.6)
+
+		self.assertEqual(response.content, "secondary answer")
+		self.assertLess(elapsed, 1)
+		self.assertEqual((primary.requests, secondary.requests), (1, 1))
+		self.assertEqual(primary.disconnected, 1)
+		# The loser's wait is kept as a lower bound of its time to first token
+		self.assertGreaterEqual(first_token_samples("test-primary")[0], 0.1)
+
+	def test_no_hedge_while_stream_threads_are_used_up(self):
+		with FakeOpenAIServer("primary answer", first_token_delay=0.5) as primary, FakeOpenAIServer("secondary answer") as secondary:
+			with patch.object(hedging, "_stream_slots", threading.BoundedSemaphore(1)) as slots:
+				response = self.hedged(primary, secondary).invoke(MESSAGES)
+				time.sleep(0.1)
+				# The primary's slot is given back once its thread ends
+				self.assertTrue(slots.acquire(blocking=False))
+
+		self.assertEqual(response.content, "primary answer")
+		self.assertEqual(secondary.requests, 0)
+
+	def test_failed_primary_hands_over_at_once(self):
+		with FakeOpenAIServer(status=500) as primary, FakeOpenAIServer("secondary answer") as secondary:
+			start = time.perf_counter()
+			response = self.hedged(primary, secondary, initial_delay=5).invoke(MESSAGES)
+
+		self.assertEqual(response.content, "secondary answer")
+		self.assertLess(time.perf_counter() - start, 2)
+
+	def test_every_backend_failing_raises(self):
+		with FakeOpenAIServer(status=503) as primary, FakeOpenAIServer(status=503) as secondary:
+			with self.assertRaises(Exception):
+				self.hedged(primary, secondary).invoke(MESSAGES)
+
+		self.assertEqual((primary.requests, secondary.requests), (1, 1))
+
+	def test_async_hedge_cancels_the_loser(self):
+		with FakeOpenAIServer("primary answer", first_token_delay=1.5) as primary, FakeOpenAIServer("secondary answer") as secondary:
+			start = time.perf_counter()
+			response = asyncio.run(self.hedged(primary, secondary).ainvoke(MESSAGES))
+			elapsed = time.perf_counter() - start
+			time.sleep(1.6)
+
+		self.assertEqual(response.content, "secondary answer")
+		self.assertLess(elapsed, 1)
+		self.assertEqual(primary.disconnected, 1)
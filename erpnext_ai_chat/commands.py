@@ -0,0 +1,178 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("ai-chat-query-plans")
+@click.option("--limit", default=20, help="Number of query shapes to show, slowest in total first")
+@click.option("--clear", is_flag=True, default=False, help="Discard the captured queries after printing them")
+@pass_context
+def ai_chat_query_plans(context, limit=20, clear=False):
+    """Show full scans, filesorts and suggested indexes for queries run by AI chat tools"""
+    from erpnext_ai_chat.ai_agent import query_plans
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        if not query_plans.is_enabled():
+            click.secho("Capture Query Plans is off in AI Chat Settings; showing what was captured before.", fg="yellow")
+
+        for entry in query_plans.get_report(limit):
+            click.secho(
+                f"{entry['count']} runs, avg {entry['avg_ms']:.1f} ms, max {entry['max_ms']:.1f} ms, "
+                f"total {entry['total_ms']:.0f} ms ({', '.join(entry['tools'])})",
+                bold=True,
+            )
+            click.echo(f"  {entry['shape']}")
+            for finding in entry["findings"]:
+                click.secho(f"  - {finding}", fg="red")
+            for suggestion in entry["suggestions"]:
+                click.secho(f"  + {suggestion};", fg="green")
+            click.echo()
+
+        if clear:
+            query_plans.clear()
+    finally:
+        frappe.destroy()
+
+
+@click.command("ai-chat-benchmark")
+@click.option("--seed-data", is_flag=True, default=False, help="Replace the synthetic data before running")
+@click.option("--scale", type=click.Choice(["small", "medium", "large"]), default="small", help="Size of the synthetic data")
+@click.option("--seed", default=42, help="Random seed for the synthetic data")
+@click.option("--iterations", default=20, help="Timed iterations per benchmark")
+@click.option("--llm-latency", default=0.0, help="Seconds the fake LLM waits per call")
+@click.option("--baseline", type=click.Path(exists=True), help="Previous results to compare against")
+@click.option("--tolerance", default=0.2, help="Relative p50 slowdown counted as a regression")
+@click.option("--output", type=click.Path(), help="Write the results as JSON to this file")
+@click.option("--clear", "clear_data", is_flag=True, default=False, help="Remove the synthetic data and exit")
+@pass_context
+def ai_chat_benchmark(context, seed_data=False, scale="small", seed=42, iterations=20, llm_latency=0.0,
+                      baseline=None, tolerance=0.2, output=None, clear_data=False):
+    """Benchmark the AI chat pipeline offline on a test site with synthetic data"""
+    import json
+    from erpnext_ai_chat.benchmarks import run, seed as seed_module
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    frappe.set_user("Administrator")
+    try:
+        if clear_data:
+            seed_module.clear()
+            return
+
+        if seed_data:
+            counts = seed_module.seed(scale, seed)
+            click.echo(f"Seeded {', '.join(f'{count} {doctype}' for doctype, count in counts.items())}")
+
+        baseline_report = None
+        if baseline:
+            with open(baseline) as f:
+                baseline_report = json.load(f)
+
+        report = run.run(iterations, llm_latency, baseline_report, tolerance)
+        text = run.to_json(report)
+        if output:
+            with open(output, "w") as f:
+                f.write(text)
+        click.echo(text)
+
+        regressions = [name for name, row in (report.get("comparison") or {}).items() if row["regressed"]]
+        if regressions:
+            click.secho(f"Regressions: {', '.join(regressions)}", fg="red")
+            raise SystemExit(1)
+    finally:
+        frappe.destroy()
+
+
+@click.command("ai-chat-replay")
+@click.argument("action", type=click.Choice(["export", "record", "replay"]))
+@click.option("--turns", "turns_file", type=click.Path(), required=True, help="JSON lines file of exported turns")
+@click.option("--cassette", type=click.Path(), help="Recorded LLM replies (written by record, read by replay)")
+@click.option("--sessions", default=50, help="export: number of most recent sessions")
+@click.option("--since", help="export: only sessions modified on or after this date")
+@click.option("--user", default="Administrator", help="record/replay: run the turns as this user")
+@click.option("--baseline", type=click.Path(exists=True), help="replay: previous report to diff against")
+@click.option("--output", type=click.Path(), help="Write the report as JSON to this file")
+@pass_context
+def ai_chat_replay(context, action, turns_file, cassette=None, sessions=50, since=None, user="Administrator",
+                   baseline=None, output=None):
+    """Export chat turns, record the model's replies once and replay them offline for regressions"""
+    import json
+    from erpnext_ai_chat.benchmarks import replay, run
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        if action == "export":
+            turns = replay.export_turns(sessions, since)
+            replay.write_turns(turns_file, turns)
+            click.echo(f"Exported {len(turns)} turns to {turns_file}")
+            return
+
+        if not cassette:
+            raise click.UsageError("--cassette is required to record or replay")
+        frappe.set_user(user)
+        turns = replay.read_turns(turns_file)
+
+        if action == "record":
+            from erpnext_ai_chat.ai_agent import ERPNextAgent
+
+            # The model configured in AI Chat Settings, as a chat turn would use it
+            with run.temporary_session("Replay recording") as session:
+                llm = replay.CassetteLLM(llm=ERPNextAgent(session_id=session).llm)
+        else:
+            with open(cassette) as f:
+                llm = replay.CassetteLLM(json.load(f))
+
+        report = replay.replay(turns, llm)
+        if action == "record":
+            with open(cassette, "w") as f:
+                json.dump(llm.cassette, f, indent=1)
+            report["meta"]["recorded"] = True
+
+        if baseline:
+            with open(baseline) as f:
+                report["comparison"] = replay.compare(json.load(f), report)
+
+        text = run.to_json(report)
+        if output:
+            with open(output, "w") as f:
+                f.write(text)
+        click.echo(text)
+
+        summary = report["summary"]
+        if summary["cassette_misses"] or summary["changed_prompts"]:
+            click.secho(
+                f"{summary['cassette_misses']} turns without a recording, {summary['changed_prompts']} changed prompts",
+                fg="yellow",
+            )
+        changed = (report.get("comparison") or {}).get("changed_turns")
+        if changed:
+            click.secho(f"Changed turns: {', '.join(changed)}", fg="red")
+            raise SystemExit(1)
+    finally:
+        frappe.destroy()
+
+
+@click.command("ai-chat-worker")
+@click.option("--max-turns", default=100, help="Turns answered concurrently")
+@click.option("--db-threads", default=8, help="Threads running the turns' database work")
+@pass_context
+def ai_chat_worker(context, max_turns=100, db_threads=8):
+    """Answer queued chat turns concurrently, awaiting the LLM asynchronously (needs Answer in Chat Worker)"""
+    from erpnext_ai_chat.ai_agent import chat_worker
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        if not chat_worker.is_enabled():
+            click.secho("Answer in Chat Worker is off in AI Chat Settings; no turns will be queued.", fg="yellow")
+        chat_worker.serve(max_turns, db_threads)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frappe.destroy()
+
+
+commands = [ai_chat_query_plans, ai_chat_benchmark, ai_chat_replay, ai_chat_worker]
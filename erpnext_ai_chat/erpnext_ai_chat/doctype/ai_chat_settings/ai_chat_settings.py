@@ -2,4 +2,17 @@ import frappe
 from frappe.model.document import Document
 
 class AIChatSettings(Document):
-    pass
+    def on_update(self):
+        if self.enable_embeddings and self.has_value_changed("enable_embeddings"):
+            # The index is otherwise only refreshed when the catalog is rebuilt
+            from erpnext_ai_chat.ai_agent.retrieval import enqueue_refresh_index
+            enqueue_refresh_index()
+
+
+def get_setting(fieldname, default=None):
+    """Read a value from AI Chat Settings, falling back to `default` when it is not set"""
+    try:
+        value = frappe.get_cached_doc("AI Chat Settings").get(fieldname)
+    except Exception:
+        value = None
+    return default if value is None or value == "" else value
@@ -0,0 +1,63 @@
+// Copyright (c) 2026, Your Company and contributors
+// For license information, please see license.txt
+
+const AI_CHAT_TRACE_COLORS = {
+	llm: "#5e64ff",
+	tool: "#ffa00a",
+	sql: "#ff5858",
+	chart: "#29cd42",
+	render: "#29cd42",
+};
+
+frappe.ui.form.on("AI Chat Trace", {
+	refresh(frm) {
+		const spans = JSON.parse(frm.doc.spans || "[]");
+		const total = Math.max(frm.doc.duration_ms || 0, 1);
+
+		// Children are listed under their parent span, indented by depth
+		const children = {};
+		spans.forEach((span) => {
+			const parent = span.parent === null || span.parent === undefined ? "root" : span.parent;
+			(children[parent] = children[parent] || []).push(span);
+		});
+
+		const rows = [];
+		const walk = (parent, depth) => {
+			(children[parent] || [])
+				.sort((a, b) => a.start_ms - b.start_ms)
+				.forEach((span) => {
+					rows.push(render_span(span, depth, total));
+					walk(span.id, depth + 1);
+				});
+		};
+		walk("root", 0);
+
+		frm.get_field("waterfall").$wrapper.html(
+			rows.length
+				? `<div class="ai-chat-trace small">${rows.join("")}</div>`
+				: `<p class="text-muted">${__("No spans recorded")}</p>`
+		);
+	},
+});
+
+function render_span(span, depth, total) {
+	const left = (span.start_ms / total) * 100;
+	const width = Math.max((span.duration_ms / total) * 100, 0.3);
+	const color = span.error ? "#e24c4c" : AI_CHAT_TRACE_COLORS[span.name] || "#98a1a9";
+	const label = [span.name, span.tool, span.step, span.model].filter(Boolean).join(" ");
+	const tokens =
+		span.prompt_tokens || span.completion_tokens
+			? ` · ${span.prompt_tokens || 0} + ${span.completion_tokens || 0} tokens`
+			: "";
+	const title = frappe.utils.escape_html(span.query || span.error || label);
+
+	return `<div class="d-flex align-items-center mb-1" title="${title}">
+		<div style="width: 30%; padding-left: ${depth * 12}px" class="text-truncate">
+			${frappe.utils.escape_html(label)}
+		</div>
+		<div style="width: 55%; position: relative; height: 14px; background: var(--gray-100)">
+			<div style="position: absolute; left: ${left}%; width: ${width}%; height: 100%; background: ${color}"></div>
+		</div>
+		<div style="width: 15%" class="text-right text-muted">${span.duration_ms.toFixed(1)} ms${tokens}</div>
+	</div>`;
+}
@@ -0,0 +1,90 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, now_datetime
+
+from erpnext_ai_chat.ai_agent import tracing
+
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+USER = "test@example.com"
+
+
+def settings(**values):
+	return patch.object(tracing, "get_setting", lambda fieldname, default=None: values.get(fieldname, default))
+
+
+class IntegrationTestAIChatTrace(IntegrationTestCase):
+	def setUp(self):
+		frappe.db.delete("AI Chat Trace", {"user": USER})
+
+	def traces(self):
+		return frappe.get_all("AI Chat Trace", filters={"user": USER}, fields=["*"])
+
+	def test_sampled_turn_is_saved_with_its_spans(self):
+		with settings(trace_sample_rate=1), tracing.trace_turn(USER):
+			with tracing.span("tool", tool="get_sales_orders"):
+				start = time.perf_counter()
+				tracing.add_span("llm", start, start + 0.05, prompt_tokens=100, completion_tokens=20)
+				tracing.add_sql_span("SELECT 1", start, start + 0.01)
+
+		traces = self.traces()
+		self.assertEqual(len(traces), 1)
+		trace = traces[0]
+		self.assertEqual((trace.status, trace.keep_reason), ("OK", "Sampled"))
+		self.assertEqual(trace.tools, "get_sales_orders")
+		self.assertEqual((trace.llm_calls, trace.prompt_tokens, trace.completion_tokens), (1, 100, 20))
+		self.assertEqual((trace.sql_queries, trace.span_count), (1, 3))
+
+		spans = frappe.parse_json(trace.spans)
+		tool = next(span for span in spans if span["name"] == "tool")
+		self.assertTrue(all(span["parent"] == tool["id"] for span in spans if span["name"] != "tool"))
+
+	def test_unsampled_fast_turn_is_dropped(self):
+		with settings(trace_sample_rate=0, trace_slow_threshold=60), tracing.trace_turn(USER):
+			tracing.add_span("llm", time.perf_counter(), time.perf_counter())
+		self.assertEqual(self.traces(), [])
+
+	def test_failed_turn_is_always_kept(self):
+		with self.assertRaises(ValueError), settings(trace_sample_rate=0), tracing.trace_turn(USER):
+			raise ValueError("boom")
+
+		trace = self.traces()[0]
+		self.assertEqual((trace.status, trace.keep_reason), ("Error", "Error"))
+		self.assertEqual(trace.error, "ValueError: boom")
+
+	def test_slow_turn_is_always_kept(self):
+		with settings(trace_sample_rate=0, trace_slow_threshold=0.001), tracing.trace_turn(USER):
+			time.sleep(0.01)
+		self.assertEqual(self.traces()[0].keep_reason, "Slow")
+
+	def test_tracing_switched_off(self):
+		with settings(enable_tracing=0, trace_sample_rate=1), tracing.trace_turn(USER) as trace:
+			self.assertIsNone(trace)
+			self.assertIsNone(tracing.get_current_trace())
+		self.assertEqual(self.traces(), [])
+
+	def test_delete_old_traces(self):
+		for _ in range(2):
+			with settings(trace_sample_rate=1), tracing.trace_turn(USER):
+				pass
+		old, recent = [trace.name for trace in self.traces()]
+		frappe.db.set_value("AI Chat Trace", old, "creation", add_days(now_datetime(), -10), update_modified=False)
+
+		with settings(trace_retention_days=0):
+			tracing.delete_old_traces()
+		self.assertEqual(len(self.traces()), 2)
+
+		with settings(trace_retention_days=7):
+			tracing.delete_old_traces()
+		self.assertEqual([trace.name for trace in self.traces()], [recent])
@@ -0,0 +1,10 @@
+import frappe
+from frappe.model.document import Document
+
+class AIChatUsage(Document):
+    pass
+
+
+def on_doctype_update():
+    # Budget checks sum a user's tokens for today on every turn
+    frappe.db.add_index("AI Chat Usage", ["user", "usage_date"])
@@ -0,0 +1,91 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import today
+
+from erpnext_ai_chat.ai_agent import usage
+
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+USER = "test@example.com"
+OTHER_USER = "test1@example.com"
+
+
+def budgets(site_budget, user_budgets):
+	"""AI Chat Settings with the given budgets, as get_cached_doc would return them"""
+	settings = frappe.get_doc({
+		"doctype": "AI Chat Settings",
+		"daily_token_budget": site_budget,
+		"user_token_budgets": [{"user": user, "daily_token_budget": budget} for user, budget in user_budgets.items()],
+	})
+	return patch.object(frappe, "get_cached_doc", return_value=settings)
+
+
+class IntegrationTestAIChatUsage(IntegrationTestCase):
+	def setUp(self):
+		frappe.db.delete("AI Chat Usage", {"user": ["in", (USER, OTHER_USER)]})
+
+	def spend(self, user, prompt_tokens, completion_tokens, degraded=False):
+		turn = usage.TurnUsage(user)
+		turn.tool = "get_sales_orders"
+		turn.degraded = degraded
+		turn.add("gpt-4o-mini", "plan", prompt_tokens, completion_tokens, 0.5)
+		turn.save()
+
+	def test_turn_usage_saves_one_row_per_call(self):
+		turn = usage.TurnUsage(USER)
+		turn.tool = "get_sales_orders"
+		turn.add("gpt-4o-mini", "plan", 1000, 50, 0.8)
+		turn.add("gpt-4o", "answer", 2000, None, 1.2)
+		turn.save()
+
+		rows = frappe.get_all("AI Chat Usage", filters={"user": USER}, fields=["*"], order_by="step desc")
+		self.assertEqual([row.step for row in rows], ["plan", "answer"])
+		plan, answer = rows
+		self.assertEqual(str(plan.usage_date), today())
+		self.assertEqual((plan.tool, plan.model, plan.total_tokens, plan.degraded), ("get_sales_orders", "gpt-4o-mini", 1050, 0))
+		self.assertAlmostEqual(plan.latency_ms, 800)
+		self.assertAlmostEqual(plan.estimated_cost, usage.estimate_cost("gpt-4o-mini", 1000, 50))
+		self.assertEqual((answer.completion_tokens, answer.total_tokens), (0, 2000))
+
+	def test_turn_without_calls_saves_nothing(self):
+		usage.TurnUsage(USER).save()
+		self.assertEqual(frappe.db.count("AI Chat Usage", {"user": USER}), 0)
+
+	def test_per_user_budget_overrides_the_site_budget(self):
+		self.spend(USER, 400, 100)
+		self.spend(OTHER_USER, 400, 100)
+
+		with budgets(1000, {USER: 500}):
+			self.assertEqual(usage.get_daily_budget(USER), 500)
+			self.assertEqual(usage.get_daily_budget(OTHER_USER), 1000)
+			self.assertTrue(usage.is_over_budget(USER))
+			self.assertFalse(usage.is_over_budget(OTHER_USER))
+
+	def test_zero_budget_is_unlimited(self):
+		self.spend(USER, 10 ** 6, 0)
+		with budgets(0, {}):
+			self.assertFalse(usage.is_over_budget(USER))
+		# A per-user 0 lifts the site budget for that user
+		with budgets(100, {USER: 0}):
+			self.assertFalse(usage.is_over_budget(USER))
+
+	def test_budget_counts_only_todays_tokens(self):
+		self.spend(USER, 400, 100)
+		frappe.db.set_value("AI Chat Usage", {"user": USER}, "usage_date", "2020-01-01")
+		self.assertEqual(usage.get_tokens_used_today(USER), 0)
+		self.spend(USER, 40, 10)
+		self.assertEqual(usage.get_tokens_used_today(USER), 50)
+
+	def test_ledger_is_indexed_by_user_and_date(self):
+		# get_tokens_used_today runs on every turn
+		self.assertTrue(frappe.db.has_index("tabAI Chat Usage", "user_usage_date_index"))
@@ -0,0 +1,83 @@
+# Copyright (c) 2025, Your Company and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from erpnext_ai_chat.ai_agent import usage
+
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+DATE = "2020-01-01"
+USER = "test@example.com"
+OTHER_USER = "test1@example.com"
+
+
+def ledger_row(user, tool, model, total_tokens, latency_ms=100, degraded=0, usage_date=DATE):
+	frappe.get_doc({
+		"doctype": "AI Chat Usage",
+		"user": user,
+		"tool": tool,
+		"model": model,
+		"usage_date": usage_date,
+		"prompt_tokens": total_tokens - 10,
+		"completion_tokens": 10,
+		"total_tokens": total_tokens,
+		"estimated_cost": 0.01,
+		"latency_ms": latency_ms,
+		"degraded": degraded,
+	}).insert(ignore_permissions=True)
+
+
+class IntegrationTestAIChatUsageSummary(IntegrationTestCase):
+	def setUp(self):
+		for doctype in ("AI Chat Usage", "AI Chat Usage Summary"):
+			frappe.db.delete(doctype, {"usage_date": ["in", (DATE, "2020-01-02")]})
+
+	def summaries(self):
+		return {
+			(row.user, row.tool or None, row.model): row
+			for row in frappe.get_all("AI Chat Usage Summary", filters={"usage_date": DATE}, fields=["*"])
+		}
+
+	def test_rollup_groups_by_user_tool_and_model(self):
+		ledger_row(USER, "get_sales_orders", "gpt-4o-mini", 100, latency_ms=100)
+		ledger_row(USER, "get_sales_orders", "gpt-4o-mini", 300, latency_ms=300, degraded=1)
+		ledger_row(USER, "get_sales_orders", "gpt-4o", 50)
+		ledger_row(USER, "search_items", "gpt-4o-mini", 70)
+		ledger_row(OTHER_USER, "get_sales_orders", "gpt-4o-mini", 20)
+		# Turns without a tool are grouped together, whether the tool is empty or missing
+		ledger_row(USER, None, "gpt-4o-mini", 5)
+		ledger_row(USER, "", "gpt-4o-mini", 5)
+		# Another day is not part of the rollup
+		ledger_row(USER, "get_sales_orders", "gpt-4o-mini", 1000, usage_date="2020-01-02")
+
+		usage.rollup_daily(DATE)
+
+		summaries = self.summaries()
+		self.assertEqual(set(summaries), {
+			(USER, "get_sales_orders", "gpt-4o-mini"),
+			(USER, "get_sales_orders", "gpt-4o"),
+			(USER, "search_items", "gpt-4o-mini"),
+			(OTHER_USER, "get_sales_orders", "gpt-4o-mini"),
+			(USER, None, "gpt-4o-mini"),
+		})
+		orders = summaries[(USER, "get_sales_orders", "gpt-4o-mini")]
+		self.assertEqual((orders.calls, orders.total_tokens, orders.completion_tokens), (2, 400, 20))
+		self.assertEqual((orders.avg_latency_ms, orders.degraded_calls), (200, 1))
+		self.assertEqual(summaries[(USER, None, "gpt-4o-mini")].calls, 2)
+
+	def test_rollup_replaces_an_earlier_run(self):
+		ledger_row(USER, "get_sales_orders", "gpt-4o-mini", 100)
+		usage.rollup_daily(DATE)
+		ledger_row(USER, "get_sales_orders", "gpt-4o-mini", 100)
+		usage.rollup_daily(DATE)
+
+		summaries = self.summaries()
+		self.assertEqual(len(summaries), 1)
+		self.assertEqual(summaries[(USER, "get_sales_orders", "gpt-4o-mini")].calls, 2)
@@ -0,0 +1,64 @@
+frappe.pages['ai-query-plans'].on_page_load = function(wrapper) {
+    const page = frappe.ui.make_app_page({
+        parent: wrapper,
+        title: __('AI Query Plans'),
+        single_column: true
+    });
+
+    page.set_primary_action(__('Refresh'), () => loadQueryPlans(page), 'refresh');
+    page.set_secondary_action(__('Clear'), () => {
+        frappe.confirm(__('Discard all captured queries?'), () => {
+            frappe.call({
+                method: 'erpnext_ai_chat.api.query_plans.clear_report',
+                callback: () => loadQueryPlans(page)
+            });
+        });
+    });
+
+    page.$body = $('<div class="ai-query-plans"></div>').appendTo(page.main);
+    loadQueryPlans(page);
+};
+
+function loadQueryPlans(page) {
+    frappe.call({
+        method: 'erpnext_ai_chat.api.query_plans.get_report',
+        callback: function(r) {
+            const report = r.message || {queries: []};
+            let html = '';
+
+            if (!report.enabled) {
+                html += `<div class="alert alert-warning">
+                    ${__('Capture is off. Switch on "Capture Query Plans" in {0} to record new queries.',
+                        [`<a href="/app/ai-chat-settings">${__('AI Chat Settings')}</a>`])}
+                </div>`;
+            }
+
+            if (!report.queries.length) {
+                html += `<p class="text-muted">${__('No queries captured yet.')}</p>`;
+            }
+
+            report.queries.forEach(entry => {
+                const findings = entry.findings.length
+                    ? entry.findings.map(f => `<li>${frappe.utils.escape_html(f)}</li>`).join('')
+                    : `<li class="text-muted">${__('No full scans or filesorts')}</li>`;
+                const suggestions = entry.suggestions
+                    .map(s => `<pre class="small">${frappe.utils.escape_html(s)};</pre>`).join('');
+
+                html += `<div class="frappe-card p-3 mb-3">
+                    <div class="text-muted small mb-2">
+                        ${__('Tools')}: ${frappe.utils.escape_html(entry.tools.join(', '))} &middot;
+                        ${__('Runs')}: ${entry.count} &middot;
+                        ${__('Avg')}: ${entry.avg_ms.toFixed(1)} ms &middot;
+                        ${__('Max')}: ${entry.max_ms.toFixed(1)} ms &middot;
+                        ${__('Total')}: ${entry.total_ms.toFixed(0)} ms
+                    </div>
+                    <pre class="small">${frappe.utils.escape_html(entry.shape)}</pre>
+                    <ul class="small">${findings}</ul>
+                    ${suggestions ? `<div class="small font-weight-bold">${__('Suggested indexes')}</div>${suggestions}` : ''}
+                </div>`;
+            });
+
+            page.$body.html(html);
+        }
+    });
+}
@@ -7,17 +7,49 @@ app_license = "MIT"
 
 fixtures = []
 
-app_include_css = "/assets/erpnext_ai_chat/css/erpnext_ai_chat.css"
-app_include_js = "/assets/erpnext_ai_chat/js/erpnext_ai_chat.js"
+# Only the navbar button; the chat UI and its CSS load on first open
+app_include_js = "/assets/erpnext_ai_chat/js/erpnext_ai_chat_loader.js"
 
 doctype_js = {}
 doctype_list_js = {}
 doctype_tree_js = {}
 doctype_calendar_js = {}
 
-doc_events = {}
+doc_events = {
+    "DocType": {
+        "on_update": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog",
+        "on_trash": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog"
+    },
+    "Custom Field": {
+        "on_update": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog",
+        "on_trash": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog"
+    },
+    "Property Setter": {
+        "on_update": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog",
+        "on_trash": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog"
+    },
+    "Report": {
+        "on_update": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog",
+        "on_trash": "erpnext_ai_chat.ai_agent.catalog.enqueue_rebuild_catalog"
+    }
+}
+
+after_migrate = [
+    "erpnext_ai_chat.ai_agent.catalog.rebuild_catalog"
+]
+
+scheduler_events = {
+    "daily": [
+        "erpnext_ai_chat.ai_agent.tracing.delete_old_traces",
+        "erpnext_ai_chat.ai_agent.usage.rollup_daily",
+        "erpnext_ai_chat.ai_agent.usage.delete_old_usage",
+        "erpnext_ai_chat.ai_agent.profiling.delete_old_profiles"
+    ]
+}
 
-scheduler_events = {}
+# Chat-only workers started with AI_CHAT_PREWARM=1 load the LLM stack up front
+before_request = ["erpnext_ai_chat.ai_agent.warmup.maybe_prewarm"]
+before_job = ["erpnext_ai_chat.ai_agent.warmup.maybe_prewarm"]
 
 website_route_rules = []
 
@@ -7,32 +7,8 @@ erpnext_ai_chat.isListening = false;
 // Chart counter for unique IDs
 erpnext_ai_chat.chartCounter = 0;
 
-$(document).ready(function() {
-    // Add AI Chat button to navbar
-    if (frappe.boot.user && frappe.boot.user.name !== 'Guest') {
-        addAIChatButton();
-        initVoiceRecognition();
-    }
-});
-
-function addAIChatButton() {
-    const chatButton = `
-        <li class="nav-item">
-            <a class="nav-link" href="#" onclick="erpnext_ai_chat.openChat(); return false;">
-                <svg class="icon icon-sm">
-                    <use href="#icon-chat"></use>
-                </svg>
-                <span class="ml-2">AI Assistant</span>
-            </a>
-        </li>
-    `;
-    
-    setTimeout(() => {
-        if ($('.navbar .navbar-nav').length && !$('#ai-chat-button').length) {
-            $(chatButton).attr('id', 'ai-chat-button').appendTo('.navbar .navbar-nav');
-        }
-    }, 1000);
-}
+// Loaded on first open by erpnext_ai_chat_loader.js, which adds the navbar button
+initVoiceRecognition();
 
 function initVoiceRecognition() {
     // Check if browser supports speech recognition
@@ -215,6 +191,18 @@ erpnext_ai_chat.setupEventHandlers = function() {
         erpnext_ai_chat.clearHistory();
     });
     
+    $wrapper.on('click', '.ai-chat-export button', function() {
+        erpnext_ai_chat.exportResult($(this).closest('.ai-chat-export').data('message-id'), $(this).data('format'));
+    });
+    
+    // Export links are pushed when the background job finishes
+    frappe.realtime.off('ai_chat_export_ready');
+    frappe.realtime.on('ai_chat_export_ready', function(data) {
+        if (!erpnext_ai_chat.currentSessionId || erpnext_ai_chat.currentSessionId === data.session_id) {
+            erpnext_ai_chat.addMessage('ai', data.message, data.result_html);
+        }
+    });
+    
     // Keyboard shortcut for voice input (Ctrl+Shift+V)
     // Prevent Enter from triggering voice when there's text
     $wrapper.find('.ai-chat-input').on('keydown', function(e) {
@@ -287,23 +275,16 @@ erpnext_ai_chat.sendMessage = function() {
         method: 'erpnext_ai_chat.api.chat.send_message',
         args: {
             message: message,
-            session_id: erpnext_ai_chat.currentSessionId
+            session_id: erpnext_ai_chat.currentSessionId,
+            allow_queue: 1
         },
         callback: function(r) {
-            erpnext_ai_chat.removeTypingIndicator();
-            
-            if (r.message && r.message.success) {
-                erpnext_ai_chat.currentSessionId = r.message.session_id;
-                const response_text = r.message.response || r.message.message;
-                erpnext_ai_chat.addMessage('ai', response_text);
-                
-                // Render chart if provided
-                if (r.message.chart_data) {
-                    erpnext_ai_chat.renderChart(r.message.chart_data);
-                }
-            } else {
-                erpnext_ai_chat.addMessage('ai', 'Sorry, I encountered an error processing your request.');
+            // Answered by the chat worker: the reply arrives over realtime
+            if (r.message && r.message.queued) {
+                erpnext_ai_chat.pendingTurns[r.message.turn_id] = true;
+                return;
             }
+            erpnext_ai_chat.showReply(r.message);
         },
         error: function() {
             erpnext_ai_chat.removeTypingIndicator();
@@ -312,7 +293,32 @@ erpnext_ai_chat.sendMessage = function() {
     });
 };
 
-erpnext_ai_chat.addMessage = function(type, content) {
+erpnext_ai_chat.pendingTurns = {};
+
+erpnext_ai_chat.showReply = function(reply) {
+    erpnext_ai_chat.removeTypingIndicator();
+    
+    if (reply && reply.success) {
+        erpnext_ai_chat.currentSessionId = reply.session_id;
+        const response_text = reply.response || reply.message;
+        erpnext_ai_chat.addMessage('ai', response_text, reply.result_html, reply.exportable ? reply.message_id : null);
+        
+        // Render chart if provided
+        if (reply.chart_data) {
+            erpnext_ai_chat.renderChart(reply.chart_data);
+        }
+    } else {
+        erpnext_ai_chat.addMessage('ai', 'Sorry, I encountered an error processing your request.');
+    }
+};
+
+frappe.realtime.on('ai_chat_reply', function(reply) {
+    if (!erpnext_ai_chat.pendingTurns[reply.turn_id]) return;
+    delete erpnext_ai_chat.pendingTurns[reply.turn_id];
+    erpnext_ai_chat.showReply(reply);
+});
+
+erpnext_ai_chat.addMessage = function(type, content, resultHtml, exportMessageId) {
     const $wrapper = erpnext_ai_chat.chatDialog.fields_dict.chat_container.$wrapper;
     const $messages = $wrapper.find('.ai-chat-messages');
     
@@ -325,9 +331,22 @@ erpnext_ai_chat.addMessage = function(type, content) {
     const isHtmlContent = content.includes('<table') || content.includes('<div');
     const contentDisplay = isHtmlContent ? content : `<div style="white-space: pre-wrap;">${frappe.utils.escape_html(content)}</div>`;
     
+    // Tool results arrive already rendered by the server
+    const wide = isHtmlContent || !!resultHtml;
+    
+    // Results the server can re-run in full get export buttons
+    const exportButtons = exportMessageId ? `
+        <div class="ai-chat-export" data-message-id="${exportMessageId}" style="margin-top: 5px;">
+            <button class="btn btn-xs btn-default" data-format="csv">${__('Export CSV')}</button>
+            <button class="btn btn-xs btn-default" data-format="xlsx">${__('Export Excel')}</button>
+        </div>
+    ` : '';
+    
     const messageHTML = `
-        <div class="${messageClass}" style="max-width: ${isHtmlContent ? '95%' : '80%'}; padding: 10px 15px; margin-bottom: 10px; border-radius: 10px; ${alignStyle}">
+        <div class="${messageClass}" style="max-width: ${wide ? '95%' : '80%'}; padding: 10px 15px; margin-bottom: 10px; border-radius: 10px; ${alignStyle}">
             ${contentDisplay}
+            ${resultHtml || ''}
+            ${exportButtons}
             <div style="font-size: 0.75em; opacity: 0.7; margin-top: 5px;">${frappe.datetime.get_time(frappe.datetime.now_datetime())}</div>
         </div>
     `;
@@ -336,6 +355,21 @@ erpnext_ai_chat.addMessage = function(type, content) {
     $messages.scrollTop($messages[0].scrollHeight);
 };
 
+erpnext_ai_chat.exportResult = function(messageId, fileFormat) {
+    frappe.call({
+        method: 'erpnext_ai_chat.api.chat.export_result',
+        args: {
+            message_id: messageId,
+            file_format: fileFormat
+        },
+        callback: function(r) {
+            if (r.message && r.message.success) {
+                frappe.show_alert({message: r.message.message, indicator: 'blue'});
+            }
+        }
+    });
+};
+
 erpnext_ai_chat.addTypingIndicator = function() {
     const $wrapper = erpnext_ai_chat.chatDialog.fields_dict.chat_container.$wrapper;
     const $messages = $wrapper.find('.ai-chat-messages');
@@ -372,7 +406,7 @@ erpnext_ai_chat.loadChatHistory = function() {
                 
                 r.message.forEach(function(msg) {
                     const type = msg.message_type.toLowerCase() === 'human' ? 'user' : 'ai';
-                    erpnext_ai_chat.addMessage(type, msg.content);
+                    erpnext_ai_chat.addMessage(type, msg.content, msg.result_html, msg.exportable ? msg.name : null);
                 });
             }
         }
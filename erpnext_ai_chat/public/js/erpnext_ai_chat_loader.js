@@ -0,0 +1,48 @@
+frappe.provide('erpnext_ai_chat');
+
+// Included on every desk page, so it only adds the navbar button; the chat UI
+// (erpnext_ai_chat.js) and its CSS are fetched the first time the chat opens
+erpnext_ai_chat.assets = [
+    '/assets/erpnext_ai_chat/js/erpnext_ai_chat.js',
+    '/assets/erpnext_ai_chat/css/erpnext_ai_chat.css'
+];
+
+$(document).ready(function() {
+    // Add AI Chat button to navbar
+    if (frappe.boot.user && frappe.boot.user.name !== 'Guest') {
+        addAIChatButton();
+    }
+});
+
+function addAIChatButton() {
+    const chatButton = `
+        <li class="nav-item">
+            <a class="nav-link" href="#" onclick="erpnext_ai_chat.openChat(); return false;">
+                <svg class="icon icon-sm">
+                    <use href="#icon-chat"></use>
+                </svg>
+                <span class="ml-2">AI Assistant</span>
+            </a>
+        </li>
+    `;
+    
+    setTimeout(() => {
+        if ($('.navbar .navbar-nav').length && !$('#ai-chat-button').length) {
+            $(chatButton).attr('id', 'ai-chat-button').appendTo('.navbar .navbar-nav');
+        }
+    }, 1000);
+}
+
+// Replaced by the real openChat once erpnext_ai_chat.js has loaded
+erpnext_ai_chat.openChat = function loadAndOpenChat() {
+    if (erpnext_ai_chat.loading) {
+        return;
+    }
+    erpnext_ai_chat.loading = true;
+    frappe.require(erpnext_ai_chat.assets, function() {
+        erpnext_ai_chat.loading = false;
+        if (erpnext_ai_chat.openChat !== loadAndOpenChat) {
+            erpnext_ai_chat.openChat();
+        }
+    });
+};